@@ -0,0 +1,367 @@
+"""
+Benchmarks of olvm_healthchecker, every benchmark compares the current implementation with the original one on synthetic data.
+
+Usage: python benchmarks/benchmark_olvm_healthchecker.py <name> [N ...], e.g. dat_reader 1000000
+"""
+import os
+import sys
+import re
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from olvm_healthchecker import dat_table, dat_rows, value_matcher, format_table, write_table, format_size, Html_builder
+
+def benchmark_table(name_info,header,rows):
+    """Format benchmark results with format_table."""
+    return "\n" + name_info + "\n" + format_table(dat_table("","",header,rows=rows),list(range(len(header))))
+
+def benchmark_dat_file(dat_file,row_count,col_num):
+    """Write a synthetic audit_log like .dat file for benchmarks."""
+    messages = ['VM vm-%d is down with error. Exit message: Lost connection with qemu process.',
+                'Host kvm-%d.example.com moved to Non-Operational state.',
+                'User admin@internal-authz connecting from \'10.0.0.%d\' using session logged in.',
+                'Failed to sync storage devices from host kvm-%d\\nsee vdsm.log',
+                'Storage Domain data-%d was deactivated by system because it\'s not visible by any of the hosts.']
+    dat = open(dat_file, 'w')
+    for idx in range(row_count):
+        grid = [str(idx), '2021-06-16 10:%02d:%02d.000+02' % (idx % 60, idx % 59)] + ['v%d' % (col % 7) for col in range(col_num-3)] + [messages[idx % len(messages)] % (idx % 97)]
+        grid[5] = "\\N"
+        dat.write("\t".join(grid) + "\n")
+    dat.write("\\.\n\n")
+    dat.close()
+
+def benchmark_dat_reader(row_count=500000,col_num=30):
+    """
+    Compare the throughput of the original dat_to_dict loop and dat_rows on a synthetic .dat file.
+    
+    Parameters
+    ----------
+        row_count : int
+            Number of rows in the synthetic .dat file.
+        col_num : int
+            Number of columns in the synthetic .dat file.
+            
+    Returns
+    -------
+        result : str
+            Table of the elapsed time and rows per second for every reader.
+    
+    """
+    def dat_to_dict_original(dat_file):
+        """The per-line loop of dat_to_dict before dat_rows, without filter."""
+        col_space = [0]*col_num
+        rows = []
+        dat = open(dat_file)
+        for line in dat:
+            line.replace(" ","").replace("\n","").replace("\t",",").strip()
+            grid = line.split("\t")
+            if len(grid) == col_num:
+                grid[len(grid)-1] = grid[len(grid)-1][:-1]
+                rows.append(grid)
+                for i in range(len(grid)):
+                    if len(grid[i]) > col_space[i]:
+                        col_space[i] = len(grid[i])
+        dat.close()
+        return rows
+    
+    tmp_dir = tempfile.mkdtemp()
+    dat_file = os.path.join(tmp_dir, "benchmark.dat")
+    benchmark_dat_file(dat_file,row_count,col_num)
+    no_filter = {'col_value':['filter_disable']}
+    error_filter = {'col_value':['filter_in',col_num-1,['error','Error','failed','Failed','except','Except']]}
+    readers = [
+        ("dat_to_dict (original)", lambda: dat_to_dict_original(dat_file)),
+        ("dat_rows, all columns", lambda: list(dat_rows(dat_file,col_num,list(range(col_num)),no_filter))),
+        ("dat_rows, 2 columns", lambda: list(dat_rows(dat_file,col_num,[1,col_num-1],no_filter))),
+        ("dat_rows, 2 columns, Error Events filter", lambda: list(dat_rows(dat_file,col_num,[1,col_num-1],error_filter))),
+        ]
+    rows = []
+    try:
+        for name,reader in readers:
+            start = time.time()
+            row_num = len(reader())
+            elapsed = time.time() - start
+            rows.append([name, str(row_num), "%.3f" % elapsed, "%d" % (row_count / max(elapsed, 1e-9))])
+    finally:
+        shutil.rmtree(tmp_dir)
+    return benchmark_table("dat reader (" + str(row_count) + " rows, " + str(col_num) + " columns)",["Reader","Rows kept","Seconds","Rows per second"],rows)
+
+def benchmark_value_filter(row_count=2000000):
+    """
+    Compare the row predicates of the Error Events filter on synthetic audit_log messages.
+    
+    Parameters
+    ----------
+        row_count : int
+            Number of audit_log messages.
+            
+    Returns
+    -------
+        result : str
+            Table of the elapsed time and rows per second for every predicate.
+    
+    """
+    filter_values = ['error','Error','failed','Failed','except','Except']
+    messages = ['VM vm-%d is down with error. Exit message: Lost connection with qemu process.',
+                'Host kvm-%d.example.com moved to Non-Operational state.',
+                'User admin@internal-authz connecting from \'10.0.0.%d\' using session logged in.',
+                'Storage Domain data-%d was deactivated by system because it\'s not visible by any of the hosts.']
+    values = [messages[idx % len(messages)] % (idx % 97) for idx in range(row_count)]
+    alternation = re.compile("|".join([re.escape(x) for x in filter_values])).search
+    predicates = [
+        ("any() over the values (original)", lambda value: any(x in value for x in filter_values)),
+        ("alternation regex", alternation),
+        ("value_matcher", value_matcher(filter_values)),
+        ("value_matcher, ignore_case", value_matcher(filter_values,ignore_case=True)),
+        ]
+    rows = []
+    for name,predicate in predicates:
+        start = time.time()
+        row_num = len([value for value in values if predicate(value)])
+        elapsed = time.time() - start
+        rows.append([name, str(row_num), "%.3f" % elapsed, "%d" % (row_count / max(elapsed, 1e-9))])
+    return benchmark_table("Error Events filter (" + str(row_count) + " rows)",["Predicate","Rows kept","Seconds","Rows per second"],rows)
+
+def benchmark_table_memory(row_count=500000,col_num=30):
+    """
+    Compare the memory held by rows stored as a list of tuples and by a dat_table, on a synthetic .dat file.
+    tracemalloc is only available on Python 3.
+    
+    Parameters
+    ----------
+        row_count : int
+            Number of rows in the synthetic .dat file.
+        col_num : int
+            Number of columns in the synthetic .dat file.
+            
+    Returns
+    -------
+        result : str
+            Table of the memory and build time for every representation.
+    
+    """
+    import tracemalloc
+    tmp_dir = tempfile.mkdtemp()
+    dat_file = os.path.join(tmp_dir, "benchmark.dat")
+    benchmark_dat_file(dat_file,row_count,col_num)
+    no_filter = {'col_value':['filter_disable']}
+    keep_col = list(range(col_num))
+    col_names = ["col" + str(col) for col in keep_col]
+    builders = [
+        ("list of tuples (original)", lambda: list(dat_rows(dat_file,col_num,keep_col,no_filter))),
+        ("dat_table", lambda: dat_table("benchmark","benchmark.dat",col_names,keep_col,dat_rows(dat_file,col_num,keep_col,no_filter))),
+        ]
+    rows = []
+    try:
+        for name,builder in builders:
+            tracemalloc.start()
+            start = time.time()
+            table = builder()
+            elapsed = time.time() - start
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rows.append([name, format_size(size), format_size(peak), "%.3f" % elapsed])
+            del table
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return benchmark_table("Table memory (" + str(row_count) + " rows, " + str(col_num) + " columns)",["Representation","Held","Peak","Seconds"],rows)
+
+def benchmark_format_table(*row_counts):
+    """
+    Compare the table renderers on synthetic audit_log rows, a fifth of the messages are wrapped.
+    
+    Parameters
+    ----------
+        row_counts : int
+            Numbers of rows, 1000, 10000 and 100000 if none is given.
+            
+    Returns
+    -------
+        result : str
+            Table of the elapsed time and rows per second for every renderer and row count.
+    
+    """
+    def format_table_baseline(dat_dict,show_column):
+        """format_table as of the baseline, on a dat_dict list, building the text by concatenation."""
+        max_width = 80
+        header = dat_dict[1]
+        col_space = dat_dict[2]
+        rows = dat_dict[3]
+        divider_row = "" 
+        divider_header = ""
+        return_txt = ""
+    
+        # Adjust the column width
+        for idx,width in enumerate(col_space):
+            if idx in show_column or show_column[0] == 'filter_disable':
+                if width > max_width:
+                    col_space[idx] = max_width
+                if col_space[idx] <= len(header[idx]):
+                    col_space[idx] = len(header[idx])  
+                divider_row += "+"+"-"*col_space[idx]
+                divider_header += "+"+"="*col_space[idx]
+        divider_row += "+\n"
+        divider_header += "+\n"
+    
+        # Print out the header
+        return_txt += divider_row
+        for idx,width in enumerate(col_space):
+            if idx in show_column:
+                return_txt += "|" + header[idx] + " "*(width-len(header[idx]))
+        return_txt += "|\n"+divider_header
+    
+        # Print out all rows
+        for row in rows:
+            rest = row[:]
+            need_next_line = len(col_space)
+            while need_next_line > 0:
+                need_next_line = len(col_space)
+                for idx,width in enumerate(col_space):      
+                    if idx in show_column:
+                        cur_line = ""
+                        if rest[idx] != "":
+                            if len(rest[idx]) > max_width:
+                                cur_line = rest[idx][:max_width]
+                                rest[idx] = rest[idx][max_width:]
+                            else:
+                                cur_line = rest[idx]
+                                rest[idx] = ""
+                                need_next_line -= 1
+                        else:
+                            need_next_line -= 1
+                        return_txt += "|" + cur_line + " "*(width-len(cur_line))
+                    else:
+                        need_next_line -= 1
+                return_txt += "|\n"
+            return_txt += divider_row
+        return return_txt
+    
+    def dat_dict(table):
+        """The ['<name_dat>',[<col_names>],[<widths>],[[<row1>],...]] list the baseline format_table takes."""
+        return [table.dat_name, list(table.col_names), [table.width(idx) for idx in range(len(table.col_names))], [list(row) for row in table.rows()]]
+    
+    def write_table_file(table,show_column):
+        """write_table to a temporary file."""
+        output = open(os.path.join(tmp_dir, "benchmark.txt"), 'w')
+        write_table(table,show_column,output.write)
+        output.close()
+    
+    tmp_dir = tempfile.mkdtemp()
+    dat_file = os.path.join(tmp_dir, "benchmark.dat")
+    no_filter = {'col_value':['filter_disable']}
+    renderers = [
+        ("format_table (baseline)", format_table_baseline, dat_dict),
+        ("format_table", format_table, None),
+        ("write_table to a file", write_table_file, None),
+        ]
+    rows = []
+    try:
+        for row_count in row_counts or (1000, 10000, 100000):
+            benchmark_dat_file(dat_file,row_count,6)
+            table = dat_table("benchmark","benchmark.dat",["id","log_time","message"],[0,1,5],dat_rows(dat_file,6,[0,1,5],no_filter))
+            for name,renderer,prepare in renderers:
+                data = prepare(table) if prepare else table
+                start = time.time()
+                renderer(data,[0,1,2])
+                elapsed = time.time() - start
+                rows.append([name, str(row_count), "%.3f" % elapsed, "%d" % (row_count / max(elapsed, 1e-9))])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return benchmark_table("Table rendering",["Renderer","Rows","Seconds","Rows per second"],rows)
+
+def benchmark_html_cells(row_count=100000):
+    """
+    Compare the per-cell cost of the HTML row renderers on synthetic audit_log and vm_dynamic tables.
+    
+    Parameters
+    ----------
+        row_count : int
+            Number of rows in each table.
+            
+    Returns
+    -------
+        result : str
+            Table of the elapsed time and nanoseconds per cell for every renderer and table.
+    
+    """
+    def write_rows_original(table,show_col,write):
+        """The per-cell loop of add_table before write_rows."""
+        shown_cell = ('<td>', '<td style=\"color: Red;\">', '<td style=\"color: Green;\">')
+        hidden_cell = ("<td style=\"display: none;\">", "<td style=\"display: none, color: Red;\">", "<td style=\"display: none, color: Green;\">")
+        cells = [shown_cell if idx in show_col else hidden_cell for idx in range(len(table.col_names))]
+        batch = []
+        for row in table.rows():
+            batch.append('<tr>')
+            for cell,grid in zip(cells,row):
+                if str(grid) == "Not a match":
+                    batch.append(cell[1] + grid + '</td>')
+                elif str(grid) == "Match":
+                    batch.append(cell[2] + grid + '</td>')
+                elif re.search("<*>",grid) != None:
+                    batch.append(cell[0] + str(grid).replace("<", "&lt;").replace(">", "&gt;") + '</td>')
+                else:
+                    batch.append(cell[0] + grid + '</td>')
+            batch.append('</tr>')
+            if len(batch) >= Html_builder.batch_size:
+                write("".join(batch))
+                batch = []
+        write("".join(batch))
+    
+    tmp_dir = tempfile.mkdtemp()
+    dat_file = os.path.join(tmp_dir, "benchmark.dat")
+    no_filter = {'col_value':['filter_disable']}
+    try:
+        benchmark_dat_file(dat_file,row_count,30)
+        audit_log = dat_table("public.audit_log","benchmark.dat",["col" + str(col) for col in range(30)],None,dat_rows(dat_file,30,list(range(30)),no_filter))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    vm_rows = ([str(idx), str(idx % 3)] + ['v' + str((idx * col) % 11) for col in range(2,53)] + ['vm-' + str(idx) + ' <prod> & "db"'] + [str(idx % 2)] * 6 for idx in range(row_count))
+    vm_dynamic = dat_table("public.vm_dynamic","benchmark.dat",["col" + str(col) for col in range(60)],None,vm_rows)
+    
+    builder = Html_builder([])
+    renderers = [
+        ("per-cell (original)", write_rows_original),
+        ("write_rows", builder.write_rows),
+        ]
+    rows = []
+    for name_table,table,show_col in [("audit_log",audit_log,[9,13]),("vm_dynamic",vm_dynamic,[0,1,53])]:
+        cell_num = len(table) * len(table.col_names)
+        for name,renderer in renderers:
+            output = []
+            start = time.time()
+            renderer(table,show_col,output.append)
+            elapsed = time.time() - start
+            rows.append([name_table, name, "%.3f" % elapsed, "%.0f" % (elapsed * 1e9 / max(cell_num, 1))])
+    return benchmark_table("HTML cells (" + str(row_count) + " rows)",["Table","Renderer","Seconds","ns per cell"],rows)
+
+benchmarks = {'dat_reader': benchmark_dat_reader,
+              'value_filter': benchmark_value_filter,
+              'table_memory': benchmark_table_memory,
+              'format_table': benchmark_format_table,
+              'html_cells': benchmark_html_cells}
+
+def main(argv=None):
+    """
+    Run a benchmark and print its table.
+    
+    Parameters
+    ----------
+        argv : list
+            The arguments without the program name: the benchmark name and its sizes, e.g. ['dat_reader', '1000000'].
+            
+    Returns
+    -------
+    None
+    
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of olvm_healthchecker.")
+    parser.add_argument('name', choices=sorted(benchmarks), help="the benchmark to run")
+    parser.add_argument('sizes', nargs='*', type=int, metavar='N', help="row counts and other sizes of the benchmark, see its docstring")
+    args = parser.parse_args(argv)
+    print(benchmarks[args.name](*args.sizes))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
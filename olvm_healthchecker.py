@@ -1,8 +1,33 @@
 import os
+import sys
+import errno
+import zlib
+import json
+import pickle
+import hashlib
+import mmap
+import time
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from fnmatch import fnmatchcase
+from array import array
 from operator import itemgetter
-from itertools import groupby
+from itertools import islice, chain
 from datetime import datetime
 import re
+import copy
+import argparse
+from functools import partial
+
+try:
+    read_input = raw_input
+except NameError:
+    read_input = input
 
 class result_storage:
     """
@@ -12,30 +37,81 @@ class result_storage:
     ----------
         command_storage : dict
             The dictionary to store all results.
-            The keys are are unique item names, values are the generated text results.
+            The keys are are unique item names, values are lists of segments: text, a tuple (<item name>,) that refers to another item,
+            or a tuple (<position>, <length>) of text in the spool file.
+            The text of an item is only joined when it is printed.
         command_table : list
             The list of all item names of command_storage.
         command_list_msg : list
             All messages that will be printed as an usage.
+        sections : report_sections
+            The sections that compute the results on demand, None if the results are added eagerly.
+        command_section : dict
+            The section that computes each declared item.
+        spool_dir : str
+            The directory of the spool file, the system temporary directory if None.
+        spool : file
+            The temporary file of the text written by append_spooled, None until it is first needed.
+        spool_lock : Lock
+            Guards spool, the tables of concurrent sections are written one after another.
             
     Methods
     -------
+        declare(self,section,commands)
+            Declare the items computed by a section, they are listed in the usage message before they are computed.
         add(self,command,text)
             Add an item to the dictionary command_storage.
         append(self,command,text)
             Add text to the end of the corresponding result in the dictionary.
+        include(self,command,child)
+            Add a reference to another item to the end of the corresponding result.
+        append_spooled(self,command,writer)
+            Add the text written by a function to the end of the corresponding result, the text is kept in the spool file.
+        read_spool(self,position,length)
+            Read text of the spool file in chunks.
+        segments(self,command)
+            Iterate over the text segments of an item, references are followed.
         get(self,command)
             Get the result of the given item name.
         print_command(self)
             Print the usage message.
+        write_all(self,write)
+            Write all results in the command_storage to a sink.
         print_all(self)
             Print all results in the command_storage.
     
     """
-    command_storage = {}
-    command_table = []
-    command_list_msg = []
-    def __init__(self): pass
+    spool_chunk_size = 1 << 20
+    
+    def __init__(self,sections=None,spool_dir=None):
+        self.command_storage = {}
+        self.command_table = []
+        self.command_list_msg = []
+        self.sections = sections
+        self.command_section = {}
+        self.spool_dir = spool_dir
+        self.spool = None
+        self.spool_lock = threading.Lock()
+
+    def declare(self,section,commands):
+        """
+        Declare the items computed by a section, they are listed in the usage message before they are computed.
+    
+        Parameters
+        ----------
+            section : str
+                The section name in self.sections.
+            commands : list
+                Item names added by the section.
+                
+        Returns
+        -------
+        None
+        
+        """
+        for command in commands:
+            self.add(command, "")
+            self.command_section[command] = section
 
     def add(self,command,text):
         """
@@ -53,9 +129,10 @@ class result_storage:
         None
         
         """
-        self.command_table.append(command)
-        self.command_storage[command] = text
-        self.command_list_msg.append(str(len(self.command_storage)-1) + ": " + command)
+        if command not in self.command_storage:
+            self.command_table.append(command)
+            self.command_list_msg.append(str(len(self.command_storage)) + ": " + command)
+        self.command_storage[command] = [text]
     
     def append(self,command,text):
         """
@@ -73,7 +150,102 @@ class result_storage:
         None
         
         """
-        self.command_storage[command] = self.command_storage[command] + text
+        self.command_storage[command].append(text)
+    def include(self,command,child):
+        """
+        Add a reference to another item to the end of the corresponding result, the child is not copied.
+    
+        Parameters
+        ----------
+            command : str
+                The item name that indicates which item in the dictionary is going to be updated.
+            child : str
+                The item name whose result is printed at this place.
+                
+        Returns
+        -------
+        None
+        
+        """
+        self.command_storage[command].append((child,))
+    def append_spooled(self,command,writer):
+        """
+        Add the text written by a function to the end of the corresponding result.
+        The text goes to the spool file as it is written, so large tables are never kept in memory as a whole.
+    
+        Parameters
+        ----------
+            command : str
+                The item name that indicates which item in the dictionary is going to be updated.
+            writer : function
+                Gets a write function and writes the text with it, e.g. partial(write_table,table,show_column).
+                
+        Returns
+        -------
+        None
+        
+        """
+        with self.spool_lock:
+            if self.spool is None:
+                self.spool = tempfile.TemporaryFile('w+', dir=self.spool_dir)
+            self.spool.seek(0, 2)
+            position = self.spool.tell()
+            length = [0]
+            def write(text):
+                self.spool.write(text)
+                length[0] += len(text)
+            writer(write)
+        self.command_storage[command].append((position, length[0]))
+    def read_spool(self,position,length):
+        """
+        Read text of the spool file in chunks.
+    
+        Parameters
+        ----------
+            position : int
+                The position of the text in the spool file, as returned by tell.
+            length : int
+                The number of characters of the text.
+                
+        Returns
+        -------
+            chunks : generator
+                The text in chunks of at most spool_chunk_size characters.
+        
+        """
+        while length > 0:
+            with self.spool_lock:
+                self.spool.seek(position)
+                chunk = self.spool.read(min(length, self.spool_chunk_size))
+                position = self.spool.tell()
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+    def segments(self,command):
+        """
+        Iterate over the text segments of an item, references are followed.
+    
+        Parameters
+        ----------
+            command : str
+                The item name.
+                
+        Returns
+        -------
+            segments : generator
+                The text segments in order.
+        
+        """
+        for segment in self.command_storage[command]:
+            if type(segment) is not tuple:
+                yield segment
+            elif len(segment) == 1:
+                for child_segment in self.segments(segment[0]):
+                    yield child_segment
+            else:
+                for chunk in self.read_spool(*segment):
+                    yield chunk
     def get(self,command):
         """
         Get the result of the given item name.
@@ -85,13 +257,15 @@ class result_storage:
                 
         Returns
         -------
-        None
+            result : str
+                The text of the item.
         
         """
-        return self.command_storage[command]
+        return "".join(self.segments(command))
     def print_command(self):
         """
         Print the usage message.
+        The section of the selected item is computed the first time it is selected, "Print all information" waits for all sections.
         """
         self.command_list_msg.append(str(len(self.command_storage)) + ": Print all information")
         self.command_list_msg.append(str(len(self.command_storage)+1) + ": Exit")
@@ -103,21 +277,51 @@ class result_storage:
         msg += "+" + "-"*max_width + "+\n"
         while(True):
             try:
-                num = int(raw_input(msg + "Please provide the number to get the corresponding information: "))
+                num = int(read_input(msg + "Please provide the number to get the corresponding information: "))
                 if num < 0 or num > len(self.command_storage)+1:
                     print("Please provide the number in the list.")
                 elif num == len(self.command_storage):
+                    if self.sections is not None:
+                        try:
+                            self.sections.compute_all()
+                        except Exception as error:
+                            print("A section failed, only the computed sections are printed: " + type(error).__name__ + ": " + str(error) + "\n")
                     print(self.print_all())
                 elif num == len(self.command_storage)+1:
-                    exit()
+                    return
                 else:                                                                                                           
-                    print(self.command_storage.get(self.command_table[num]))
-            except KeyboardInterrupt:
+                    if self.sections is not None:
+                        try:
+                            self.sections.compute(self.command_section[self.command_table[num]])
+                        except Exception as error:
+                            print("The section of " + self.command_table[num] + " failed: " + type(error).__name__ + ": " + str(error) + "\n")
+                            continue
+                    print(self.get(self.command_table[num]))
+            except (KeyboardInterrupt, EOFError):
                 print("\n")
-                exit()
+                return
             except ValueError:
                 print("Invalid input type, please try again.\n")
                 continue
+    def write_all(self,write):
+        """
+        Write all results in the command_storage to a sink segment by segment.
+    
+        Parameters
+        ----------
+            write : function
+                The write method of the sink, e.g. path.output_txt.write.
+        
+        Returns
+        -------
+        None
+        
+        """
+        for key in self.command_table:
+            if '-' not in key:
+                for segment in self.segments(key):
+                    write(segment)
+                write("\n\n\n")
     def print_all(self):
         """
         Print all results in the command_storage.
@@ -132,14 +336,219 @@ class result_storage:
                 The text of all values in command_storage.
         
         """
-        output_txt = ""
-        for key in self.command_table:
-            if '-' not in key:
-                output_txt += self.command_storage.get(key) + "\n\n\n"
+        output_txt = []
+        self.write_all(output_txt.append)
+        return "".join(output_txt)
+            
         
-        return output_txt
+
+class report_sections(object):
+    """
+    A class used to compute the sections of the report and their inputs as a task graph.
+    Every task is a function that is registered with the tasks it depends on, it gets their results as arguments.
+    A task is computed once, the first time it or a task depending on it is needed. compute_all runs every task in a
+    thread pool as soon as the tasks it depends on are computed, so independent tasks run concurrently.
+    
+    Attributes
+    ----------
+        order : list
+            Task names in the order of registration.
+        functions : dict
+            The function, the dependencies and the required tasks of each task, '<name>': [<function>,[<dependency names>],[<required names>]].
+        results : dict
+            The results of the computed tasks.
+        errors : dict
+            The exceptions of the tasks that failed, they are raised again for every task that needs them.
+        running : set
+            The tasks that are being computed.
+        condition : Condition
+            Guards results, errors and running, it is notified whenever a task is finished.
+        threads : int
+            Number of tasks compute_all runs at the same time, 1 to run them one after another in the order of registration.
+        filler : Thread
+            The thread computing the remaining tasks in the background, None if it is not started.
+        error : Exception
+            The exception that stopped the background thread, None if it finished or is not started.
+        stopped : bool
+            Whether compute_all stops starting tasks, see stop.
             
+    Methods
+    -------
+        register(self,name,function,dependencies=(),requires=())
+            Register a task.
+        compute(self,name)
+            Compute a task and its dependencies if they are not computed yet.
+        compute_all(self)
+            Compute all tasks, concurrently if threads is larger than 1.
+        fill(self,done=None)
+            Compute all tasks in a background thread.
+        wait(self)
+            Wait for the background thread.
+        stop(self)
+            Stop starting tasks in compute_all.
+        pending(self)
+            Get the tasks that are not computed yet.
+    
+    """
+    def __init__(self,threads=1):
+        self.order = []
+        self.functions = {}
+        self.results = {}
+        self.errors = {}
+        self.running = set()
+        self.condition = threading.Condition()
+        self.threads = threads
+        self.filler = None
+        self.error = None
+        self.stopped = False
+    
+    def register(self,name,function,dependencies=(),requires=()):
+        """
+        Register a task.
+    
+        Parameters
+        ----------
+            name : str
+                Task name.
+            function : function
+                Computes the task, it gets the results of the dependencies as arguments.
+            dependencies : list
+                Names of the tasks whose results are needed.
+            requires : list
+                Names of the tasks that only have to be computed first, e.g. the extraction of a file the task reads.
+                
+        Returns
+        -------
+        None
+        
+        """
+        self.order.append(name)
+        self.functions[name] = [function, list(dependencies), list(requires)]
+    
+    def compute(self,name):
+        """
+        Compute a task and its dependencies if they are not computed yet.
+        If another thread is computing the task, its result is waited for.
+    
+        Parameters
+        ----------
+            name : str
+                Task name.
+                
+        Returns
+        -------
+            result : 
+                The result of the task function.
+        
+        """
+        with self.condition:
+            while name in self.running:
+                self.condition.wait()
+            if name in self.errors:
+                raise self.errors[name]
+            if name in self.results:
+                return self.results[name]
+            self.running.add(name)
+        try:
+            function, dependencies, requires = self.functions[name]
+            for required in requires:
+                self.compute(required)
+            result = function(*[self.compute(dependency) for dependency in dependencies])
+        except Exception as error:
+            with self.condition:
+                self.errors[name] = error
+                self.running.discard(name)
+                self.condition.notify_all()
+            raise
+        with self.condition:
+            self.results[name] = result
+            self.running.discard(name)
+            self.condition.notify_all()
+        return result
+    
+    def compute_all(self):
+        """
+        Compute all tasks, a task is started in the thread pool as soon as the tasks it needs are computed.
+        Once stop is called no task is started, the tasks that are running are finished.
+        """
+        if self.threads <= 1:
+            for name in self.order:
+                if self.stopped:
+                    break
+                self.compute(name)
+            return
+        pool = ThreadPool(self.threads)
+        try:
+            waiting = list(self.order)
+            started = []
+            with self.condition:
+                while waiting and not self.stopped:
+                    finished = set(self.results) | set(self.errors)
+                    ready = [name for name in waiting if finished.issuperset(self.functions[name][1] + self.functions[name][2])]
+                    for name in ready:
+                        waiting.remove(name)
+                        started.append(pool.apply_async(self.compute, (name,)))
+                    if waiting:
+                        self.condition.wait()
+            for task in started:
+                task.get()
+        finally:
+            pool.close()
+            pool.join()
+    
+    def fill(self,done=None):
+        """
+        Compute all tasks in a background thread.
+        If a task fails, the exception is kept in error and done is still called.
+    
+        Parameters
+        ----------
+            done : function
+                Called in the background thread once all tasks are computed or one failed, e.g. to write the output files.
+                
+        Returns
+        -------
+        None
+        
+        """
+        def run():
+            try:
+                try:
+                    self.compute_all()
+                finally:
+                    if done is not None:
+                        done()
+            except Exception as error:
+                self.error = error
+        self.filler = threading.Thread(target=run)
+        # The thread does not keep the process alive, so a second Ctrl-C can exit while a section is running, see wait_report
+        self.filler.daemon = True
+        self.filler.start()
+    
+    def wait(self):
+        """Wait for the background thread, Ctrl-C interrupts the wait also on Python 2."""
+        if self.filler is not None:
+            while self.filler.is_alive():
+                self.filler.join(0.2)
+    
+    def stop(self):
+        """Stop starting tasks in compute_all, the tasks that are running are finished."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+    
+    def pending(self):
+        """
+        Get the tasks that are not computed yet.
+    
+        Returns
+        -------
+            names : list
+                Task names in the order of registration, with the tasks that are running.
         
+        """
+        with self.condition:
+            return [name for name in self.order if name not in self.results and name not in self.errors]
 
 class path_collection:
     """
@@ -159,15 +568,38 @@ class path_collection:
             The path of log-collector-data folder.
         sql_file : str
             The path of restore.sql.
+        copy_catalog : dict
+            Table of contents of the COPY commands in restore.sql, built once when the dump is loaded.
+            Structure of an item: "<name_table>": ['<name_dat>',['<col_names>']]
+            e.g. 'public.network': ['7459.dat', ['id', 'name', 'mtu']]
+        copy_columns : dict
+            Index of column names to the tables containing them, e.g. 'mtu': ['public.network', 'public.vds_interface']
         output_dir : str
             The directory of the output folder.
         output_path : str
             The path of the output folder.
         output_txt : str
             The path of the text folder in the output folder.
+        host_sosreports : dict
+            The sosreports of every host that has been looked up, see host_files.
+        extract_hosts : bool
+            Whether the host sosreports are extracted before they are read.
+        cache : result_cache
+            The persistent cache of parsed tables and host information.
+        dat_stats : dict
+            Statistics of the .dat files extracted on demand, see add_dat_stats, None until one is extracted.
+        dat_lock : Lock
+            Guards dat_stats, the tables are loaded concurrently.
     Methods
     -------
-    None
+        add_dat_stats(self,stats)
+            Add the statistics of a .dat file extraction to dat_stats.
+        dat_report(self)
+            Format dat_stats in one line.
+        host_files(self,host,members)
+            Get the sosreports of a host as sosreport_dir or sosreport_archive objects.
+        engine_files(self)
+            Get the engine sosreport as a sosreport_dir or sosreport_archive object.
     
     
     """
@@ -177,11 +609,16 @@ class path_collection:
     sosreport_engine = ""
     log_collector_data = ""
     sql_file = ""
+    copy_catalog = {}
+    copy_columns = {}
     output_dir = ""
     output_path = ""
     output_txt = ""
+    host_sosreports = {}
+    extract_hosts = False
+    cache = None
     
-    def __init__(self,sosreport_path,output_dir,dt_string):
+    def __init__(self,sosreport_path,output_dir,dt_string,sql_scan='stream',extract_hosts=False,cache_dir=None,database=True):
         """
         Constructs a collection of useful path for the given directory.
 
@@ -193,22 +630,39 @@ class path_collection:
                 The path of the output folder.
             dt_string : str
                 The current local date and time.
+            sql_scan : str
+                How restore.sql is scanned for COPY headers, 'stream' (line by line) or 'mmap' (memory-mapped).
+                Neither mode keeps the contents of restore.sql in memory.
+            extract_hosts : bool
+                Extract the host sosreports (only the files the report needs) instead of reading them straight from the archives.
+            cache_dir : str
+                The directory of the persistent cache of parsed tables and host information, no cache if None.
+            database : bool
+                Extract the database sosreport and restore.sql and read the COPY catalog, they are not needed if no table is read.
                 
         """
-      #  if str(os.path.basename(sosreport_path)).endswith(".tar.xz"):
-       #     os.system("cd "+ os.path.dirname(sosreport_path) + "; tar -xf " + os.path.basename(sosreport_path))
-        #    sosreport_path = sosreport_path[:str(sosreport_path).find(".tar.xz")]
-        
         self.sosreport_filename = os.path.basename(sosreport_path)
         date_str = str(self.sosreport_filename).partition("-LogCollector-")[2]
+        self.sosreport_date = []
         self.sosreport_date.append(date_str[:4])
         self.sosreport_date.append(date_str[4:6])
         self.sosreport_date.append(date_str[6:8])
         self.output_dir = output_dir
         
+        self.host_sosreports = {}
+        self.host_lock = threading.Lock()
+        self.engine_sosreport = None
+        self.extract_hosts = extract_hosts
+        self.cache = result_cache(cache_dir)
+        self.dat_stats = None
+        self.dat_lock = threading.Lock()
+        
         # log_collector_data and sosreport_engine
         # parent_folder = os.path.join(os.getcwd(), sosreport)
-        for file_name in os.listdir(sosreport_path):
+        bundle_files = os.listdir(sosreport_path)
+        for file_name in bundle_files:
+            if str(file_name).endswith(".md5") or (str(file_name).endswith(".tar.xz") and file_name[:-len(".tar.xz")] in bundle_files):
+                continue # The engine sosreport is already extracted
             if file_name == 'log-collector-data':
                 if self.log_collector_data != "":
                     print("There are more than one log-collector-data.")
@@ -232,129 +686,879 @@ class path_collection:
             os.mkdir(os.path.join(self.output_dir, "olvm_healthchecker_output_" + date_str))
         
         
-        # Untar sosreport in log-collector-data
-        untar(self.log_collector_data, 'sosreport', 'tar.xz')
-        files_with_date = list(filter(lambda x: x.find(self.sosreport_date[0]+"-"+self.sosreport_date[1]+"-"+self.sosreport_date[2]) != -1, os.listdir(self.log_collector_data)))
-        if len(files_with_date) == 0:
-            print("No sosreport in the log-collector-data folder.")
-        else:
-            for file_name in files_with_date:
-                if not str(file_name).endswith(".tar.xz") and not str(file_name).endswith(".md5"):
-                    self.sosreport = os.path.join(self.log_collector_data,file_name)
-        if self.sosreport == "":
-            print("sosreport in log-collector-data was not untarred successfully.")
-        
-        # Untar pgdump-scl-rh-postgresql10 in postgresql
-        untar(os.path.join(self.sosreport,"sos_commands","postgresql"), 'pgdump', 'tar')
-        
-        # restore.sql:
-        sosreport_log = list(filter(lambda x: x.startswith('sosreport-'), os.listdir(self.log_collector_data)))
-        if len(sosreport_log) != 1:
-            print("Correct start path not given. Please input again.")
-        else:
-            # restore_sql = open(os.path.join(self.log_collector_data, sosreport_log[0], "sos_commands", "postgresql", "pgdump-scl-rh-postgresql10", "restore.sql"))
-            restore_sql = open(os.path.join(self.log_collector_data, sosreport_log[0], "sos_commands", "postgresql", "restore.sql"))
-            self.sql_file = restore_sql.read()
-            restore_sql.close()
-            # return sql_file
+        self.copy_catalog = {}
+        self.copy_columns = {}
+        if database:
+            # Untar sosreport in log-collector-data
+            untar(self.log_collector_data, 'sosreport', 'tar.xz', [os.path.join("sos_commands","postgresql","*")])
+            files_with_date = list(filter(lambda x: x.find(self.sosreport_date[0]+"-"+self.sosreport_date[1]+"-"+self.sosreport_date[2]) != -1, os.listdir(self.log_collector_data)))
+            if len(files_with_date) == 0:
+                print("No sosreport in the log-collector-data folder.")
+            else:
+                for file_name in files_with_date:
+                    if not str(file_name).endswith(".tar.xz") and not str(file_name).endswith(".md5"):
+                        self.sosreport = os.path.join(self.log_collector_data,file_name)
+            if self.sosreport == "":
+                print("sosreport in log-collector-data was not untarred successfully.")
+        
+            # Untar pgdump-scl-rh-postgresql10 in postgresql
+            # Untar restore.sql in pgdump-scl-rh-postgresql10, the .dat files are extracted by dat_info when they are needed
+            untar(os.path.join(self.sosreport,"sos_commands","postgresql"), 'pgdump', 'tar', ['restore.sql'])
+        
+            # restore.sql:
+            sosreport_log = list(filter(lambda x: x.startswith('sosreport-') and not x.endswith('.tar.xz') and not x.endswith('.md5'), os.listdir(self.log_collector_data)))
+            if len(sosreport_log) != 1:
+                print("Correct start path not given. Please input again.")
+            else:
+                # restore_sql = open(os.path.join(self.log_collector_data, sosreport_log[0], "sos_commands", "postgresql", "pgdump-scl-rh-postgresql10", "restore.sql"))
+                self.sql_file = os.path.join(self.log_collector_data, sosreport_log[0], "sos_commands", "postgresql", "restore.sql")
+                cache_key = self.cache.key([self.sql_file], 'copy_catalog')
+                cached = self.cache.get(cache_key)
+                if cached is None:
+                    cached = copy_catalog(self.sql_file,sql_scan)
+                    self.cache.put(cache_key, cached)
+                self.copy_catalog, self.copy_columns = cached
+                # return sql_file
         
         # Output - txt:
         self.output_txt = open(os.path.join(self.output_path, "olvm_healthchecker_" + dt_string + ".txt"), 'w')
+    
+    def host_files(self,host,members=None):
+        """
+        Get the sosreports of a host, read from the extracted directory or straight from the .tar.xz if it is not extracted.
+        
+        Parameters
+        ----------
+            host : str
+                Host name, which is also the folder name in log-collector-data.
+            members : list
+                Patterns of the files that will be read, they are loaded in the single pass that indexes an archive. See member_wanted.
+                
+        Returns
+        -------
+            sosreports : list
+                sosreport_dir or sosreport_archive objects, one for each sosreport of the host.
+        
+        """
+        with self.host_lock:
+            return self.find_host_files(host,members)
+    
+    def find_host_files(self,host,members):
+        """Look up the sosreports of a host once, see host_files."""
+        if host not in self.host_sosreports:
+            host_dir = os.path.join(self.log_collector_data, str(host))
+            host_name = host[:str(host).find(".")]
+            sosreports = []
+            if os.path.isdir(host_dir):
+                host_files = sorted(os.listdir(host_dir))
+                for file in host_files:
+                    if not str(file).startswith("sosreport-" + host_name) or str(file).endswith(".md5"):
+                        continue
+                    if not str(file).endswith(".tar.xz"):
+                        sosreports.append(sosreport_dir(os.path.join(host_dir, file)))
+                    elif file[:-len(".tar.xz")] not in host_files:
+                        sosreports.append(sosreport_archive(os.path.join(host_dir, file), members))
+            self.host_sosreports[host] = sosreports
+        return self.host_sosreports[host]
+    
+    def engine_files(self):
+        """
+        Get the engine sosreport, read from the extracted directory or straight from the .tar.xz.
+        
+        Returns
+        -------
+            sosreport : sosreport_dir or sosreport_archive
+        
+        """
+        if self.engine_sosreport is None:
+            if str(self.sosreport_engine).endswith(".tar.xz"):
+                self.engine_sosreport = sosreport_archive(self.sosreport_engine, ["installed-rpms", os.path.join("sos_commands","ovirt","*")])
+            else:
+                self.engine_sosreport = sosreport_dir(self.sosreport_engine)
+        return self.engine_sosreport
+    
+    def add_dat_stats(self,stats):
+        """
+        Add the statistics of a .dat file extraction to dat_stats, so the extractions of all tables are reported once.
+        
+        Parameters
+        ----------
+            stats : dict
+                Statistics of the extraction from extract_archive.
+                
+        Returns
+        -------
+        None
+        
+        """
+        with self.dat_lock:
+            if self.dat_stats is None:
+                self.dat_stats = {'archive':stats['archive'], 'extracted_files':0, 'extracted_bytes':0, 'seconds':0.0}
+            for key in ['extracted_files', 'extracted_bytes', 'seconds']:
+                self.dat_stats[key] += stats[key]
+    
+    def dat_report(self):
+        """
+        Format dat_stats in one line.
+        
+        Returns
+        -------
+            report : str
+                e.g. 'pgdump-scl-rh-postgresql10.tar: extracted 12 .dat files (1.3 MB) on demand in 0.4s.', None if no .dat file was extracted.
+        
+        """
+        if self.dat_stats is None or not self.dat_stats['extracted_files']:
+            return None
+        return self.dat_stats['archive'] + ": extracted " + str(self.dat_stats['extracted_files']) + " .dat files (" + format_size(self.dat_stats['extracted_bytes']) + ") on demand in " + "%.1fs" % self.dat_stats['seconds'] + "."
 
 
-class Html_builder:
+class sosreport_dir:
     """
-    A class used to build a HTML file with elements.
+    A class used to read files of an extracted sosreport.
     
     Attributes
     ----------
-        tabs : list
-            List of the HTML class attributes for all tabs.
-        element_html : list
-            List for element in HTML file, including:
-                - table with information fetched from restore.sql.
-                - div with information fetched from specific directory for different hosts.
-        table_counter : int
-            Number of tables that is used to assign different id for each table.
-        style : str
-            Style sheet to HTML file.
-        script : str
-            Functions written by JavaScript code.
-        
+        root : str
+            The path of the extracted sosreport.
+        files : dict
+            Index of the files looked up in the sosreport and whether they exist.
+    
     Methods
     -------
-        add_table(self,class_att,name_info,name_table,header,rows,show_col)
-            Add a table element to the Html_builder object.
-        add_collapsible(self,class_att_button,class_att_content,text)
-            Add a collapsible button to the Html_builder object.
-        add_div(self,class_att,text)
-            Add a <div> section to the Html_builder object.
-        generate_file(self)
-            Generate an HTML file with all elements.
+        isfile(self,name)
+            Check if the file exists in the sosreport.
+        read(self,name)
+            Read the whole file.
+        readlines(self,name)
+            Read the file as a list of lines.
+        sources(self,names)
+            Get the source files of the given files for the cache.
     
     """
-    tabs = []
-    element_html = []
-    table_counter = 0
-    styles = "<style>\
-                /* Hide scrollbar for Chrome, Safari and Opera */\
-                    .tabcontent::-webkit-scrollbar {\
-                    display: none;\
-                }\
-                /* Hide scrollbar for IE, Edge and Firefox */\
-                .tabcontent {\
-                    -ms-overflow-style: none;  /* IE and Edge */\
-                    scrollbar-width: none;  /* Firefox */\
-                }\
-                table {\
-                    font-family: arial, sans-serif;\
-                    border-collapse: collapse;\
-                    width: 100%;\
-                    overflow:scroll;\
-                }\
-                /* Style the table */\
-                td,th {\
-                    border: 1px solid #dddddd;\
-                    text-align: left;\
-                    padding: 8px;\
-                }\
-                tr:nth-child(even){\
-                    background-color: #dddddd;\
-                }\
-                /* Style the tab */\
-                .tab {\
-                    overflow: hidden;\
-                    border: 1px solid #ccc;\
-                    background-color: #f1f1f1;\
-                }\
-                /* Style the buttons inside the tab */\
-                .tab button {\
-                    background-color: inherit;\
-                    float: left;\
-                    border: none;\
-                    outline: none;\
-                    cursor: pointer;\
-                    padding: 14px 16px;\
-                    transition: 0.3s;\
-                    font-size: 17px;\
-                }\
-                /* Change background color of buttons on hover */\
-                .tab button:hover {\
-                    background-color: #ddd;\
-                }\
-                /* Change background color of active tab button */\
-                .tab button.active_tab {\
-                    background-color: #ccc;\
-                }\
-                /* Style the tab content */\
-                .tabcontent {\
-                    display: none;\
-                    padding: 6px 12px;\
-                    border: 1px solid #ccc;\
-                    border-top: none;\
-                    overflow:scroll;\
-                }\
-                /* Style the collapsible button */\
+    root = ""
+    files = {}
+    
+    def __init__(self,root):
+        self.root = root
+        self.files = {}
+    
+    def path(self,name):
+        """Get the full path of a file in the sosreport, used in messages."""
+        return os.path.join(self.root, name)
+    
+    def isfile(self,name):
+        """Check if the file exists in the sosreport, name is relative to the top directory, e.g. 'installed-rpms'."""
+        if name not in self.files:
+            self.files[name] = os.path.isfile(os.path.join(self.root, name))
+        return self.files[name]
+    
+    def read(self,name):
+        """Read the whole file."""
+        info_file = open(os.path.join(self.root, name))
+        try:
+            return info_file.read()
+        finally:
+            info_file.close()
+    
+    def readlines(self,name):
+        """Read the file as a list of lines."""
+        return self.read(name).splitlines(True)
+    
+    def sources(self,names):
+        """Get the paths of the given files that exist, used as the sources of cache entries."""
+        return [os.path.join(self.root, name) for name in names if self.isfile(name)]
+
+
+class sosreport_archive:
+    """
+    A class used to read files of a sosreport straight from its .tar.xz without extracting it.
+    The member index is built once in a single pass over the archive, the files matching
+    the given patterns are kept in memory during that pass so reading them needs no more decompression.
+    
+    Attributes
+    ----------
+        archive : str
+            The path of the .tar.xz.
+        members : list
+            Patterns of the files loaded while indexing, see member_wanted.
+        index : dict
+            The members of the archive by their path relative to the top directory, built on first use.
+        contents : dict
+            The contents of the loaded files.
+        extracted : sosreport_dir
+            The sosreport extracted with the tar command when tarfile cannot read the archive
+            (e.g. .tar.xz on Python 2), the files are read from it. None if the archive is read directly.
+    
+    Methods
+    -------
+        isfile(self,name)
+            Check if the file exists in the sosreport.
+        read(self,name)
+            Read the whole file.
+        readlines(self,name)
+            Read the file as a list of lines.
+        sources(self,names)
+            Get the source files of the given files for the cache.
+    
+    """
+    archive = ""
+    members = []
+    index = None
+    contents = {}
+    extracted = None
+    
+    def __init__(self,archive,members=None):
+        self.archive = archive
+        self.members = members or []
+        self.index = None
+        self.contents = {}
+        self.extracted = None
+        self.lock = threading.Lock()
+    
+    def build_index(self):
+        """Index all members and load the wanted files in a single pass over the archive."""
+        if not tar_readable(self.archive):
+            self.extract()
+            return
+        index = {}
+        links = set()
+        try:
+            tar = tarfile.open(self.archive, 'r|*')
+            try:
+                for member in tar:
+                    name = member.name.partition("/")[2]
+                    index[name] = member
+                    if member.issym():
+                        if member_wanted(member.name,self.members):
+                            links.add(os.path.normpath(os.path.join(os.path.dirname(name), member.linkname)))
+                    elif member.isfile() and (name in links or member_wanted(member.name,self.members)):
+                        self.contents[name] = tar.extractfile(member).read()
+            finally:
+                tar.close()
+        except (tarfile.CompressionError, tarfile.ReadError):
+            # The compression is not supported by this Python (e.g. no lzma module)
+            self.contents = {}
+            self.extract()
+            return
+        self.index = index
+    
+    def extract(self):
+        """Extract the archive next to it with the tar command and read the files from the extracted directory."""
+        root = re.sub(r"\.tar(\.\w+)?$", "", self.archive)
+        if not os.path.isdir(root):
+            extract_with_tar(self.archive, os.path.dirname(self.archive))
+        self.extracted = sosreport_dir(root)
+        self.index = {}
+    
+    def fallback(self):
+        """Build the index if it is not built yet, get the extracted sosreport if the archive cannot be read directly."""
+        with self.lock:
+            if self.index is None:
+                self.build_index()
+        return self.extracted
+    
+    def resolve(self,name):
+        """Get the member of a file, following symbolic links inside the archive."""
+        self.fallback()
+        name = os.path.normpath(name)
+        for _ in range(10):
+            member = self.index.get(name)
+            if member is None or not member.issym():
+                return name, member
+            name = os.path.normpath(os.path.join(os.path.dirname(name), member.linkname))
+        return name, None
+    
+    def path(self,name):
+        """Get the path of a file in the archive, used in messages."""
+        if self.extracted is not None:
+            return self.extracted.path(name)
+        return self.archive + ":" + name
+    
+    def isfile(self,name):
+        """Check if the file exists in the sosreport, name is relative to the top directory, e.g. 'installed-rpms'."""
+        if self.fallback() is not None:
+            return self.extracted.isfile(name)
+        member = self.resolve(name)[1]
+        return member is not None and member.isfile()
+    
+    def read(self,name):
+        """Read the whole file, IOError with errno ENOENT if it is not in the archive, like reading a missing file of sosreport_dir."""
+        if self.fallback() is not None:
+            return self.extracted.read(name)
+        name, member = self.resolve(name)
+        data = self.contents.get(name)
+        if data is None:
+            if member is None or not member.isfile():
+                raise IOError(errno.ENOENT, "No such file in " + self.archive, name)
+            # Not loaded while indexing, read it by seeking in the archive
+            tar = tarfile.open(self.archive)
+            try:
+                data = tar.extractfile(tar.getmember(member.name)).read()
+            finally:
+                tar.close()
+            self.contents[name] = data
+        if not isinstance(data, str):
+            data = data.decode('utf-8', 'replace')
+        return data
+    
+    def readlines(self,name):
+        """Read the file as a list of lines."""
+        return self.read(name).splitlines(True)
+    
+    def sources(self,names):
+        """Get the archive itself, used as the source of cache entries."""
+        return [self.archive]
+
+
+class result_cache:
+    """
+    A class used as a persistent on-disk cache of parsed tables and fetched host information.
+    Entries are stored as compressed pickles keyed by the fingerprint of their source files,
+    the least recently used entries are removed when the cache is larger than its size limit.
+    
+    Attributes
+    ----------
+        cache_dir : str
+            The directory of the cache, the cache is disabled if it is None.
+        max_size : int
+            The largest total size of the cache in bytes.
+        sample_size : int
+            Number of bytes hashed at the beginning and the end of every source file.
+    
+    Methods
+    -------
+        key(self,sources,*params)
+            Build the key of an entry from its source files and parameters.
+        get(self,key)
+            Get an entry, None if it is not cached.
+        put(self,key,value)
+            Store an entry and remove the least recently used entries.
+    
+    """
+    cache_dir = None
+    max_size = 1 << 30
+    sample_size = 1 << 20
+    
+    def __init__(self,cache_dir,max_size=1 << 30):
+        """
+        Constructs the cache in the given directory.
+
+        Parameters
+        ----------
+            cache_dir : str
+                The directory of the cache, e.g. ~/.cache/olvm_healthchecker. None disables the cache.
+            max_size : int
+                The largest total size of the cache in bytes.
+                
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except EnvironmentError as error:
+                print("The cache is disabled, cannot create " + cache_dir + ": " + str(error))
+                self.cache_dir = None
+    
+    def fingerprint(self,source):
+        """Fingerprint a source file by its size, mtime and the hash of its first and last bytes."""
+        stat = os.stat(source)
+        digest = hashlib.sha1()
+        digest.update((source + "\0" + str(stat.st_size) + "\0" + repr(stat.st_mtime)).encode('utf-8'))
+        if os.path.isfile(source):
+            source_file = open(source, 'rb')
+            try:
+                digest.update(source_file.read(self.sample_size))
+                if stat.st_size > 2*self.sample_size:
+                    source_file.seek(-self.sample_size, os.SEEK_END)
+                    digest.update(source_file.read(self.sample_size))
+            finally:
+                source_file.close()
+        return digest.hexdigest()
+    
+    def key(self,sources,*params):
+        """
+        Build the key of an entry.
+        
+        Parameters
+        ----------
+            sources : list
+                Paths of the files the entry is computed from.
+            params : any
+                Everything else the entry depends on, e.g. the name of the function and its filter information.
+                
+        Returns
+        -------
+            key : str
+                The key of the entry, None if the cache is disabled or a source file does not exist.
+        
+        """
+        if self.cache_dir is None:
+            return None
+        # Python 2 and 3 pickle strings differently, they don't share entries
+        digest = hashlib.sha1(repr((sys.version_info[0],) + params).encode('utf-8'))
+        try:
+            for source in sources:
+                digest.update(self.fingerprint(source).encode('utf-8'))
+        except EnvironmentError:
+            return None
+        return digest.hexdigest()
+    
+    def get(self,key):
+        """Get an entry, None if it is not cached."""
+        if key is None:
+            return None
+        entry = os.path.join(self.cache_dir, key)
+        try:
+            entry_file = open(entry, 'rb')
+            try:
+                value = pickle.loads(zlib.decompress(entry_file.read()))
+            finally:
+                entry_file.close()
+            os.utime(entry, None) # Mark as recently used
+        except EnvironmentError:
+            return None
+        except Exception:
+            # Unreadable entry, e.g. truncated or written by another version, it is dropped and treated as a miss
+            try:
+                os.remove(entry)
+            except EnvironmentError:
+                pass
+            return None
+        return value
+    
+    def put(self,key,value):
+        """Store an entry and remove the least recently used entries if the cache is too large."""
+        if key is None:
+            return
+        entry = os.path.join(self.cache_dir, key)
+        try:
+            entry_file = tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=".tmp-", delete=False)
+            try:
+                entry_file.write(zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL), 1))
+            finally:
+                entry_file.close()
+            os.rename(entry_file.name, entry)
+        except EnvironmentError as error:
+            print("Cannot write the cache entry " + entry + ": " + str(error))
+            return
+        self.evict()
+    
+    def evict(self):
+        """Remove the least recently used entries until the cache is not larger than max_size."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except EnvironmentError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum([entry[1] for entry in entries])
+        for mtime, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total_size -= size
+            except EnvironmentError:
+                pass
+
+
+class dat_table(object):
+    """
+    A class used to store a table fetched from a .dat file column by column.
+    Every column is dictionary encoded while it is built: each distinct value is stored once and the rows
+    keep small integer codes. Columns with mostly distinct values are stored as plain lists of the values.
+    Column widths are computed when they are first needed.
+    
+    Attributes
+    ----------
+        name_table : str
+            Table name in restore.sql, e.g. 'public.vds_static'.
+        dat_name : str
+            The .dat file of the table, e.g. '7459.dat'.
+        col_names : list
+            Names of the kept columns.
+        col_index : list
+            Indexes in restore.sql of the kept columns.
+        row_num : int
+            Number of rows.
+        dictionaries : list
+            The distinct values of every dictionary encoded column, None for plain columns.
+        columns : list
+            An array of codes for dictionary encoded columns, a list of values for plain columns.
+        widths : list
+            The largest printed size in each column, see visible_text, None if it is not computed yet.
+    
+    Methods
+    -------
+        values(self,pos)
+            Get all values of a column by its position in the table.
+        column(self,col)
+            Get all values of a column by its index in restore.sql.
+        rows(self)
+            Iterate over the rows as tuples.
+        width(self,pos)
+            Get the largest printed size in a column.
+        has_control(self,pos)
+            Check if a column has control characters that are rendered by visible_text.
+        sort(self,pos)
+            Sort the rows by a column.
+        reorder(self,order)
+            Put the rows in the given order.
+        merge(self,other)
+            Get a table with the columns of both tables.
+        to_data(self)
+            Get the table as plain data for the persistent cache.
+        from_data(cls,data)
+            Build a table from the plain data of to_data.
+    
+    """
+    __slots__ = ('name_table','dat_name','col_names','col_index','row_num','dictionaries','columns','widths')
+    chunk_size = 8192
+    
+    def __init__(self,name_table,dat_name,col_names,col_index=None,rows=()):
+        """
+        Constructs the table from rows, the rows are consumed in chunks so they can be a generator.
+
+        Parameters
+        ----------
+            name_table : str
+                Table name in restore.sql, e.g. 'public.vds_static'.
+            dat_name : str
+                The .dat file of the table, e.g. '7459.dat'.
+            col_names : list
+                Names of the columns in the rows.
+            col_index : list
+                Indexes in restore.sql of the columns in the rows, range(len(col_names)) if None.
+            rows : iterable
+                Tuples or lists of values, e.g. [('0', 'Storage', '9000'), ('1', 'ovirtmgmt', '9000')].
+                
+        """
+        self.name_table = name_table
+        self.dat_name = dat_name
+        self.col_names = list(col_names)
+        self.col_index = list(col_index) if col_index is not None else list(range(len(col_names)))
+        self.row_num = 0
+        self.dictionaries = [[] for _ in self.col_names]
+        self.columns = [array('I') for _ in self.col_names]
+        self.widths = [None]*len(self.col_names)
+        
+        lookups = [{} for _ in self.col_names]
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.row_num += len(chunk)
+            for pos,values in enumerate(zip(*chunk)):
+                lookup = lookups[pos]
+                dictionary = self.dictionaries[pos]
+                for value in dict.fromkeys(values):
+                    if value not in lookup:
+                        lookup[value] = len(dictionary)
+                        dictionary.append(value)
+                self.columns[pos].extend(map(lookup.__getitem__, values))
+        
+        for pos,dictionary in enumerate(self.dictionaries):
+            codes = self.columns[pos]
+            if len(dictionary) * 2 > self.row_num:
+                # Mostly distinct values, the codes cost more than they save
+                self.columns[pos] = list(map(dictionary.__getitem__, codes))
+                self.dictionaries[pos] = None
+            elif len(dictionary) <= 1 << 8:
+                self.columns[pos] = array('B', codes)
+            elif len(dictionary) <= 1 << 16:
+                self.columns[pos] = array('H', codes)
+    
+    def __len__(self):
+        return self.row_num
+    
+    def values(self,pos):
+        """Get all values of a column by its position in the table."""
+        if self.dictionaries[pos] is None:
+            return self.columns[pos]
+        return list(map(self.dictionaries[pos].__getitem__, self.columns[pos]))
+    
+    def column(self,col):
+        """Get all values of a column by its index in restore.sql, it has to be one of the kept columns."""
+        return self.values(self.col_index.index(col))
+    
+    def rows(self):
+        """Iterate over the rows as tuples."""
+        columns = []
+        for pos,column in enumerate(self.columns):
+            if self.dictionaries[pos] is None:
+                columns.append(column)
+            else:
+                columns.append(map(self.dictionaries[pos].__getitem__, column))
+        return zip(*columns)
+    
+    def width(self,pos):
+        """Get the largest printed size in a column, only the distinct values are measured for encoded columns."""
+        if self.widths[pos] is None:
+            values = self.columns[pos] if self.dictionaries[pos] is None else self.dictionaries[pos]
+            if self.has_control(pos):
+                values = map(visible_text, values)
+            self.widths[pos] = max(chain([0], map(len, values)))
+        return self.widths[pos]
+    
+    def has_control(self,pos):
+        """Check if a column has control characters that are rendered by visible_text, only the distinct values are checked for encoded columns."""
+        values = self.columns[pos] if self.dictionaries[pos] is None else self.dictionaries[pos]
+        return any(map(text_control.search, values))
+    
+    def sort(self,pos):
+        """Sort the rows by a column, the sort is stable. The order of the rows is returned for reorder."""
+        keys = self.values(pos)
+        order = sorted(range(self.row_num), key=keys.__getitem__)
+        self.reorder(order)
+        return order
+    
+    def reorder(self,order):
+        """Put the rows in the given order, e.g. the order sort returned for another table of the same rows."""
+        for idx,column in enumerate(self.columns):
+            if isinstance(column, array):
+                self.columns[idx] = array(column.typecode, map(column.__getitem__, order))
+            else:
+                self.columns[idx] = list(map(column.__getitem__, order))
+    
+    def merge(self,other):
+        """
+        Get a table with the columns of both tables ordered by their index in restore.sql.
+        
+        Parameters
+        ----------
+            other : dat_table
+                A table of the same rows in the same order with other columns.
+                
+        Returns
+        -------
+            table : dat_table
+                The table, its columns are shared with both tables and not copied.
+        
+        """
+        sources = sorted([(col, self, pos) for pos,col in enumerate(self.col_index)] + [(col, other, pos) for pos,col in enumerate(other.col_index)], key=itemgetter(0))
+        table = dat_table(self.name_table,self.dat_name,[])
+        table.row_num = self.row_num
+        table.col_index = [col for col, source, pos in sources]
+        table.col_names = [source.col_names[pos] for col, source, pos in sources]
+        table.dictionaries = [source.dictionaries[pos] for col, source, pos in sources]
+        table.columns = [source.columns[pos] for col, source, pos in sources]
+        table.widths = [source.widths[pos] for col, source, pos in sources]
+        return table
+    
+    def to_data(self):
+        """
+        Get the table as plain data, so cache entries don't depend on how this module was loaded (script or import).
+        
+        Returns
+        -------
+            data : dict
+                The names, the dictionaries and the columns, the code arrays are stored as (<typecode>, <bytes>).
+        
+        """
+        columns = []
+        for column in self.columns:
+            if isinstance(column, array):
+                columns.append((column.typecode, column.tobytes() if hasattr(column, 'tobytes') else column.tostring()))
+            else:
+                columns.append(list(column))
+        return {'name_table': self.name_table, 'dat_name': self.dat_name, 'col_names': self.col_names, 'col_index': self.col_index,
+                'row_num': self.row_num, 'dictionaries': self.dictionaries, 'columns': columns}
+    
+    @classmethod
+    def from_data(cls,data):
+        """
+        Build a table from the plain data of to_data.
+        
+        Parameters
+        ----------
+            data : dict
+                The plain data of a table.
+                
+        Returns
+        -------
+            table : dat_table
+                The table.
+        
+        """
+        table = cls(data['name_table'],data['dat_name'],data['col_names'],data['col_index'])
+        table.row_num = data['row_num']
+        table.dictionaries = list(data['dictionaries'])
+        table.columns = []
+        for column in data['columns']:
+            if isinstance(column, tuple):
+                codes = array(str(column[0]))
+                if hasattr(codes, 'frombytes'):
+                    codes.frombytes(column[1])
+                else:
+                    codes.fromstring(column[1])
+                table.columns.append(codes)
+            else:
+                table.columns.append(column)
+        return table
+
+
+html_escapes = [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ("\"", "&quot;"), ("'", "&#x27;")]
+
+def html_escape(text):
+    """
+    Escape the HTML special characters &, <, >, " and ' in a text.
+
+    Parameters
+    ----------
+        text : str
+            The text.
+            
+    Returns
+    -------
+        text : str
+            The escaped text.
+    
+    """
+    for char,entity in html_escapes:
+        if char in text:
+            text = text.replace(char, entity)
+    return text
+
+def escape_column(values):
+    """
+    Escape a column of values in bulk, the values are joined with NUL, escaped once and split again.
+    PostgreSQL text has no NUL, but a COPY escape like \\000 decodes to one, such columns are escaped value by value.
+
+    Parameters
+    ----------
+        values : list
+            The values of the column.
+            
+    Returns
+    -------
+        escaped : list
+            The escaped values.
+    
+    """
+    if len(values) == 0:
+        return []
+    joined = "\x00".join(values)
+    if joined.count("\x00") != len(values) - 1:
+        return [html_escape(value) for value in values]
+    return html_escape(joined).split("\x00")
+
+class Html_builder:
+    """
+    A class used to build a HTML file with elements.
+    When it is given the path of the HTML file, the file is opened up front and every element is written as soon as it is added,
+    otherwise the elements are kept in element_html until generate_file.
+    
+    Attributes
+    ----------
+        tabs : list
+            List of the HTML class attributes for all tabs.
+        element_html : list
+            List for element in HTML file, it stays empty when the elements are streamed, including:
+                - table with information fetched from restore.sql.
+                - div with information fetched from specific directory for different hosts.
+        html : file
+            The HTML file the elements are streamed to, or the temporary file of a part, None if they are kept in element_html.
+        table_mode : str
+            'rows' to write the tables as <tr> rows, 'json' to embed the table data as JSON that is rendered with virtual scrolling.
+        page_size : int
+            Size budget in bytes of a table or div in the streamed HTML file, larger ones are moved to page files that the HTML file links to.
+            None to keep every element in the HTML file.
+        table_counter : int
+            Number of tables that is used to assign different id for each table.
+        id_prefix : str
+            Prefix of the table and div ids, it keeps the ids of the parts of different sections apart.
+        style : str
+            Style sheet to HTML file.
+        script : str
+            Functions written by JavaScript code.
+        
+    Methods
+    -------
+        write_head(self,html)
+            Write the head of the HTML file and the tab buttons.
+        add_element(self,text)
+            Write an element to the HTML file or keep it in element_html.
+        add_table(self,class_att,name_info,table,show_col)
+            Add a table element to the Html_builder object.
+        write_rows(self,table,show_col,write)
+            Write the <tr> rows of a table.
+        write_json(self,table,show_col,table_id,write)
+            Write a table as JSON data and a virtual scrolling viewport.
+        add_collapsible(self,class_att_button,class_att_content,text)
+            Add a collapsible button to the Html_builder object.
+        add_div(self,class_att,text)
+            Add a <div> section to the Html_builder object.
+        part(self,name)
+            Create an Html_builder that writes the elements of one section to a temporary file until they are added with add_part.
+        add_part(self,part)
+            Add the elements of a part to the Html_builder object.
+        generate_file(self,html_file)
+            Generate an HTML file with all elements.
+    
+    """
+    batch_size = 1024
+    styles = "<style>\
+                /* Hide scrollbar for Chrome, Safari and Opera */\
+                    .tabcontent::-webkit-scrollbar {\
+                    display: none;\
+                }\
+                /* Hide scrollbar for IE, Edge and Firefox */\
+                .tabcontent {\
+                    -ms-overflow-style: none;  /* IE and Edge */\
+                    scrollbar-width: none;  /* Firefox */\
+                }\
+                table {\
+                    font-family: arial, sans-serif;\
+                    border-collapse: collapse;\
+                    width: 100%;\
+                    overflow:scroll;\
+                }\
+                /* Style the table */\
+                td,th {\
+                    border: 1px solid #dddddd;\
+                    text-align: left;\
+                    padding: 8px;\
+                }\
+                tr:nth-child(even){\
+                    background-color: #dddddd;\
+                }\
+                /* Style the tab */\
+                .tab {\
+                    overflow: hidden;\
+                    border: 1px solid #ccc;\
+                    background-color: #f1f1f1;\
+                }\
+                /* Style the buttons inside the tab */\
+                .tab button {\
+                    background-color: inherit;\
+                    float: left;\
+                    border: none;\
+                    outline: none;\
+                    cursor: pointer;\
+                    padding: 14px 16px;\
+                    transition: 0.3s;\
+                    font-size: 17px;\
+                }\
+                /* Change background color of buttons on hover */\
+                .tab button:hover {\
+                    background-color: #ddd;\
+                }\
+                /* Change background color of active tab button */\
+                .tab button.active_tab {\
+                    background-color: #ccc;\
+                }\
+                /* Style the tab content */\
+                .tabcontent {\
+                    display: none;\
+                    padding: 6px 12px;\
+                    border: 1px solid #ccc;\
+                    border-top: none;\
+                    overflow:scroll;\
+                }\
+                /* Style the collapsible button */\
                 .collapsible {\
                     background-color: #777;\
                     color: white;\
@@ -415,8 +1619,79 @@ class Html_builder:
             }\
             </script>"
             
+    json_styles = "<style>\
+                /* Virtual scrolling viewport of JSON tables */\
+                .vviewport {\
+                    max-height: 600px;\
+                    overflow: auto;\
+                }\
+                .vviewport th {\
+                    position: sticky;\
+                    top: 0;\
+                    background-color: #f1f1f1;\
+                }\
+                .vviewport td {\
+                    white-space: nowrap;\
+                    max-width: 40em;\
+                    overflow: hidden;\
+                    text-overflow: ellipsis;\
+                }\
+            </style>"
+    
+    json_script = "<script>\
+            var vtable_row_height = 33;\
+            function vtable_data(tbl) {\
+                if (!tbl.vdata) tbl.vdata = JSON.parse(document.getElementById(tbl.id+'_data').textContent);\
+                return tbl.vdata;\
+            }\
+            function vtable_render(tbl) {\
+                var data = vtable_data(tbl);\
+                var view = tbl.firstChild;\
+                var first = Math.max(0, Math.floor(view.scrollTop / vtable_row_height) - 10);\
+                var last = Math.min(data.rows, first + Math.ceil(Math.max(view.clientHeight, 600) / vtable_row_height) + 20);\
+                var body = document.createElement('tbody');\
+                var spacer = body.insertRow(-1);\
+                spacer.style.height = (first * vtable_row_height) + 'px';\
+                for (var row = first; row < last; row++) {\
+                    var tr = body.insertRow(-1);\
+                    for (var col = 0; col < data.columns.length; col++) {\
+                        var value = data.dictionaries[col] ? data.dictionaries[col][data.columns[col][row]] : data.columns[col][row];\
+                        var td = tr.insertCell(-1);\
+                        td.className = 'c' + col;\
+                        td.textContent = value;\
+                        td.title = value;\
+                        if (value === 'Match') td.style.color = 'Green';\
+                        else if (value === 'Not a match') td.style.color = 'Red';\
+                    }\
+                }\
+                spacer = body.insertRow(-1);\
+                spacer.style.height = ((data.rows - last) * vtable_row_height) + 'px';\
+                var table = view.getElementsByTagName('table')[0];\
+                table.replaceChild(body, table.tBodies[0]);\
+            }\
+            function vtable_show() {\
+                var tbls = document.getElementsByClassName('vtable');\
+                for (var i = 0; i < tbls.length; i++) {\
+                    if (tbls[i].offsetParent !== null && !tbls[i].vrendered) {\
+                        tbls[i].vrendered = true;\
+                        tbls[i].firstChild.onscroll = function() { vtable_render(this.parentNode); };\
+                        vtable_render(tbls[i]);\
+                    }\
+                }\
+            }\
+            document.addEventListener('click', function() { setTimeout(vtable_show, 0); });\
+            function json_column(id_of_table, col_no, do_show) {\
+                var tbl = document.getElementById(id_of_table);\
+                var hidden = JSON.parse(tbl.getAttribute('data-hidden'));\
+                col_no = parseInt(col_no);\
+                hidden = hidden.filter(function(col) { return col !== col_no; });\
+                if (!do_show) hidden.push(col_no);\
+                tbl.setAttribute('data-hidden', JSON.stringify(hidden));\
+                document.getElementById(id_of_table+'_style').textContent = hidden.map(function(col) { return '#'+id_of_table+' .c'+col+' {display: none;}'; }).join('');\
+            }\
+            </script>"
             
-    def __init__(self,tabs):
+    def __init__(self,tabs,html_file=None,table_mode='rows',page_size=None):
         """
         Constructs all the necessary attributes for the Html_builder object.
 
@@ -424,10 +1699,72 @@ class Html_builder:
         ----------
             tabs : list
                 List of the HTML class attributes for all tabs.
+            html_file : str
+                Path of the HTML file to stream the elements to, None to keep them until generate_file.
+            table_mode : str
+                'rows' to write the tables as <tr> rows, 'json' to embed the table data as JSON that is rendered with virtual scrolling.
+            page_size : int
+                Size budget in bytes of a table or div, larger ones are moved to page files next to html_file. None to disable.
         """
         self.tabs = tabs
+        self.table_mode = table_mode
+        self.page_size = page_size if html_file is not None else None
+        self.element_html = []
+        self.table_counter = 0
+        self.div_counter = 0
+        self.id_prefix = ""
+        self.html = None
+        self.html_file = html_file
+        if html_file is not None:
+            self.html = open(html_file, 'w')
+            self.write_head(self.html)
     
-    def add_table(self,class_att,name_info,name_table,header,rows,show_col):
+    def write_head(self,html):
+        """
+        Write the head of the HTML file and the tab buttons.
+
+        Parameters
+        ----------
+            html : file
+                The HTML file.
+                
+        Returns
+        -------
+        None
+        
+        """
+        head = self.styles + self.script
+        if self.table_mode == 'json':
+            head += self.json_styles + self.json_script
+        html.write('<html><head>' + head + '</head><body><h1>OLVM Report</h1>')
+        tab_div = "<div class=\"tab\">"
+        
+        for tab in self.tabs:
+            tab_div += "<button class=\"tablinks\" onclick=\"openTab(event, '"+tab.replace(" ","")+"')\">"+tab+"</button>"
+        tab_div += "</div>"
+                    
+        html.write(tab_div)
+    
+    def add_element(self,text):
+        """
+        Write an element to the HTML file or keep it in element_html.
+
+        Parameters
+        ----------
+            text : str
+                The HTML of the element.
+                
+        Returns
+        -------
+        None
+        
+        """
+        if self.html is not None:
+            self.html.write(text)
+        else:
+            self.element_html.append(text)
+    
+    def add_table(self,class_att,name_info,table,show_col):
         """
         Add a table element to the Html_builder object.
 
@@ -438,12 +1775,8 @@ class Html_builder:
                 There are two kinds of attribute: <Tab name> or <Tab name>_<Database | Hosts | Hosted_Engine>, the former will be shown when tab clicked, the latter will be shown when the collapsible button clicked
             name_info : str
                 Table name that indicates the information or purpose of the table, e.g. 'KVM Hosts'
-            name_table: str
-                Table name in restore.sql, e.g. 'public.vds_static'
-            header : list
-                List of column names of the table.
-            rows : list
-                List of all row entries of the table.
+            table : dat_table
+                The table, its name_table is the table name in restore.sql, e.g. 'public.vds_static'
             show_col : list
                 List of the column indexes that need to be shown when the HTML file is created
                 
@@ -453,54 +1786,139 @@ class Html_builder:
         
         """
         
+        name_table = table.name_table
+        header = table.col_names
         self.table_counter += 1
-        table_str = "<div class=\"tabcontent "+class_att+"\"><h3>"+name_info+"</h3><h5>(This table is fetched from "+name_table+" table in restore.sql)</h5>"
+        table_id = self.id_prefix+"table_id_"+str(self.table_counter)
+        if self.html is not None:
+            write = self.html.write
+        else:
+            table_str = []
+            write = table_str.append
         
         # Filter button
-        table_str += '<form><label>Column filter:</label><select name=filter_col_no>'
-        for idx,col in enumerate(header):
-            table_str += '<option value=\''+str(idx)+'\'>' + col + '</option>'
-        table_str += '</select>'
-        table_str += "<input type='button' onClick=\"javascript:show_hide_column('table_id_"+str(self.table_counter)+"',filter_col_no.value,  true);\" value='show'>\
-                  <input type='button' onClick=\"javascript:show_hide_column('table_id_"+str(self.table_counter)+"',filter_col_no.value, false);\" value='hide'></form>"
+        show_hide = 'json_column' if self.table_mode == 'json' else 'show_hide_column'
+        options = "".join(['<option value=\''+str(idx)+'\'>' + col + '</option>' for idx,col in enumerate(header)])
+        title = "<h3>"+name_info+"</h3><h5>(This table is fetched from "+name_table+" table in restore.sql)</h5>"
+        form = '<form><label>Column filter:</label><select name=filter_col_no>' + options + '</select>' \
+              + "<input type='button' onClick=\"javascript:"+show_hide+"('"+table_id+"',filter_col_no.value,  true);\" value='show'>\
+                  <input type='button' onClick=\"javascript:"+show_hide+"('"+table_id+"',filter_col_no.value, false);\" value='hide'></form>"
         
         # Header
-        table_str += '<table id=\'table_id_'+str(self.table_counter)+'\'><tr>'
-        for idx,col in enumerate(header):
-            if idx in show_col:
-                table_str += '<th>' + col + '</th>'
+        table_open = form + '<table id=\''+table_id+'\'><tr>' + "".join([('<th>' if idx in show_col else "<th style=\"display: none;\">") + col + '</th>' for idx,col in enumerate(header)]) + '</tr>'
+        if self.table_mode == 'json':
+            write("<div class=\"tabcontent "+class_att+"\">" + title + form)
+            self.write_json(table,show_col,table_id,write)
+            write('</div>')
+        elif self.page_size:
+            # Rows, the table is moved to page files if it is larger than the size budget
+            pages = html_pages(self,table_id,title,table_open,'</table>')
+            self.write_rows(table,show_col,pages.write)
+            pages.close("<div class=\"tabcontent "+class_att+"\">" + title,'</div>')
+        else:
+            write("<div class=\"tabcontent "+class_att+"\">" + title + table_open)
+            
+            # Rows
+            self.write_rows(table,show_col,write)
+            write('</table></div>')
+        if self.html is None:
+            self.element_html.append("".join(table_str))
+    
+    def write_rows(self,table,show_col,write):
+        """
+        Write the <tr> rows of a table.
+        Every column is escaped in bulk and the rows are filled into a row template built from per-column cell templates.
+        Dictionary encoded columns are rendered once per distinct value.
+
+        Parameters
+        ----------
+            table : dat_table
+                The table.
+            show_col : list
+                List of the column indexes that need to be shown when the HTML file is created
+            write : function
+                The write method of the HTML file or the append method of a list.
+                
+        Returns
+        -------
+        None
+        
+        """
+        # Cell templates of the shown and hidden columns: (<td>, <td> of "Not a match", <td> of "Match")
+        shown_cell = ('<td>', '<td style=\"color: Red;\">', '<td style=\"color: Green;\">')
+        hidden_cell = ("<td style=\"display: none;\">", "<td style=\"display: none, color: Red;\">", "<td style=\"display: none, color: Green;\">")
+        
+        def render_cells(cell,values):
+            """Render whole <td> cells, "Match" and "Not a match" are colored."""
+            opening = {"Not a match": cell[1], "Match": cell[2]}
+            return [opening.get(value, cell[0]) + escaped + '</td>' for value,escaped in zip(values, escape_column(values))]
+        
+        templates = []
+        column_chunks = []
+        for pos in range(len(table.col_names)):
+            cell = shown_cell if pos in show_col else hidden_cell
+            column = table.columns[pos]
+            if table.dictionaries[pos] is not None:
+                rendered = render_cells(cell, table.dictionaries[pos])
+                templates.append("%s")
+                column_chunks.append(lambda start,end,column=column,rendered=rendered: map(rendered.__getitem__, column[start:end]))
+            elif "Match" in column or "Not a match" in column:
+                templates.append("%s")
+                column_chunks.append(lambda start,end,column=column,cell=cell: render_cells(cell, column[start:end]))
             else:
-                table_str += "<th style=\"display: none;\">" + col + "</th>"
-        table_str += '</tr>'
-        
-        # Rows
-        for row in rows:
-            table_str += '<tr>'
-            for idx,grid in enumerate(row):
-                if idx in show_col:
-                    if str(grid) == "Not a match":
-                        table_str += '<td style=\"color: Red;\">' + grid + '</td>'
-                    elif str(grid) == "Match":
-                        table_str += '<td style=\"color: Green;\">' + grid + '</td>'
-                    else:
-                        if re.search("<*>",grid) != None:
-                            table_str += '<td>' + str(grid).replace("<", "&lt;").replace(">", "&gt;") + '</td>'
-                        else:
-                            table_str += '<td>' + grid + '</td>'
-                else:
-                    if str(grid) == "Not a match":
-                        table_str += "<td style=\"display: none, color: Red;\">" + grid + "</td>"
-                    elif str(grid) == "Match":
-                        table_str += "<td style=\"display: none, color: Green;\">" + grid + "</td>"
-                    else:
-                        if re.search("<*>",grid) != None:
-                            table_str += "<td style=\"display: none;\">" + str(grid).replace("<", "&lt;").replace(">", "&gt;") + "</td>"
-                        else:
-                            table_str += "<td style=\"display: none;\">" + grid + "</td>"
-            table_str += '</tr>'
+                templates.append(cell[0] + "%s</td>")
+                column_chunks.append(lambda start,end,column=column: escape_column(column[start:end]))
+        row_template = '<tr>' + "".join(templates) + '</tr>'
         
-        table_str += '</table></div>'
-        self.element_html.append(table_str)
+        if not column_chunks:
+            write(row_template * len(table))
+            return
+        for start in range(0, len(table), self.batch_size):
+            end = start + self.batch_size
+            write("".join([row_template % row for row in zip(*[chunk(start,end) for chunk in column_chunks])]))
+    
+    def write_json(self,table,show_col,table_id,write):
+        """
+        Write a table as JSON data and a virtual scrolling viewport.
+        The data is stored column by column with the dictionaries of the dictionary encoded columns, the browser only
+        builds the rows in view and hides columns with a per-table style sheet instead of walking the cells.
+
+        Parameters
+        ----------
+            table : dat_table
+                The table.
+            show_col : list
+                List of the column indexes that need to be shown when the HTML file is opened
+            table_id : str
+                HTML id of the table.
+            write : function
+                The write method of the HTML file or the append method of a list.
+                
+        Returns
+        -------
+        None
+        
+        """
+        def dumps(value):
+            """JSON that can't close the <script> element."""
+            return json.dumps(value, separators=(',', ':')).replace("</", "<\\/")
+        
+        header = table.col_names
+        hidden = [idx for idx in range(len(header)) if idx not in show_col]
+        write("<style id=\""+table_id+"_style\">" + "".join(["#"+table_id+" .c"+str(idx)+" {display: none;}" for idx in hidden]) + "</style>"
+              + "<div class=\"vtable\" id=\""+table_id+"\" data-hidden=\""+dumps(hidden)+"\"><div class=\"vviewport\"><table><thead><tr>"
+              + "".join(["<th class=\"c"+str(idx)+"\">" + html_escape(col) + "</th>" for idx,col in enumerate(header)])
+              + "</tr></thead><tbody></tbody></table></div></div>")
+        
+        # Data, the columns are written in slices so no column is serialized as a whole
+        write("<script type=\"application/json\" id=\""+table_id+"_data\">{\"rows\":" + str(len(table)) + ",\"dictionaries\":" + dumps(table.dictionaries) + ",\"columns\":[")
+        for pos,column in enumerate(table.columns):
+            write("," if pos else "")
+            write("[")
+            for start in range(0, len(column), self.batch_size):
+                write(("," if start else "") + dumps(list(column[start:start+self.batch_size]))[1:-1])
+            write("]")
+        write("]}</script>")
     
     def add_collapsible(self,class_att_button,class_att_content,text):
         """
@@ -521,7 +1939,7 @@ class Html_builder:
         
         """
         
-        self.element_html.append("<button type=\"button\" class=\"tabcontent collapsible "+class_att_button+"\" onClick=\"javascript:openCollapsible('"+class_att_button+"','"+class_att_content+"');\">"+text+"</button>")
+        self.add_element("<button type=\"button\" class=\"tabcontent collapsible "+class_att_button+"\" onClick=\"javascript:openCollapsible('"+class_att_button+"','"+class_att_content+"');\">"+text+"</button>")
     
     def add_div(self,class_att,text):
         """
@@ -540,33 +1958,433 @@ class Html_builder:
         
         """
         
-        self.element_html.append("<div class=\"tabcontent "+class_att+"\" style=\"white-space: pre-wrap;\">"+text+"</div>")
+        if self.page_size and len(text) > self.page_size:
+            # The div is moved to page files, it is split at line ends
+            self.div_counter += 1
+            pages = html_pages(self,self.id_prefix+"div_id_"+str(self.div_counter),"<h3>"+class_att.replace("_"," ")+"</h3>","<div style=\"white-space: pre-wrap;\">","</div>")
+            start = 0
+            while start < len(text):
+                end = text.find("\n", start + 65536)
+                end = len(text) if end == -1 else end + 1
+                pages.write(text[start:end])
+                start = end
+            pages.close("<div class=\"tabcontent "+class_att+"\">","</div>")
+            return
+        self.add_element("<div class=\"tabcontent "+class_att+"\" style=\"white-space: pre-wrap;\">"+text+"</div>")
     
-    def generate_file(self,dt_string):
+    def part(self,name):
         """
-        Generate an HTML file with all elements.
+        Create an Html_builder that writes the elements of one section to a temporary file next to the HTML file,
+        so sections can be built concurrently and copied to the HTML file in the order of the tabs without keeping them in memory.
         
         Parameters
         ----------
-            dt_string : str
-                    The current local date and time.
+            name : str
+                    Section name, its ids are prefixed with it, e.g. 'KVM Hosts'.
                     
+        Returns
+        -------
+            part : Html_builder
+                    An Html_builder with the same table mode and size budget, it keeps its elements in element_html if there is no HTML file.
+        
         """
-        html = open(os.path.join(path.output_path, "olvm_healthchecker_"+dt_string+".html"), 'w')
-        html.write('<html><head>' + self.styles + self.script+'</head><body><h1>OLVM Report</h1>')
-        tab_div = "<div class=\"tab\">"
+        part = Html_builder(self.tabs,table_mode=self.table_mode)
+        part.html_file = self.html_file
+        part.page_size = self.page_size
+        part.id_prefix = name.replace(" ","")+"_"
+        if self.html_file is not None:
+            part.html = tempfile.TemporaryFile('w+', dir=os.path.dirname(self.html_file) or None)
+        return part
+    
+    def add_part(self,part):
+        """
+        Add the elements of a part to the Html_builder object, the temporary file of the part is copied and closed.
         
-        for tab in self.tabs:
-            tab_div += "<button class=\"tablinks\" onclick=\"openTab(event, '"+tab.replace(" ","")+"')\">"+tab+"</button>"
-        tab_div += "</div>"
+        Parameters
+        ----------
+            part : Html_builder
+                    The part created by part.
                     
-        html.write(tab_div)
-        for ele in self.element_html:
-            html.write(ele)
+        Returns
+        -------
+        None
+        
+        """
+        if part.html is not None:
+            part.html.seek(0)
+            if self.html is not None:
+                shutil.copyfileobj(part.html, self.html)
+            else:
+                self.element_html.append(part.html.read())
+            part.html.close()
+            part.html = None
+        for ele in part.element_html:
+            self.add_element(ele)
+        part.element_html = []
+    
+    def generate_file(self,html_file):
+        """
+        Generate an HTML file with all elements, or finish the streamed HTML file.
+        
+        Parameters
+        ----------
+            html_file : str
+                    The path of the HTML file, only used if the elements are kept in memory.
+                    
+        """
+        html = self.html
+        if html is None:
+            html = open(html_file, 'w')
+            self.write_head(html)
+            for ele in self.element_html:
+                html.write(ele)
         
         html.write('</body></html>')
+        html.close()
+        self.html = None
+    
+class html_pages(object):
+    """
+    A class used to write a table or div of the HTML file that may be moved to page files.
+    The content is kept in memory until it grows above the size budget of the Html_builder, then it is written to page files
+    of about that size and the HTML file only gets links to them.
+    
+    Attributes
+    ----------
+        builder : Html_builder
+            The Html_builder of the HTML file.
+        name : str
+            Name of the element used in the page file names, e.g. 'table_id_3'.
+        title : str
+            HTML shown on top of every page.
+        page_open : str
+            HTML that opens the content on every page, e.g. the <table> and its header.
+        page_close : str
+            HTML that closes the content on every page, e.g. '</table>'.
+        buffer : list
+            The content written before the size budget is reached.
+        size : int
+            Size of the content in the buffer or in the current page.
+        pages : list
+            File names of the pages.
+        page : file
+            The current page file, None while the content is in the buffer.
+    
+    Methods
+    -------
+        write(self,text)
+            Write a part of the content, pages are only split between parts.
+        new_page(self)
+            Finish the current page file and start the next one.
+        close(self,element_open,element_close)
+            Add the element to the HTML file, with the content or with the links to the pages.
+    
+    """
+    def __init__(self,builder,name,title,page_open,page_close):
+        self.builder = builder
+        self.name = name
+        self.title = title
+        self.page_open = page_open
+        self.page_close = page_close
+        self.buffer = []
+        self.size = 0
+        self.pages = []
+        self.page = None
+    
+    def write(self,text):
+        """Write a part of the content, pages are only split between parts."""
+        if self.page is None:
+            self.buffer.append(text)
+            self.size += len(text)
+            if self.size > self.builder.page_size:
+                size = self.size
+                self.new_page()
+                self.page.write("".join(self.buffer))
+                self.size = size
+                self.buffer = []
+            return
+        if self.size > self.builder.page_size:
+            self.new_page()
+        self.page.write(text)
+        self.size += len(text)
+    
+    def new_page(self):
+        """Finish the current page file and start the next one."""
+        if self.page is not None:
+            self.page.write(self.page_close + '</body></html>')
+            self.page.close()
+        name = os.path.splitext(self.builder.html_file)[0] + "_" + self.name + "_" + str(len(self.pages)+1) + ".html"
+        self.pages.append(os.path.basename(name))
+        self.page = open(name, 'w')
+        self.page.write('<html><head>' + self.builder.styles + self.builder.script + '</head><body>' + self.title + self.page_open)
+        self.size = 0
+    
+    def close(self,element_open,element_close):
+        """
+        Add the element to the HTML file, with the content or with the links to the pages.
+
+        Parameters
+        ----------
+            element_open : str
+                HTML that opens the element in the HTML file.
+            element_close : str
+                HTML that closes the element in the HTML file.
+                
+        Returns
+        -------
+        None
+        
+        """
+        if self.page is None:
+            self.builder.add_element(element_open + self.page_open + "".join(self.buffer) + self.page_close + element_close)
+            return
+        self.page.write(self.page_close + '</body></html>')
+        self.page.close()
+        self.page = None
+        links = " ".join(["<a href=\"" + name + "\" target=\"_blank\">" + str(idx+1) + "</a>" for idx,name in enumerate(self.pages)])
+        count = "1 page" if len(self.pages) == 1 else str(len(self.pages)) + " pages"
+        self.builder.add_element(element_open + "<p>This section is larger than the size budget, it is moved to " + count + ": " + links + "</p>" + element_close)
+
+copy_header = re.compile(br"COPY\s+(\S+)\s*\(([^)]*)\)\s+FROM\s+'[^']*?([^'/]+\.dat)'")
+
+def copy_headers(sql_file,sql_scan='stream'):
+    """
+    Yield the COPY headers in restore.sql without reading the whole file into memory.
+    
+    Parameters
+    ----------
+        sql_file : str
+            The path of restore.sql.
+        sql_scan : str
+            'stream' reads the file line by line and only matches lines starting with COPY,
+            'mmap' memory-maps the file and scans it with one regular expression.
+            
+    Returns
+    -------
+        command : generator
+            Regular expression matches of COPY ... FROM '$$PATH$$/<name_dat>' headers.
+    
+    """
+    restore_sql = open(sql_file, 'rb')
+    try:
+        if sql_scan == 'mmap' and os.fstat(restore_sql.fileno()).st_size > 0:
+            sql_map = mmap.mmap(restore_sql.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for command in copy_header.finditer(sql_map):
+                    yield command
+            finally:
+                sql_map.close()
+        else:
+            for line in restore_sql:
+                if line.startswith(b'COPY '):
+                    command = copy_header.match(line)
+                    if command is not None:
+                        yield command
+    finally:
+        restore_sql.close()
+
+def copy_catalog(sql_file,sql_scan='stream'):
+    """
+    Build a table of contents of all COPY commands in restore.sql in a single pass.
+    
+    Parameters
+    ----------
+        sql_file : str
+            The path of restore.sql.
+        sql_scan : str
+            How restore.sql is scanned, 'stream' or 'mmap'. See copy_headers.
+            
+    Returns
+    -------
+        catalog : dict
+            Dictionary of all tables with a .dat file.
+            Structure of an item: "<name_table>": ['<name_dat>',['<col_names>']]
+            e.g. 'public.network': ['7459.dat', ['id', 'name', 'mtu']]
+        columns : dict
+            Dictionary of all column names and the tables containing them.
+            e.g. 'mtu': ['public.network', 'public.vds_interface']
+    
+    """
+    catalog = {}
+    columns = {}
+    for command in copy_headers(sql_file,sql_scan):
+        name_table = command.group(1).decode('utf-8')
+        col_names = [x.strip() for x in command.group(2).decode('utf-8').split(',')]
+        catalog[name_table] = [command.group(3).decode('utf-8'),col_names]
+        for col_name in col_names:
+            columns.setdefault(col_name, []).append(name_table)
+    return catalog, columns
+
+def format_size(size):
+    """Format a number of bytes, e.g. '1.5 GB'."""
+    for unit in ['B','KB','MB','GB']:
+        if size < 1024 or unit == 'GB':
+            break
+        size /= 1024.0
+    return ("%d " if unit == 'B' else "%.1f ") % size + unit
+
+def member_wanted(name,members):
+    """
+    Check if an archive member matches the patterns of the members to extract.
+    
+    Parameters
+    ----------
+        name : str
+            The member name in the archive, e.g. 'sosreport-kvm1-2021-06-16-abc/sos_commands/rpm/...'.
+        members : list
+            Patterns (fnmatch) relative to the top directory of the archive, e.g. ['sos_commands/postgresql/*'].
+            
+    Returns
+    -------
+        wanted : bool
+    
+    """
+    relative = name.partition("/")[2]
+    for pattern in members:
+        if fnmatchcase(name, pattern) or fnmatchcase(relative, pattern):
+            return True
+    return False
+
+def extract_archive(archive,dest,members=None):
+    """
+    Extract the members of an archive that match the given patterns, in a single pass for compressed archives.
+    Members with absolute paths, '..' components, or paths that lead outside dest through an extracted link are skipped,
+    like GNU tar does, also on Pythons without the tarfile data filter.
+    
+    Parameters
+    ----------
+        archive : str
+            The path of the archive, e.g. '.../sosreport-kvm1-2021-06-16-abc.tar.xz'.
+        dest : str
+            The directory to extract to.
+        members : list
+            Patterns of the members to extract, see member_wanted. All members are extracted if None.
+            
+    Returns
+    -------
+        stats : dict
+            Number of files and bytes extracted and skipped, e.g.
+            {'archive': 'a.tar.xz', 'extracted_files': 12, 'extracted_bytes': 80312, 'skipped_files': 30201, 'skipped_bytes': 2147483648, 'seconds': 3.2, 'write_seconds': 0.01}
+    
+    """
+    start = time.time()
+    stats = {'archive':os.path.basename(archive), 'extracted_files':0, 'extracted_bytes':0, 'skipped_files':0, 'skipped_bytes':0, 'seconds':0.0, 'write_seconds':0.0}
+    extract_options = {'filter':'data'} if hasattr(tarfile, 'data_filter') else {}
+    # Plain tar files are read by seeking from header to header, compressed ones are streamed once
+    tar = tarfile.open(archive, 'r:' if archive.endswith('.tar') else 'r|*')
+    links = {} # Link targets of the wanted links that are not extracted yet
+    seen = set()
+    dest_root = os.path.realpath(dest)
+    try:
+        for member in tar:
+            seen.add(member.name)
+            wanted = members is None or member.name in links or member_wanted(member.name,members)
+            if not wanted or member.isdir():
+                if member.isfile():
+                    stats['skipped_files'] += 1
+                    stats['skipped_bytes'] += member.size
+                continue
+            target = os.path.join(dest, member.name)
+            if not member_safe(member,dest_root):
+                print("Skipped " + member.name + " from " + archive + ", it would be extracted outside " + dest + ".")
+                continue
+            if member.isfile() and os.path.isfile(target) and os.path.getsize(target) == member.size:
+                continue # Already extracted by an earlier run
+            if member.issym() or member.islnk():
+                link = member.linkname if member.islnk() else os.path.normpath(os.path.join(os.path.dirname(member.name), member.linkname))
+                if link not in seen:
+                    links[link] = member.name
+            write_start = time.time()
+            part_file = None
+            try:
+                if member.isfile():
+                    # Written under a temporary name and renamed, so a file that exists is complete even if a run was interrupted
+                    part = copy.copy(member)
+                    part.name = member.name + ".part"
+                    part_file = os.path.join(dest, part.name)
+                    tar.extract(part, dest, **extract_options)
+                    os.rename(part_file, target)
+                else:
+                    tar.extract(member, dest, **extract_options)
+            except (tarfile.TarError, EnvironmentError) as error:
+                print("Cannot extract " + member.name + " from " + archive + ": " + str(error))
+                if part_file is not None and os.path.isfile(part_file):
+                    os.remove(part_file)
+                continue
+            stats['write_seconds'] += time.time() - write_start
+            stats['extracted_files'] += 1
+            stats['extracted_bytes'] += member.size
+    finally:
+        tar.close()
+    stats['seconds'] = time.time() - start
+    return stats
+
+def member_safe(member,dest_root):
+    """
+    Check that a member of an archive is extracted inside the destination directory.
+    
+    Parameters
+    ----------
+        member : TarInfo
+            The member.
+        dest_root : str
+            The real path of the destination directory.
+            
+    Returns
+    -------
+        safe : bool
+            False for absolute paths, '..' components and paths whose directory resolves outside dest_root,
+            e.g. through a symbolic link extracted before. Hard links have to point inside dest_root too.
+    
+    """
+    def inside(name):
+        real = os.path.realpath(os.path.join(dest_root, name))
+        return real == dest_root or real.startswith(dest_root.rstrip(os.sep) + os.sep)
+    names = [member.name]
+    if member.islnk():
+        names.append(member.linkname)
+    for name in names:
+        if os.path.isabs(name) or '..' in name.replace('\\', '/').split('/') or not inside(os.path.dirname(name)):
+            return False
+    return not member.islnk() or inside(member.linkname)
+
+def tar_readable(archive):
+    """Check if tarfile can decompress an archive, Python 2 has no .tar.xz support and reads it as a broken plain tar."""
+    return not archive.endswith('.xz') or 'xz' in tarfile.TarFile.OPEN_METH
+
+def extract_with_tar(archive,dest):
+    """
+    Extract a whole archive with the tar command, used when tarfile cannot decompress it.
+    
+    Parameters
+    ----------
+        archive : str
+            The path of the archive.
+        dest : str
+            The directory to extract to.
+            
+    Returns
+    -------
+        status : int
+            The exit status of tar, 0 on success.
     
-def untar(path,head,tail):
+    """
+    # No shell is involved, so the paths are passed to tar as they are
+    status = subprocess.call(["tar", "-xf", os.path.abspath(archive)], cwd=dest)
+    if status != 0:
+        print("tar could not extract " + archive + ".")
+    return status
+
+def extract_report(stats):
+    """Format the bytes and time saved by a selective extraction."""
+    report = stats['archive'] + ": extracted " + str(stats['extracted_files']) + " of " + str(stats['extracted_files']+stats['skipped_files']) + " files (" + format_size(stats['extracted_bytes']) + ") in " + "%.1fs" % stats['seconds']
+    if stats['skipped_files']:
+        report += ", skipped " + format_size(stats['skipped_bytes'])
+        if stats['extracted_files'] and stats['write_seconds']:
+            report += ", about " + "%.1fs" % (stats['skipped_files'] * stats['write_seconds'] / stats['extracted_files']) + " of writing saved"
+    return report + "."
+
+def untar(path,head,tail,members=None,quiet=False):
     """
     Extract the archive with specific pattern and locate in given directory.
     
@@ -578,10 +2396,16 @@ def untar(path,head,tail):
             The prefix of the file extracted.
         tail : str
             The last part of the tar file name that indicates compression, e.g. '.tar.xz' or 'tar'
+        members : list
+            Patterns of the member paths that the report needs, relative to the top directory of the archive, e.g. ['sos_commands/postgresql/*'].
+            Only these members are extracted. All members are extracted if None.
+        quiet : bool
+            Do not print the statistics of the extraction.
             
     Returns
     -------
-    None
+        stats : dict
+            Statistics of the extraction from extract_archive, None if nothing was extracted.
 
     """
     
@@ -596,26 +2420,241 @@ def untar(path,head,tail):
         if len(zipped_files) > 1:
             print("There should be exactly one tar file to be untarred.")
         elif len(zipped_files) == 1:
-            os.system("cd "+path+"; tar -xf " + zipped_files[0]) #  + " > /dev/null"
-            # if str(tail).endswith("xz"):
-            #     os.system("cd "+path+"; tar -zxvf " + zipped_files[0] + " > /dev/null")
-            #     # tar_file = lzma.open(os.path.join(path,zipped_files[0]))
-            # else:
-            #     tar_file = tarfile.open(os.path.join(path,zipped_files[0]))
-            #     tar_file.extractall()
-            #     tar_file.close()
+            archive = os.path.join(path,zipped_files[0])
+            if not tar_readable(archive):
+                extract_with_tar(archive,path)
+                return None
+            try:
+                stats = extract_archive(archive,path,members)
+            except (tarfile.CompressionError, tarfile.ReadError):
+                # The compression is not supported by this Python (e.g. no lzma module)
+                extract_with_tar(archive,path)
+                return None
+            if not quiet and stats['extracted_files']:
+                print(extract_report(stats))
+            return stats
+    return None
+
+
+def untar_host(host_info):
+    """
+    Extract the sosreport of one host, used as the worker of untar_hosts.
+    
+    Parameters
+    ----------
+        host_info : tuple
+            (<host>, <host folder in log-collector-data>, <member patterns>)
+            
+    Returns
+    -------
+        result : tuple
+            (<host>, <statistics from extract_archive or None>, <error message or None>)
+    
+    """
+    host, host_dir, members = host_info
+    try:
+        return host, untar(host_dir, 'sosreport', 'tar.xz', members, quiet=True), None
+    except Exception as error:
+        return host, None, str(error)
+
+def process_context():
+    """
+    Get the multiprocessing context of the process pools, they are started while the threads of report_sections run.
+    A forked child only has the thread that forked it, and a lock that another thread held at that moment stays locked
+    in the child for good, so the workers are started with forkserver, or spawn where there is no forkserver.
+    
+    Returns
+    -------
+        context : multiprocessing context
+            None on Python 2, which can only fork.
+    
+    """
+    if not hasattr(multiprocessing, 'get_context'):
+        return None
+    return multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def untar_hosts(log_collector_data,hosts,members=None,processes=None):
+    """
+    Extract the sosreports of all hosts concurrently in a process pool bounded by the number of cores.
+    The workers are not forked, see process_context. Python 2 extracts them in a thread pool instead.
+    
+    Parameters
+    ----------
+        log_collector_data : str
+            The log-collector-data directory of the bundle.
+        hosts : list
+            Host names, which are also the folder names in log-collector-data.
+        members : list
+            Patterns of the members to extract, see untar.
+        processes : int
+            Number of worker processes, the number of cores by default.
+            
+    Returns
+    -------
+        results : list
+            (<host>, <statistics or None>, <error message or None>) for every host in the given order.
+    
+    """
+    if len(hosts) == 0:
+        return []
+    processes = min(len(hosts), processes or multiprocessing.cpu_count())
+    host_infos = [(host, os.path.join(log_collector_data, str(host)), members) for host in hosts]
+    start = time.time()
+    if multiprocessing.current_process().daemon:
+        # A worker of the fleet pool cannot start processes, the hosts are extracted one after another
+        processes = 1
+        results = list(map(untar_host, host_infos))
+    else:
+        context = process_context()
+        pool = context.Pool(processes) if context is not None else ThreadPool(processes)
+        try:
+            results = pool.map(untar_host, host_infos, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    for host, stats, error in results:
+        if error is not None:
+            print(host + ": extraction failed, " + error)
+        elif stats is None:
+            print(host + ": nothing to extract (already extracted or no sosreport archive)")
+        else:
+            print(host + ": " + extract_report(stats))
+    print("Extracted sosreports of " + str(len(hosts)) + " hosts with " + str(processes) + " processes in " + "%.1fs" % (time.time() - start) + ".")
+    return results
+
+text_control = re.compile(r"[\x00-\x09\x0b-\x1f\x7f]")
+text_control_names = {'\b':'\\b','\t':'\\t','\v':'\\v','\f':'\\f','\r':'\\r'}
+
+def control_escape(match):
+    """Render one control character, e.g. a tab as \\t and a bell as \\x07."""
+    char = match.group()
+    return text_control_names.get(char, "\\x%02x" % ord(char))
+
+def visible_text(value):
+    """
+    Render the control characters of a value visibly, so tabs and carriage returns decoded from the COPY format
+    can't break the alignment of the text tables. Newlines are kept, they wrap the cell.
+
+    Parameters
+    ----------
+        value : str
+            The cell value, e.g. 'a\tb'.
+            
+    Returns
+    -------
+        value : str
+            The printed value, e.g. 'a\\tb'.
+    
+    """
+    return text_control.sub(control_escape, value)
+
+def cell_lines(value,max_width):
+    """
+    Split a cell value into the lines printed in the table, lines are broken at newlines and at max_width characters.
+
+    Parameters
+    ----------
+        value : str
+            The cell value.
+        max_width : int
+            The largest number of characters in a line.
+            
+    Returns
+    -------
+        lines : list
+            The printed lines of the cell, e.g. ['Failed to sync storage devices', 'see vdsm.log'].
+    
+    """
+    lines = []
+    start = 0
+    end = len(value)
+    while True:
+        line_end = value.find("\n", start, start+max_width+1)
+        if line_end != -1:
+            lines.append(value[start:line_end])
+            start = line_end + 1
+            if start == end:
+                return lines
+        elif end - start > max_width:
+            lines.append(value[start:start+max_width])
+            start += max_width
+        else:
+            lines.append(value[start:])
+            return lines
+
+def write_table(table,show_column,write,max_width=80,batch_size=1024):
+    """
+    Write a table formatting to a sink row by row.
 
+    Parameters
+    ----------
+        table : dat_table
+            Relevant info in dat. file.
+        show_column : list
+            List of the column indexes that need to be printed.
+        write : function
+            The write method of the sink, e.g. path.output_txt.write or the append method of a list.
+        max_width : int
+            The largest column width, longer values are wrapped.
+        batch_size : int
+            Number of rows formatted before each write.
+            
+    Returns
+    -------
+    None
+    
+    """
+    header = table.col_names
+    shown = [idx for idx in range(len(header)) if idx in show_column]
+    col_space = []
+    for idx in shown:
+        col_space.append(max(min(table.width(idx), max_width), len(header[idx])))
+    
+    # Padded separators and the row template are built once
+    divider_row = "".join(["+" + "-"*width for width in col_space]) + "+\n"
+    divider_header = "".join(["+" + "="*width for width in col_space]) + "+\n"
+    template = "".join(["|%-" + str(width) + "s" for width in col_space]) + "|\n"
+    row_end = "|\n" + divider_row
+    
+    # Print out the header
+    write(divider_row + template % tuple([header[idx] for idx in shown]) + divider_header)
+    
+    # Print out all rows
+    if not shown:
+        write(row_end * len(table))
+        return
+    cells = itemgetter(*shown) if len(shown) > 1 else lambda row: (row[shown[0]],)
+    if any([table.has_control(idx) for idx in shown]):
+        shown_cells = cells
+        cells = lambda row: tuple(map(visible_text, shown_cells(row)))
+    template = template[:-2]
+    batch = []
+    for row in table.rows():
+        values = cells(row)
+        for value in values:
+            if len(value) > max_width or "\n" in value:
+                # A wrapped row, every cell is split once and printed line by line
+                lines = [cell_lines(value,max_width) for value in values]
+                line_num = max([len(cell) for cell in lines])
+                for cell in lines:
+                    cell.extend([""] * (line_num - len(cell)))
+                batch.append("|\n".join([template % line for line in zip(*lines)]) + row_end)
+                break
+        else:
+            batch.append(template % values + row_end)
+        if len(batch) == batch_size:
+            write("".join(batch))
+            batch = []
+    write("".join(batch))
 
-def format_table(dat_dict,show_column):
+def format_table(table,show_column):
     """
     Print as a table formatting.
 
     Parameters
     ----------
-        dat_dict : dict
+        table : dat_table
             Relevant info in dat. file.
-            Structure of an item in dat_dict: "<name_table>": ['<name_dat>',['<col_names>'],[<bigest length of rows in each column>],[[<row1>],[<row2>],[<row3>]]]
-            e.g. 'public.network': ['7459.dat',  ['id', 'name', 'mtu'], [2,9,4], [['0', 'Storage', '9000'], ['1', 'ovirtmgmt', '9000'],...]]
         show_col : list
             List of the column indexes that need to be printed.
             
@@ -625,69 +2664,85 @@ def format_table(dat_dict,show_column):
             String of the generated formatting table.
     
     """
+    return_txt = []
+    write_table(table,show_column,return_txt.append)
+    return "".join(return_txt)
+
+def write_group(table,order,show_col,write,batch_size=1024):
+    """
+    Write a group formatting to a sink by following the specific order.
+    The rows are sorted once, then every row prints the hierarchy names that change from the previous row and its entry.
+
+    Parameters
+    ----------
+        table : dat_table
+            Relevant info in dat. file.
+        order : list
+            List of the column indexes in the order of the hierarchy.
+        show_col : list
+            List of the column indexes that need to be printed.
+        write : function
+            The write method of the sink, e.g. path.output_txt.write or the append method of a list.
+        batch_size : int
+            Number of rows formatted before each write.
+            
+    Returns
+    -------
+    None
     
-    max_width = 80
-    header = dat_dict[1]
-    col_space = dat_dict[2]
-    rows = dat_dict[3]
-    divider_row = "" 
-    divider_header = ""
-    return_txt = ""
-    
-    # Adjust the column width
-    for idx,width in enumerate(col_space):
-        if idx in show_column or show_column[0] == 'filter_disable':
-            if width > max_width:
-                col_space[idx] = max_width
-            if col_space[idx] <= len(header[idx]):
-                col_space[idx] = len(header[idx])  
-            divider_row += "+"+"-"*col_space[idx]
-            divider_header += "+"+"="*col_space[idx]
-    divider_row += "+\n"
-    divider_header += "+\n"
+    """
+    header = table.col_names
+    indent_size = 4
+    indent_unit = " " * indent_size
+    divider_entry_size = 40
+    # Sort by the order 
+    group_key = itemgetter(*order)
+    rows = sorted(table.rows(), key=group_key)
+    if any([table.has_control(idx) for idx in range(len(header)) if idx in order or idx in show_col]):
+        rows = [tuple(map(visible_text, row)) for row in rows]
+    if len(order) == 1:
+        group_key = lambda row: (row[order[0]],)
     
-    # Print out the header
-    return_txt += divider_row
-    for idx,width in enumerate(col_space):
-        if idx in show_column:
-            return_txt += "|" + header[idx] + " "*(width-len(header[idx]))
-    return_txt += "|\n"+divider_header
+    # The columns of the hierarchy are not repeated in the entries
+    entry_indent = indent_unit * len(set(order))
+    divider_entry = entry_indent + "-" * divider_entry_size + "\n"
+    fields = [(idx, entry_indent + header[idx] + ": ") for idx in range(len(header)) if idx not in order and idx in show_col]
+    level_names = [indent_unit * level + header[col] + ": " for level,col in enumerate(order)]
     
-    # Print out all rows
-    for row in rows:
-        rest = row[:]
-        need_next_line = len(col_space)
-        while need_next_line > 0:
-            need_next_line = len(col_space)
-            for idx,width in enumerate(col_space):      
-                if idx in show_column:
-                    cur_line = ""
-                    if rest[idx] != "":
-                        if len(rest[idx]) > max_width:
-                            cur_line = rest[idx][:max_width]
-                            rest[idx] = rest[idx][max_width:]
-                        else:
-                            cur_line = rest[idx]
-                            rest[idx] = ""
-                            need_next_line -= 1
-                    else:
-                        need_next_line -= 1
-                    return_txt += "|" + cur_line + " "*(width-len(cur_line))
-                else:
-                    need_next_line -= 1
-            return_txt += "|\n"
-        return_txt += divider_row
-    return return_txt
-def format_group(dat_dict,order,show_col):
+    batch = []
+    previous = None
+    divider_last = False # Consecutive dividers are printed once
+    for row_num,row in enumerate(rows):
+        values = group_key(row)
+        level = 0
+        if previous is not None:
+            while level < len(order) and values[level] == previous[level]:
+                level += 1
+        for level in range(level, len(order)):
+            batch.append(level_names[level] + values[level] + "\n")
+            divider_last = False
+        previous = values
+        
+        if not divider_last:
+            batch.append(divider_entry)
+        for idx,name in fields:
+            batch.append(name + row[idx] + "\n")
+        if fields:
+            batch.append(divider_entry)
+        divider_last = True
+        if row_num % batch_size == batch_size - 1:
+            write("".join(batch))
+            batch = []
+    write("".join(batch))
+
+def format_group(table,order,show_col):
     """
     Print as a group formatting by following the specific order.
 
     Parameters
     ----------
-        dat_dict : dict
+        table : dat_table
             Relevant info in dat. file.
-            Structure of an item in dat_dict: "<name_table>": ['<name_dat>',['<col_names>'],[<bigest length of rows in each column>],[[<row1>],[<row2>],[<row3>]]]
-            e.g. 'public.network': ['7459.dat',  ['id', 'name', 'mtu'], [2,9,4], [['0', 'Storage', '9000'], ['1', 'ovirtmgmt', '9000'],...]]
         order : list
             List of the column indexes in the order of the hierarchy.
         show_col : list
@@ -699,112 +2754,310 @@ def format_group(dat_dict,order,show_col):
             String of the generated formatting table.
     
     """
+    result_trim = []
+    write_group(table,order,show_col,result_trim.append)
+    return "".join(result_trim)
+
     
-    header = dat_dict[1]
-    rows = dat_dict[3]
-    indent_size = 4
-    indent_unit = " " * indent_size
-    divider_entry_size = 40
-    divider_entry = "-" * divider_entry_size + "\n"
-    # Sort by the order 
-    rows.sort(key=itemgetter(*order))
-    
-    # Group by the order
-    current_hierarchy = {} # Same values shared with all rows in the current hierarchy e.output_file_txt.{col_idx: col value}
-    global printout_str
-    printout_str = "" # Initialization (In case something left by other calling)
-    def group_print(counter):
-        '''Print all entries in current order.'''
-        global printout_str
-        def rows_print(row,identical_values):
-            """
-            Print the entries at the bottom of the hierarchy with list format.
+copy_escape = re.compile(r"\\(?:([0-7]{1,3})|x([0-9A-Fa-f]{1,2})|(.))", re.S)
+copy_escape_chars = {'b':'\b','f':'\f','n':'\n','r':'\r','t':'\t','v':'\v'}
+copy_chunk_size = 1 << 22
+
+def copy_unescape(match):
+    """Replace one backslash escape sequence of the COPY text format."""
+    if match.group(1) is not None:
+        return chr(int(match.group(1), 8))
+    if match.group(2) is not None:
+        return chr(int(match.group(2), 16))
+    return copy_escape_chars.get(match.group(3), match.group(3))
+
+def copy_field(value,null=None):
+    """
+    Decode one field of the PostgreSQL COPY text format.
+    
+    Parameters
+    ----------
+        value : str
+            The field as written in the .dat file, e.g. 'line 1\\nline 2' or '\\N'.
+        null : any
+            The value returned for NULL fields.
             
-            Parameters
-            ----------
-                row : list
-                    The row entry.
-                identical_values : list
-                    The list of columns that don't need to be printed since these are identical far all entries in this hierarchy.
-                    
-            Returns
-            -------
-            None
+    Returns
+    -------
+        value : str
+            The decoded field, or null for \\N.
+    
+    """
+    if value == "\\N":
+        return null
+    if "\\" not in value:
+        return value
+    return copy_escape.sub(copy_unescape, value)
+
+def copy_lines(dat,chunk_size=copy_chunk_size):
+    """
+    Read a .dat file in large chunks.
+    
+    Parameters
+    ----------
+        dat : file
+            The opened .dat file.
+        chunk_size : int
+            Number of characters read at once.
             
-            """
-            global printout_str
-            printout_str += str(indent_unit * len(identical_values)) + divider_entry
-            for col_idx, col_name in enumerate(header):
-                if col_idx not in identical_values and col_idx in show_col:
-                    printout_str += str(indent_unit * len(identical_values)) + col_name + ": " + row[col_idx] + "\n"
-            printout_str += str(indent_unit * len(identical_values)) + divider_entry
+    Returns
+    -------
+        lines : generator
+            Lists of the complete lines (without \\n) in every chunk.
+    
+    """
+    rest = ""
+    while True:
+        chunk = dat.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        yield lines
+    if rest:
+        yield [rest]
+
+def value_matcher(filter_values,filter_type='filter_in',ignore_case=False):
+    """
+    Compile filter values into one predicate that is called once per row.
+    A single value is checked with the in operator, several values with one alternation regular expression,
+    e.g. 'error|failed', so every value is scanned once instead of once per filter value.
+    
+    Parameters
+    ----------
+        filter_values : list
+            The substrings to look for, e.g. ['error','failed'].
+        filter_type : str
+            'filter_in' keeps values containing any of the substrings, 'filter_out' keeps values containing none of them.
+        ignore_case : bool
+            Compare the substrings case-insensitively.
             
+    Returns
+    -------
+        match : function
+            Predicate that takes a column value and returns True if the row is kept.
+    
+    """
+    filter_values = sorted(set(filter_values))
+    keep = filter_type != 'filter_out'
+    if not filter_values:
+        return lambda value: not keep
+    if len(filter_values) == 1:
+        if ignore_case:
+            filter_value = filter_values[0].lower()
+            return lambda value: (filter_value in value.lower()) == keep
+        filter_value = filter_values[0]
+        return lambda value: (filter_value in value) == keep
+    search = re.compile("|".join([re.escape(x) for x in filter_values]), re.IGNORECASE if ignore_case else 0).search
+    if keep:
+        return lambda value: search(value) is not None
+    return lambda value: search(value) is None
+
+def value_filter(filter_info):
+    """
+    Compile the 'col_value' item of filter_info, see dat_info.
+    
+    Returns
+    -------
+        filter_col : int
+            The column index to filter, 0 if the filter is disabled.
+        match : function
+            Predicate from value_matcher, None if the filter is disabled.
+    
+    """
+    col_value = filter_info.get('col_value')
+    if col_value[0] == 'filter_disable':
+        return 0, None
+    return col_value[1], value_matcher(col_value[2],col_value[0],'ignore_case' in col_value[3:])
+
+def dat_rows(dat_file,col_num,keep_col,filter_info):
+    """
+    Stream the rows of a .dat file in the COPY text format of pg_dump.
+    The rows are filtered while reading and only the given columns are kept and decoded.
+    Escape sequences are decoded and NULL (\\N) is returned as an empty string.
+    
+    Parameters
+    ----------
+        dat_file : str
+            The path of the .dat file.
+        col_num : int
+            Number of the columns in the table.
+        keep_col : list
+            Sorted list of the column indexes to keep in the rows.
+        filter_info : dict
+            Filter related information, only 'col_value' is used. See dat_info.
             
-        for elt, items in groupby(rows, itemgetter(order[counter])):
-            current_hierarchy[order[counter]] = elt
+    Returns
+    -------
+        row : generator
+            Tuples of the kept columns for every row that passes the filter.
+    
+    """
+    filter_col, match = value_filter(filter_info)
+    # Columns after the last needed one are left unsplit
+    max_split = max(keep_col + [filter_col]) + 1
+    if max_split >= col_num:
+        max_split = -1
+    project = itemgetter(*keep_col)
+    single_col = len(keep_col) == 1
+    tab_num = col_num - 1
+    skipped = 0
+    end_of_data = False
+    dat = open(dat_file)
+    try:
+        for lines in copy_lines(dat):
+            for line in lines:
+                if line.count("\t") != tab_num:
+                    if line == "\\.":
+                        end_of_data = True
+                        break
+                    if line != "":
+                        skipped += 1
+                    continue
+                grid = line.split("\t", max_split)
+                escaped = "\\" in line
+                if match is not None and not match(copy_field(grid[filter_col], "") if escaped else grid[filter_col]):
+                    continue
+                row = (grid[keep_col[0]],) if single_col else project(grid)
+                if escaped:
+                    row = tuple([value if "\\" not in value else copy_field(value, "") for value in row])
+                yield row
+            if end_of_data:
+                break
+    finally:
+        dat.close()
+    if skipped:
+        print(str(skipped) + " rows in " + dat_file + " do not have " + str(col_num) + " columns and were skipped.")
+
+def extract_dat(session,dat_name):
+    """
+    Extract a .dat file from the pg_dump archive if it is not extracted yet.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
+        dat_name : str
+            The .dat file, e.g. '7459.dat'.
             
-            # Print the name of current hierarchy
-            printout_str += " "*indent_size*counter + header[order[counter]] + ": " + elt + "\n"
-            if counter == len(order)-1:
-                # Check if the row is belong to this bottom hierarchy
-                for i in items:
-                    check_pass = True 
-                    for key in current_hierarchy:
-                        if i[key] != current_hierarchy.get(key): check_pass = False
-                    if check_pass == True: 
-                        rows_print(i,current_hierarchy.keys())
-            else:
-                group_print(counter+1)
-    
-    group_print(0)
-    # Modify the result string by deleting unnecessary lines
-    result_trim = ""
-    printout_string_lines = printout_str.split("\n")
-    if len(printout_string_lines) != 1: # Only one line
-        for line_idx,line in enumerate(printout_string_lines[:-1]):
-            space_size = len(line) - len(line.lstrip())
-            if line_idx != 0:
-                line_last = printout_string_lines[line_idx-1]
-                space_size_last = len(line_last) - len(line_last.lstrip())
-            if line_idx != range(len(printout_str.split("\n"))-1):
-                line_next = printout_string_lines[line_idx+1]
-                space_size_next = len(line_next) - len(line_next.lstrip())
+    Returns
+    -------
+        dat_file : str
+            The path of the .dat file.
+    
+    """
+    # parent_path = os.path.join(path.log_collector_data, path.sosreport, "sos_commands", "postgresql","pgdump-scl-rh-postgresql10") ######################################3
+    parent_path = os.path.join(session.path.sosreport, "sos_commands", "postgresql") #path.log_collector_data, 
+    dat_file = os.path.join(parent_path, dat_name)
+    # extract_archive renames the files into place once they are written, so an existing .dat file is complete
+    if not os.path.isfile(dat_file):
+        # The extractions of all tables are reported once by write_report
+        stats = untar(parent_path, 'pgdump', 'tar', [dat_name], quiet=True)
+        if stats is not None:
+            session.path.add_dat_stats(stats)
+    return dat_file
+
+def load_table(session,name_table,dat_name,col_names,keep_col,filter_info):
+    """
+    Build a dat_table from the projected and filtered rows in a .dat file, or get it from the cache.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
+        name_table : str
+            Table name in restore.sql, e.g. 'public.vds_static'.
+        dat_name : str
+            The .dat file of the table, e.g. '7459.dat'.
+        col_names : list
+            Names of all columns of the table.
+        keep_col : list
+            Indexes of the columns that are kept.
+        filter_info : dict
+            The row filter in 'col_value', see dat_info.
             
-            if line_idx == 0:
-                # The first line
-                if space_size != space_size_next:
-                    result_trim += line + "\n"
-            elif line_idx != range(len(printout_string_lines)-1): #################
-                # The line in the middle
-                if line.lstrip().startswith("-----"):  #################
-                    if line_last.lstrip().startswith("-----"):
-                        continue
-                    else:
-                        result_trim += line + "\n"
-                elif space_size_next > space_size or (space_size_last == space_size and space_size_next == space_size):
-                    key_pre = line_last[:line_last.find(": ")]
-                    key_cur = line[:line.find(": ")]
-                    key_next = line_next[:line_next.find(": ")]
-                    if not (key_pre == key_cur and key_cur == key_next):
-                        result_trim += line + "\n"
-            else:
-                # Last line
-                if space_size == space_size_last and space_size != 0:
-                    result_trim += line + "\n"
-                    
-    return result_trim
+    Returns
+    -------
+        table : dat_table
+            The table with the kept columns.
+    
+    """
+    path = session.path
+    dat_file = extract_dat(session,dat_name)
+    cache_key = path.cache.key([dat_file], 'dat_table', len(col_names), keep_col, filter_info.get('col_value'))
+    cached = path.cache.get(cache_key)
+    if cached is not None:
+        try:
+            return dat_table.from_data(cached)
+        except (KeyError, IndexError, TypeError, ValueError):
+            pass # Not the data of a table, it is built again and replaced
+    table = dat_table(name_table,dat_name,[col_names[col] for col in keep_col],keep_col,dat_rows(dat_file,len(col_names),keep_col,filter_info))
+    path.cache.put(cache_key, table.to_data())
+    return table
+
+def input_table(session,name_table):
+    """
+    Extract the .dat file of a table, used as the input task of the sections that read the table.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
+        name_table : str
+            Table name in restore.sql, e.g. 'public.vds_static'.
+            
+    Returns
+    -------
+        dat_file : str
+            The path of the .dat file, None if the table is not in restore.sql.
+    
+    """
+    if name_table not in session.path.copy_catalog:
+        return None
+    return extract_dat(session,session.path.copy_catalog[name_table][0])
 
+def input_hosts(session):
+    """
+    Get the names of the KVM hosts from public.vds_static, used as the input task of the sections that read host files.
+    The host sosreports are extracted here if the session extracts them.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
+            
+    Returns
+    -------
+        hosts : list
+            Host names, which are also the folder names in log-collector-data.
     
+    """
+    hosts = []
+    if 'public.vds_static' in session.path.copy_catalog:
+        dat_name, col_names = session.path.copy_catalog['public.vds_static']
+        hosts = list(load_table(session,'public.vds_static',dat_name,col_names,[3],{'col_value':['filter_disable']}).column(3))
+    # Untar sosreport for hosts, otherwise the host files are read straight from the archives
+    if session.path.extract_hosts:
+        untar_hosts(session.path.log_collector_data, hosts, host_info_paths)
+    return hosts
+
 '''                                
 ==================================================================--Network Information from Database--==================================================================
 '''
 
-def dat_info(class_att,name_info,name_table,format_info,filter_info,sort_info,result_storage_key,result_storage):
+def dat_info(session,class_att,name_info,name_table,format_info,filter_info,sort_info,result_storage_key,result_storage):
     """
     Get information in given table from restore.sql, print out with given format after filtering and sorting. 
     
     Parameters
     ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
         class_att : str
             HTML class attribute that is used when add a table in HTML file, indicates which tabs or collapsible buttons it locates.
             There are two kinds of attribute: <Tab name> or <Tab name>_<Collipsible button name>, the former will be shown when tab clicked, the latter will be shown when the collapsible button is clicked.
@@ -818,8 +3071,10 @@ def dat_info(class_att,name_info,name_table,format_info,filter_info,sort_info,re
             Dictionary with two filter related items. 
             <filter type> can be 'filter_in', 'filter_out', or 'filter_disable'.
             'col_value' is to filter a specific column for given values and 'col_index' is to filter given column by index. 
+            'filter_in' keeps rows containing any of the filter values and 'filter_out' keeps rows containing none of them,
+            add 'ignore_case' after the filter values to compare case-insensitively.
             e.g. filter_info = {
-                'col_value':[<filter type>,<column index>,[<filter value>]],
+                'col_value':[<filter type>,<column index>,[<filter value>],<'ignore_case'>],
                 'col_index':[<filter type>,[<column index>]]
                 }
         sort_info : list
@@ -832,93 +3087,73 @@ def dat_info(class_att,name_info,name_table,format_info,filter_info,sort_info,re
     Returns
     -------
         dat_dict : dict
-            Dictionary of all information from dat. files.
-            structure of an item: "<name_table>": ['<name_dat>',['<col_names>'],[<bigest length of rows in each column>],[[<row1>],[<row2>],[<row3>]]]
-            e.g. output_file_txt. {'public.network': ['7459.dat',  ['id', 'name', 'mtu'], [2,9,4], [['0', 'Storage', '9000'], ['1', 'ovirtmgmt', '9000'],...]]
+            Dictionary of all information from dat. files, the values are dat_table objects.
+            Only the shown, sorted and grouped columns are kept, use dat_table.column to get a column by its index in restore.sql.
+            e.g. {'public.network': <dat_table of 7459.dat with the columns ['id', 'name', 'mtu']>}
         
     """
+    path = session.path
     
     
     dat_dict = {}
-    def dat_to_dict(info_dict):
-        """Store information in dat. file to the dictionary."""
-        # parent_path = os.path.join(path.log_collector_data, path.sosreport, "sos_commands", "postgresql","pgdump-scl-rh-postgresql10") ######################################3
-        parent_path = os.path.join(path.sosreport, "sos_commands", "postgresql") #path.log_collector_data, 
-        dat = open(os.path.join(parent_path, info_dict[0]))
-        col_num = len(info_dict[1]) # Number of the column
-        col_space = [0]*col_num # The largest string size in each column
-        info_dict.append([])
-        info_dict.append([]) # Append an empty row for col_space and rows in dat. file
-        
-        filter_type = filter_info.get('col_value')[0]
-        filter_col = filter_info.get('col_value')[1] if filter_type != 'filter_disable' else []
-        filter_values = filter_info.get('col_value')[2] if filter_type != 'filter_disable' else []
-        for line in dat:
-            # Separate the line for different column
-            line.replace(" ","").replace("\n","").replace("\t",",").strip()
-            grid = line.split("\t")
-        
-            if len(grid) == col_num:
-                if (filter_type == 'filter_out' and any(x not in grid[filter_col] for x in filter_values)) or (filter_type == 'filter_in' and any(x in grid[filter_col] for x in filter_values)) or filter_type == 'filter_disable':
-                    grid[len(grid)-1] = grid[len(grid)-1][:-1] # Remove \n in the end of every line
-                    info_dict[3].append(grid) # Append the new row
-                    for i in range(len(grid)):
-                        if len(grid[i]) > col_space[i]:
-                            col_space[i] = len(grid[i]) 
-        info_dict[2] = col_space
-        dat.close()
-    
-    # Look into the .sql file
-    sql_commands = [x.strip() for x in path.sql_file.split(';')]
-    for command in sql_commands:
-        start_from = command.find('COPY '+name_table + " ")
-        dat_end = command.find('.dat')
-    
-        if start_from != -1 and dat_end != -1:
-            # Find column names
-            col_left = command.find('(',start_from)
-            col_right = command.find(')',start_from)
-            col_names = [x.strip() for x in command[col_left+1:col_right].split(',')]
-            # Find .dat file name
-            dat_start = dat_end
-            while command[dat_start] != '/':
-                dat_start -= 1
-            dat_name = command[dat_start+1:dat_end+4]
-    
-            dat_dict[command[start_from+5:col_left-1]] = [dat_name,col_names]
-    # Look into the .dat files
-    txt_tmp = ""
-    for info_key,info_values in dat_dict.items():
-        txt_tmp += "\n\n" + name_info + "\n"
-        txt_tmp += "(This table is fetched from " + info_key + " table in restore.sql)\n"
-        dat_to_dict(info_values)
+    # Look up the table in the COPY catalog of restore.sql
+    if name_table in path.copy_catalog:
+        dat_name, col_names = path.copy_catalog[name_table]
+        result_storage.append(result_storage_key,"\n\n" + name_info + "\n" + "(This table is fetched from " + name_table + " table in restore.sql)\n")
         
-        # Sort
-        if sort_info[0] != 'sort_disable':
-            info_values[3] = sorted(info_values[3], key=lambda x: x[sort_info[0]])
         # Filter
+        col_num = len(col_names)
         if filter_info.get('col_index')[0] == 'filter_disable':
-            show_column = [idx for idx in range(len(info_values[1]))]
+            show_column = [idx for idx in range(col_num)]
         elif filter_info.get('col_index')[0] == 'filter_out':
-            show_column = [idx for idx in range(len(info_values[1])) if idx not in filter_info.get('col_index')[1]]
+            show_column = [idx for idx in range(col_num) if idx not in filter_info.get('col_index')[1]]
         else:
-            show_column = filter_info.get('col_index')[1]
+            show_column = [idx for idx in filter_info.get('col_index')[1] if idx < col_num]
+        
+        # Only the shown columns and the columns used for sorting or grouping are kept in the table and the cache
+        keep_col = set(show_column)
+        if sort_info[0] != 'sort_disable':
+            keep_col.add(sort_info[0])
+        if format_info[0] == 'group':
+            keep_col.update(format_info[1])
+        keep_col = sorted(keep_col)
+        position = dict((col,pos) for pos,col in enumerate(keep_col))
+        table = load_table(session,name_table,dat_name,col_names,keep_col,filter_info)
+        dat_dict[name_table] = table
+        
+        # Sort
+        order = None
+        if sort_info[0] != 'sort_disable':
+            order = table.sort(position[sort_info[0]])
         
-        html_builder.add_table(class_att,name_info,info_key,info_values[1],info_values[3],show_column) 
+        # The HTML table also has the hidden columns for its column filter. They are read in a second pass
+        # over the .dat file, not cached, and dropped once the rows are written to the HTML file.
+        hidden_col = [col for col in range(col_num) if col not in position]
+        if hidden_col:
+            hidden = dat_table(name_table,dat_name,[col_names[col] for col in hidden_col],hidden_col,dat_rows(extract_dat(session,dat_name),col_num,hidden_col,filter_info))
+            if order is not None:
+                hidden.reorder(order)
+            session.html_builder.add_table(class_att,name_info,table.merge(hidden),show_column)
+            hidden = None
+        else:
+            session.html_builder.add_table(class_att,name_info,table,show_column)
+        # The rows are written to the spool file of result_storage as they are formatted
+        show_column = [position[col] for col in show_column]
         if format_info[0] == 'table':
-            txt_tmp += format_table(info_values,show_column)
+            result_storage.append_spooled(result_storage_key,partial(write_table,table,show_column))
         elif format_info[0] == 'group':
-            txt_tmp += format_group(info_values,format_info[1],show_column)
+            result_storage.append_spooled(result_storage_key,partial(write_group,table,[position[col] for col in format_info[1]],show_column))
     
-    result_storage.append(result_storage_key,txt_tmp)
     return dat_dict
 
-def search_dat_by_col(column_key):
+def search_dat_by_col(session,column_key):
     """
     Print all table names with the given column
     
     Parameters
     ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
         column_key : str
             Column name that is used to find all tables with this in restore.sql, e.g. 'public.network'.
              
@@ -929,26 +3164,9 @@ def search_dat_by_col(column_key):
     """
     
     dat_dict = {}
-    # Look into the .sql file
-    sql_commands = [x.strip() for x in sql_file.split(';')]
-    for command in sql_commands:
-        start_from = command.find('COPY ')
-        dat_end = command.find('.dat')
-    
-        if start_from != -1 and dat_end != -1:
-            # Find column names
-            col_left = command.find('(',start_from)
-            col_right = command.find(')',start_from)
-            col_names = [x.strip() for x in command[col_left+1:col_right].split(',')]
-            if column_key in col_names:
-                # Find .dat file name
-                dat_start = dat_end
-                while command[dat_start] != '/':
-                    dat_start -= 1
-                dat_name = command[dat_start+1:dat_end+4]
-        
-                # Put into the dictionary
-                dat_dict[command[start_from+5:col_left-1]] = [dat_name,col_names]
+    # Look up the column in the COPY catalog of restore.sql
+    for name_table in session.path.copy_columns.get(column_key, []):
+        dat_dict[name_table] = session.path.copy_catalog[name_table]
     # Print a list of all relevant dat. files
     print('\n\nAll dat. files with the column, ' + column_key + ', included:\n')
     
@@ -959,12 +3177,63 @@ def search_dat_by_col(column_key):
 '''                                
 ==================================================================--Network Information from Hosts--==================================================================
 '''
-def info_from_engine(info_files):
+def info_group(info_files):
+    """
+    Group the information by the file it is fetched from.
+    
+    Parameters
+    ----------
+        info_files : dict
+            Dictionary of all information that will be fetched, see info_from_host.
+            
+    Returns
+    -------
+        info_by_file : dict
+            The names of the information for every file, e.g. {'installed-rpms': ['vdsm','libvirt','qemu']}
+    
+    """
+    info_by_file = {}
+    for info in info_files.keys():
+        info_by_file.setdefault(info_files.get(info)[0], []).append(info)
+    return info_by_file
+
+def info_read(lines,filters):
+    """
+    Apply the filters of all information fetched from one file in a single pass over its lines.
+    
+    Parameters
+    ----------
+        lines : list
+            The lines of the file.
+        filters : list
+            (<filter_info>,<output list>) for every information, matched lines are appended to the output list.
+            e.g. [(['line',['vdsm-4']],[]),(['line',['libvirt-5']],[])]
+            
+    Returns
+    -------
+    None
+    
+    """
+    for i in lines:
+        for filter_info,info_lines in filters:
+            if filter_info[0] == 'filter_disable': 
+                info_lines.append(i)
+            elif filter_info[0] == 'line':
+                for grep in filter_info[1]:
+                    if grep in i:
+                        if len(filter_info) > 2:
+                            info_lines.append(i[:i.find(filter_info[2])] + "\n")
+                        else:
+                            info_lines.append(i + "\n")
+
+def info_from_engine(session,info_files):
     """
     Look into engine sosreport to fetch information.
     
     Parameters
     ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
         info_files : dict
             Dictionary of all information that will be fetched for the engine.
             structure of an item in info_files: '<name_info>':[<directory of the file>,<filter_info>]
@@ -976,31 +3245,32 @@ def info_from_engine(info_files):
             Information fetched from the given file.
     
     """
+    path = session.path
     info_str = ""
-    for info in info_files.keys():
-        info_str += "\n" + info + ":\n"
-        if os.path.isfile(os.path.join(path.sosreport_engine,info_files.get(info)[0])):
-            z = open(os.path.join(path.sosreport_engine,info_files.get(info)[0]))
-            for i in z.readlines():
-                if info_files.get(info)[1][0] == 'filter_disable': 
-                    info_str += i
-                elif info_files.get(info)[1][0] == 'line':
-                    for grep in info_files.get(info)[1][1]:
-                        if grep in i:
-                            if len(info_files.get(info)[1]) > 2:
-                                info_str += i[:i.find(info_files.get(info)[1][2])] + "\n"
-                            else:
-                                info_str += i + "\n"
+    engine_files = path.engine_files()
+    cache_key = path.cache.key(engine_files.sources(info_group(info_files).keys()), 'info_from_engine', list(info_files.items()))
+    cached = path.cache.get(cache_key)
+    if cached is not None:
+        return cached
+    info_lines = dict((info,[]) for info in info_files.keys())
+    for file_name,infos in info_group(info_files).items():
+        if engine_files.isfile(file_name):
+            info_read(engine_files.readlines(file_name),[(info_files.get(info)[1],info_lines[info]) for info in infos])
         else: 
-            print("The file '" + os.path.join(path.sosreport_engine,info_files.get(info)[0]) + "' is not exist.")
+            print("The file '" + engine_files.path(file_name) + "' is not exist.")
+    for info in info_files.keys():
+        info_str += "\n" + info + ":\n" + "".join(info_lines[info])
+    path.cache.put(cache_key, info_str)
     return info_str
 
-def info_from_host(host,info_files):
+def info_from_host(session,host,info_files):
     """
     Look into host sosreport to fetch information.
     
     Parameters
     ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
         host : str
             Host name.
         info_files : dict
@@ -1011,37 +3281,83 @@ def info_from_host(host,info_files):
     Returns
     -------
         info_str : str
-            Information fetched from the given file.
+            Information fetched from the given file, without the host header that info_from_hosts adds.
     
     """
-    info_str = "\n================================Host: " + host + "================================\n"
+    path = session.path
+    info_str = ""
+    
+    host_sosreports = path.host_files(host,host_info_paths)
+    cache_key = path.cache.key([source for host_files in host_sosreports for source in host_files.sources(info_group(info_files).keys())], 'info_from_host', 'body', host, list(info_files.items()))
+    cached = path.cache.get(cache_key)
+    if cached is not None:
+        return cached
     
+    # Every file is read once with the filters of all information fetched from it
+    info_by_file = info_group(info_files)
+    info_lines = dict((info,[]) for info in info_files.keys())
+    for host_files in host_sosreports:
+        for file_name,infos in info_by_file.items():
+            if host_files.isfile(file_name):
+                info_read(host_files.readlines(file_name),[(info_files.get(info)[1],info_lines[info]) for info in infos])
     for info in info_files.keys():
-        info_str += "\n" + info + ":\n"
-        for file in os.listdir(os.path.join(path.log_collector_data,host)):
-            host_name = host[:str(host).find(".")]
-            if str(file).startswith("sosreport-" + host_name) and not str(file).endswith(".tar.xz"):
-                info_file = str(os.path.join(path.log_collector_data, str(host), file, info_files.get(info)[0]))
-                if os.path.isfile(info_file):
-                    z = open(str(os.path.join(path.log_collector_data, str(host), file, info_files.get(info)[0])))
-                    for i in z.readlines():
-                        if info_files.get(info)[1][0] == 'filter_disable': 
-                            info_str += i
-                        elif info_files.get(info)[1][0] == 'line':
-                            for grep in info_files.get(info)[1][1]:
-                                if grep in i:
-                                    if len(info_files.get(info)[1]) > 2:
-                                        info_str += i[:i.find(info_files.get(info)[1][2])] + "\n"
-                                    else:
-                                        info_str += i + "\n"
+        info_str += "\n" + info + ":\n" + "".join(info_lines[info])
+    path.cache.put(cache_key, info_str)
     return info_str
 
-def healthchecker(default_values,result_storage):
+def info_from_hosts(session,hosts,info_files,threads=8):
+    """
+    Look into the sosreports of all hosts concurrently to fetch information.
+    The files of different hosts are read in a bounded thread pool, the output keeps the order of hosts.
+    The information of a host that is identical to the one of an earlier host is only printed once, later hosts refer to it.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
+        hosts : list
+            Host names.
+        info_files : dict
+            Dictionary of all information that will be fetched for every host, see info_from_host.
+        threads : int
+            The largest number of hosts read at the same time.
+            
+    Returns
+    -------
+        info_str : str
+            Information fetched for all hosts.
+    
+    """
+    if len(hosts) <= 1 or threads <= 1:
+        host_infos = [info_from_host(session,host,info_files) for host in hosts]
+    else:
+        pool = ThreadPool(min(threads, len(hosts)))
+        try:
+            host_infos = pool.map(lambda host: info_from_host(session,host,info_files), hosts)
+        finally:
+            pool.close()
+            pool.join()
+    
+    # The information is the key, so identical blocks are stored once
+    first_host = {}
+    info_str = []
+    for host,host_info in zip(hosts,host_infos):
+        info_str.append("\n================================Host: " + host + "================================\n")
+        if host_info in first_host:
+            info_str.append("\nSame as host " + first_host[host_info] + "\n")
+        else:
+            first_host[host_info] = host
+            info_str.append(host_info)
+    return "".join(info_str)
+
+def healthchecker(session,default_values,result_storage):
     """
     Compare provided default values to the actual values.
     
     Parameters
     ----------
+        session : healthcheck_session
+            The session of the LogCollector bundle.
         default_values : dict
             All default values.
         result_storage : dict
@@ -1049,17 +3365,16 @@ def healthchecker(default_values,result_storage):
             
     Returns
     -------
-    None
+        check_table : dat_table
+            The check results, the columns are ["Name","Actual Value","Default Value","Check Result"].
     """
     config_dict = {}
     config_ele = []
     check_table_header = ["Name","Actual Value","Default Value","Check Result"]
-    check_table_col_space = [0]*len(check_table_header)
     check_table_rows = []
     
     # Get all engine_config
-    engine_config = open(os.path.join(path.sosreport_engine,"sos_commands","ovirt","engine-config_--all"))
-    engine_config_split = engine_config.read().split("version: ")
+    engine_config_split = session.path.engine_files().read(os.path.join("sos_commands","ovirt","engine-config_--all")).split("version: ")
     for idx,config in enumerate(engine_config_split):
         if idx == 0:
             config_ele.append(str(config[:str(config).find(": ")]).strip("\n"))
@@ -1098,366 +3413,950 @@ def healthchecker(default_values,result_storage):
                 match = 'Match' if value_default[value_default.find(":"):] == value_actual[value_actual.find(":"):] else 'Not a match'
                 
             check_table_rows.append([key,value_actual,value_default,match])
-            for row in check_table_rows:
-                for idx in range(len(row)):
-                    if len(row[idx]) > check_table_col_space[idx]:
-                        check_table_col_space[idx] = len(row[idx]) 
                         
             
     
     show_column = [idx for idx in range(len(check_table_header))]
-    txt_tmp = format_table(["Health Check",check_table_header,check_table_col_space,check_table_rows],show_column)
-    html_builder.add_table("HealthCheck","Health Check","",check_table_header,check_table_rows,show_column)
-    result_storage.append('Health Check',txt_tmp)
-        
+    check_table = dat_table("","",check_table_header,rows=check_table_rows)
+    session.html_builder.add_table("HealthCheck","Health Check",check_table,show_column)
+    result_storage.append_spooled('Health Check',partial(write_table,check_table,show_column))
+    return check_table
     
 '''
 ========================================================================================================================================================================================
 ---------------------------------------------------------------------------------------All Output---------------------------------------------------------------------------------------
 ========================================================================================================================================================================================
 '''
-# Setup
-# usage_text = ""
-# print(usage_text)
-# sosreport_path = os.path.realpath(raw_input("Enter the path of sosreport: "))
-# output_dir = os.path.realpath(raw_input("Enter the directory of the output: "))
-dt_string = datetime.now().strftime("%m%d%Y-%H%M%S")
-try:
-    
-    #sosreport_path = os.path.realpath(raw_input("Enter the path of sosreport: "))
-    sosreport_path = os.getcwd()
-#    if '.tar' in sosreport_path:
-#        while not os.path.isfile(sosreport_path):
-#            sosreport_path = os.path.realpath(raw_input("There is no such file, please try again.\nEnter the path of sosreport: "))
-#    else:
-#        while not os.path.isdir(sosreport_path):
-#           sosreport_path = os.path.realpath(raw_input("There is no such file, please try again.\nEnter the path of sosreport: "))
-    
-    #output_dir = os.path.realpath(raw_input("Enter the directory of the output: "))
-    output_dir = os.getcwd()
-#   while not os.path.isdir(output_dir):
-#        output_dir = os.path.realpath(raw_input("There is no such directory, please try again.\nEnter the directory of the output: "))
-        
-except KeyboardInterrupt:
-    print("\n")
-    exit()
-path = path_collection(sosreport_path,output_dir,dt_string)
-usage = result_storage()
-hosts = []
-VMs_up = [] 
-sql_file = path.sql_file
-printout_str = ""
-output_file_txt = path.output_txt
-html_builder = Html_builder(["KVM Hosts","Virtual Machines","Versions","Network Topology","Storage Topology","Health Check","Error Events","Other"])
-
-txt_kvmhosts = "\
+# Files fetched from the host sosreports, only these are extracted from the host archives
+vm_hosts_info_files = {"VM State" : [os.path.join("sos_commands", "virsh", "virsh_-r_list_--all"),['filter_disable']], 
+                       "All VM stats" : [os.path.join("sos_commands", "vdsm", "vdsm-client_Host_getAllVmStats"),['line',['\"status\"','\"vmName\"'],',']]}
+versions_hosts_info_files = {"vdsm" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['vdsm-4']]], 
+                             "libvirt" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['libvirt-5']]], 
+                             "qemu" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['qemu-system-x86']]]}
+network_hosts_info_files = {"IP" : [os.path.join("sos_commands","networking","ip_-o_addr"),['filter_disable']],
+                            "Route" : [os.path.join("sos_commands","networking","route_-n"),['filter_disable']],
+                            "Vlan" : [os.path.join("sos_commands","networking","bridge_-d_vlan_show"),['filter_disable']],
+                            "TAP Device" : [os.path.join("sos_commands","networking","ip_-s_-d_link"),['filter_disable']]}
+storage_hosts_info_files = {"Connected Storage Pools" : [os.path.join("sos_commands","vdsm","vdsm-client_Host_getConnectedStoragePools"),['filter_disable']], 
+                            "Storage Domains" : [os.path.join("sos_commands","vdsm","vdsm-client_Host_getStorageDomains"),['filter_disable']]}
+versions_engine_info_files = {"Version" : ["installed-rpms",['line',['ovirt-engine']]]}
+datacenter_tree_hosts_info_files = {"Datacenter Tree" : [os.path.join("sos_commands","vdsm","su_vdsm_-s_.bin.sh_-c_tree_-l_.rhev.data-center"),['filter_disable']]}
+hosted_engine_hosts_info_files = {"Datacenter Tree" : [os.path.join("etc","ovirt-hosted-engine","hosted-engine.conf"),['line',['disk','sdUUID','spUUID','vmid']]],
+                                  "Liveliness":[os.path.join("sos_commands","ovirt_hosted_engine","hosted-engine_--check-liveliness"),['filder_disable']]}
+host_info_paths = [info[0] for info_files in [vm_hosts_info_files,versions_hosts_info_files,network_hosts_info_files,storage_hosts_info_files,datacenter_tree_hosts_info_files,hosted_engine_hosts_info_files] for info in info_files.values()]
+
+def section_kvm_hosts(session,hosts):
+    """Fetch the KVM hosts from the database, the result is the list of host names."""
+    usage = session.usage
+    txt_kvmhosts = "\
 ============================================================================================================================\n\
 ---------------------------------------------------------KVM Hosts----------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('KVM Hosts', txt_kvmhosts)
-filter_info_vds_static = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[0,1,2,3,5]]
-    }
-KVMHosts_dic = dat_info('KVMHosts','KVM hosts','public.vds_static',['table'],filter_info_vds_static,['sort_disable'],'KVM Hosts',usage)
-hosts = [i[3] for i in KVMHosts_dic.get('public.vds_static')[3]]
-usage.append('KVM Hosts', "\nNumber of KVM hosts: " + str(len(hosts)) + "\n" + "\n")
-usage.append('KVM Hosts', "Names of KVM hosts: "+ "\n")
-for host in hosts: 
-    usage.append('KVM Hosts', host+"\n")
-    # Untar sosreport for hosts
-#    untar(os.path.join(path.log_collector_data,host), 'sosreport', 'tar.xz')
-
-txt_virtualmachines = "\
+    usage.add('KVM Hosts', txt_kvmhosts)
+    filter_info_vds_static = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[0,1,2,3,5]]
+        }
+    dat_info(session,'KVMHosts','KVM hosts','public.vds_static',['table'],filter_info_vds_static,['sort_disable'],'KVM Hosts',usage)
+    usage.append('KVM Hosts', "\nNumber of KVM hosts: " + str(len(hosts)) + "\n" + "\n")
+    usage.append('KVM Hosts', "Names of KVM hosts: "+ "\n")
+    for host in hosts: 
+        usage.append('KVM Hosts', host+"\n")
+    return hosts
+
+def section_virtual_machines(session,hosts_info):
+    """Fetch the virtual machines from the database, the information of the hosts is read by an input task."""
+    usage = session.usage
+    html_builder = session.html_builder
+    txt_virtualmachines = "\
 ============================================================================================================================\n\
 ------------------------------------------------------Virtual Machines------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Virtual Machines', txt_virtualmachines)
-usage.add('Virtual Machines - Database', "")
-usage.add('Virtual Machines - Hosts', "")
-
-usage.append('Virtual Machines - Database', "\nVirtual Machines Information for Database:\n")
-html_builder.add_collapsible('VirtualMachines', 'Database', 'Virtual Machines Information for database')
-    
-filter_info_vm_dynamic = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[0,1,53]]
-    }
-VM_dic = dat_info('VirtualMachines_Database','Virtual Machines','public.vm_dynamic',['table'],filter_info_vm_dynamic,['sort_disable'],'Virtual Machines - Database',usage)
-VMs_up = [i[53] for i in VM_dic.get('public.vm_dynamic')[3] if i[1] == '1']
-usage.append('Virtual Machines - Database', "\n"+"Number of Virtual Machines that are Up: " + str(len(VMs_up)) + "\n" + "\n") #writing this info to report file
-usage.append('Virtual Machines - Database', "Names of Virtual Machines that are Up: "+ "\n")
-for i in VMs_up:
-    usage.append('Virtual Machines - Database', i+"\n")
-
-usage.append('Virtual Machines - Hosts', "\nVirtual Machines Information for Hosts:\n")
-vm_hosts_info = ""
-# vm_hosts_info += "This information is fetched by the commands:\n\
-# $ cat sos_commands/virsh/virsh_-r_list_--all\n\
-# $ cat sos_commands/vdsm/vdsm-client_Host_getAllVmStats |grep -B1 '\"status\":'\n"
-
-html_builder.add_collapsible('VirtualMachines', 'Hosts', 'Virtual Machines Information for hosts')
-vm_hosts_info_files = {"VM State" : [os.path.join("sos_commands", "virsh", "virsh_-r_list_--all"),['filter_disable']], 
-                       "All VM stats" : [os.path.join("sos_commands", "vdsm", "vdsm-client_Host_getAllVmStats"),['line',['\"status\"','\"vmName\"'],',']]}
+    usage.add('Virtual Machines', txt_virtualmachines)
+    usage.add('Virtual Machines - Database', "")
+    usage.add('Virtual Machines - Hosts', "")
+
+    usage.append('Virtual Machines - Database', "\nVirtual Machines Information for Database:\n")
+    html_builder.add_collapsible('VirtualMachines', 'Database', 'Virtual Machines Information for database')
+        
+    filter_info_vm_dynamic = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[0,1,53]]
+        }
+    VM_dic = dat_info(session,'VirtualMachines_Database','Virtual Machines','public.vm_dynamic',['table'],filter_info_vm_dynamic,['sort_disable'],'Virtual Machines - Database',usage)
+    VMs_up = [name for name,status in zip(VM_dic.get('public.vm_dynamic').column(53),VM_dic.get('public.vm_dynamic').column(1)) if status == '1']
+    usage.append('Virtual Machines - Database', "\n"+"Number of Virtual Machines that are Up: " + str(len(VMs_up)) + "\n" + "\n") #writing this info to report file
+    usage.append('Virtual Machines - Database', "Names of Virtual Machines that are Up: "+ "\n")
+    for i in VMs_up:
+        usage.append('Virtual Machines - Database', i+"\n")
+
+    usage.append('Virtual Machines - Hosts', "\nVirtual Machines Information for Hosts:\n")
+    vm_hosts_info = ""
+    # vm_hosts_info += "This information is fetched by the commands:\n\
+    # $ cat sos_commands/virsh/virsh_-r_list_--all\n\
+    # $ cat sos_commands/vdsm/vdsm-client_Host_getAllVmStats |grep -B1 '\"status\":'\n"
 
-for host in hosts:
-    vm_hosts_info += info_from_host(host,vm_hosts_info_files)
-usage.append('Virtual Machines - Hosts', vm_hosts_info)
-html_builder.add_div('VirtualMachines_Hosts', vm_hosts_info)
+    html_builder.add_collapsible('VirtualMachines', 'Hosts', 'Virtual Machines Information for hosts')
 
-usage.append('Virtual Machines',usage.get('Virtual Machines - Database'))
-usage.append('Virtual Machines',usage.get('Virtual Machines - Hosts'))
+    vm_hosts_info += hosts_info
+    usage.append('Virtual Machines - Hosts', vm_hosts_info)
+    html_builder.add_div('VirtualMachines_Hosts', vm_hosts_info)
 
-txt_versions = "\
+    usage.include('Virtual Machines','Virtual Machines - Database')
+    usage.include('Virtual Machines','Virtual Machines - Hosts')
+
+def section_versions(session,engine_info,hosts_info):
+    """Show the versions of the engine and the hosts, they are read by input tasks."""
+    usage = session.usage
+    html_builder = session.html_builder
+    txt_versions = "\
 ============================================================================================================================\n\
 ----------------------------------------------------------Versions----------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Versions', txt_versions)
-usage.add('Versions - Engine', "")
-usage.add('Versions - Hosts', "")
+    usage.add('Versions', txt_versions)
+    usage.add('Versions - Engine', "")
+    usage.add('Versions - Hosts', "")
 
-usage.append('Versions - Engine', "\nVersions for Engine:\n")
-versions_engine_info = ""
-# versions_engine_info += "This information is fetched by the commands:\n\
-# $ cat installed-rpms |grep ovirt-engine\n"
+    usage.append('Versions - Engine', "\nVersions for Engine:\n")
+    versions_engine_info = ""
+    # versions_engine_info += "This information is fetched by the commands:\n\
+    # $ cat installed-rpms |grep ovirt-engine\n"
 
-html_builder.add_collapsible('Versions', 'Engine', 'Versions for engine')
-versions_engine_info_files = {"Version" : ["installed-rpms",['line',['ovirt-engine']]]}
-versions_engine_info += info_from_engine(versions_engine_info_files)
-usage.append('Versions - Engine', versions_engine_info)
-html_builder.add_div('Versions_Engine', versions_engine_info)
-
-usage.append('Versions - Hosts', "\nVersions for Hosts:\n")
-versions_hosts_info = ""
-# versions_hosts_info += "This information is fetched by the commands:\n\
-# $ cat installed-rpms |grep vdsm-4\n\
-# $ cat installed-rpms |grep libvirt-5\n\
-# $ cat installed-rpms |grep qemu-system-x86\n"
-html_builder.add_collapsible('Versions', 'Hosts', 'Versions for hosts')
-versions_hosts_info_files = {"vdsm" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['vdsm-4']]], 
-                             "libvirt" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['libvirt-5']]], 
-                             "qemu" : [os.path.join("sos_commands", "rpm", "sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"),['line',['qemu-system-x86']]]}
-for host in hosts:
-    versions_hosts_info += info_from_host(host,versions_hosts_info_files)
-usage.append('Versions - Hosts', versions_hosts_info)
-html_builder.add_div('Versions_Hosts', versions_hosts_info)
+    html_builder.add_collapsible('Versions', 'Engine', 'Versions for engine')
+    versions_engine_info += engine_info
+    usage.append('Versions - Engine', versions_engine_info)
+    html_builder.add_div('Versions_Engine', versions_engine_info)
 
-usage.append('Versions', usage.get('Versions - Engine'))
-usage.append('Versions', usage.get('Versions - Hosts'))
+    usage.append('Versions - Hosts', "\nVersions for Hosts:\n")
+    versions_hosts_info = ""
+    # versions_hosts_info += "This information is fetched by the commands:\n\
+    # $ cat installed-rpms |grep vdsm-4\n\
+    # $ cat installed-rpms |grep libvirt-5\n\
+    # $ cat installed-rpms |grep qemu-system-x86\n"
+    html_builder.add_collapsible('Versions', 'Hosts', 'Versions for hosts')
+    versions_hosts_info += hosts_info
+    usage.append('Versions - Hosts', versions_hosts_info)
+    html_builder.add_div('Versions_Hosts', versions_hosts_info)
 
+    usage.include('Versions','Versions - Engine')
+    usage.include('Versions','Versions - Hosts')
 
-txt_networktopology = "\
+def section_network_topology(session,hosts_info):
+    """Fetch the network topology from the database, the information of the hosts is read by an input task."""
+    usage = session.usage
+    html_builder = session.html_builder
+    txt_networktopology = "\
 ============================================================================================================================\n\
 ------------------------------------------------------Network Topology------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Network Topology', txt_networktopology)
-usage.add('Network Topology - Database', "")
-usage.add('Network Topology - Hosts', "")
-
-usage.append('Network Topology - Database', "\nNetwork Information for Database:\n")
-html_builder.add_collapsible('NetworkTopology', 'Database', 'Network Topology for database')
-
-filter_info_network = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[1,2,4,7,9,10,11]]
-    }
-dat_info('NetworkTopology_Database','Network','public.network',['table'],filter_info_network,['sort_disable'],'Network Topology - Database',usage) # ['group',[1],[]]
-
-filter_info_network_cluster = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[1,2,3,4,8,9,10]]
-    }
-dat_info('NetworkTopology_Database','Network Attachments','public.network_attachments',['table'],filter_info_network_cluster,['sort_disable'],'Network Topology - Database',usage)
-
-filter_info_network_cluster = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_disable']
-    }
-dat_info('NetworkTopology_Database','Network Cluster','public.network_cluster',['table'],filter_info_network_cluster,['sort_disable'],'Network Topology - Database',usage)
-
-filter_info_network_filter = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_disable']
-    }
-dat_info('NetworkTopology_Database','Network Filter','public.network_filter',['table'],filter_info_network_filter,['sort_disable'],'Network Topology - Database',usage)
-
-usage.append('Network Topology - Database', "\nNetwork Information for Hosts:\n")
-network_hosts_hosts = ""
-# network_hosts_hosts += "This information is fetched by the commands:\n\
-# $ cat sos_commands/networking/ip_-o_addr\n\
-# $ cat sos_commands/networking/route_-n\n\
-# $ cat sos_commands/networking/bridge_-d_vlan_show\n\
-# $ cat sos_commands/networking/ip_-s_-d_link\n"
-html_builder.add_collapsible('NetworkTopology', 'Hosts', 'Network Topology for hosts')
-network_hosts_info_files = {"IP" : [os.path.join("sos_commands","networking","ip_-o_addr"),['filter_disable']],
-                            "Route" : [os.path.join("sos_commands","networking","route_-n"),['filter_disable']],
-                            "Vlan" : [os.path.join("sos_commands","networking","bridge_-d_vlan_show"),['filter_disable']],
-                            "TAP Device" : [os.path.join("sos_commands","networking","ip_-s_-d_link"),['filter_disable']]}
-for host in hosts:
-    network_hosts_hosts += info_from_host(host,network_hosts_info_files)
-usage.append('Network Topology - Database',network_hosts_hosts)
-html_builder.add_div('NetworkTopology_Hosts', network_hosts_hosts)
+    usage.add('Network Topology', txt_networktopology)
+    usage.add('Network Topology - Database', "")
+    usage.add('Network Topology - Hosts', "")
+
+    usage.append('Network Topology - Database', "\nNetwork Information for Database:\n")
+    html_builder.add_collapsible('NetworkTopology', 'Database', 'Network Topology for database')
 
-usage.append('Network Topology', usage.get('Network Topology - Database'))
-usage.append('Network Topology', usage.get('Network Topology - Hosts'))
+    filter_info_network = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[1,2,4,7,9,10,11]]
+        }
+    dat_info(session,'NetworkTopology_Database','Network','public.network',['table'],filter_info_network,['sort_disable'],'Network Topology - Database',usage) # ['group',[1],[]]
 
-txt_storagetopology = "\
+    filter_info_network_cluster = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[1,2,3,4,8,9,10]]
+        }
+    dat_info(session,'NetworkTopology_Database','Network Attachments','public.network_attachments',['table'],filter_info_network_cluster,['sort_disable'],'Network Topology - Database',usage)
+
+    filter_info_network_cluster = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_disable']
+        }
+    dat_info(session,'NetworkTopology_Database','Network Cluster','public.network_cluster',['table'],filter_info_network_cluster,['sort_disable'],'Network Topology - Database',usage)
+
+    filter_info_network_filter = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_disable']
+        }
+    dat_info(session,'NetworkTopology_Database','Network Filter','public.network_filter',['table'],filter_info_network_filter,['sort_disable'],'Network Topology - Database',usage)
+
+    usage.append('Network Topology - Database', "\nNetwork Information for Hosts:\n")
+    network_hosts_hosts = ""
+    # network_hosts_hosts += "This information is fetched by the commands:\n\
+    # $ cat sos_commands/networking/ip_-o_addr\n\
+    # $ cat sos_commands/networking/route_-n\n\
+    # $ cat sos_commands/networking/bridge_-d_vlan_show\n\
+    # $ cat sos_commands/networking/ip_-s_-d_link\n"
+    html_builder.add_collapsible('NetworkTopology', 'Hosts', 'Network Topology for hosts')
+    network_hosts_hosts += hosts_info
+    usage.append('Network Topology - Database',network_hosts_hosts)
+    html_builder.add_div('NetworkTopology_Hosts', network_hosts_hosts)
+
+    usage.include('Network Topology','Network Topology - Database')
+    usage.include('Network Topology','Network Topology - Hosts')
+
+def section_storage_topology(session,hosts_info):
+    """Fetch the storage topology from the database, the information of the hosts is read by an input task."""
+    usage = session.usage
+    html_builder = session.html_builder
+    txt_storagetopology = "\
 ============================================================================================================================\n\
 ------------------------------------------------------Storage Topology------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Storage Topology', txt_storagetopology)
-usage.add('Storage Topology - Database', "")
-usage.add('Storage Topology - Hosts', "")
-
-usage.append('Storage Topology - Database', "\nStorage Information for Database:\n")
-html_builder.add_collapsible('StorageTopology', 'Database', 'Storage Topology for database')
-filter_info_gluster_volumes = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[2,3,4,10]]
-    }
-dat_info('StorageTopology_Database','Volumes','public.gluster_volumes',['table'],filter_info_gluster_volumes,['sort_disable'],'Storage Topology - Database',usage) 
-filter_info_storage_pool = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[1,2,3,5,8]]
-    }
-dat_info('StorageTopology_Database','Data Centers','public.storage_pool',['table'],filter_info_storage_pool,['sort_disable'],'Storage Topology - Database',usage) 
-filter_info_base_disks = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[0,3,4,5,7,8,9,10]]
-    }
-dat_info('StorageTopology_Database','Storage Disks','public.base_disks',['table'],filter_info_base_disks,['sort_disable'],'Storage Topology - Database',usage) 
-filter_info_storage_domain_static = {
-    'col_value':['filter_disable'],
-    'col_index':['filter_in',[2,3,4,5]]
-    }
-dat_info('StorageTopology_Database','Storage Domains','public.storage_domain_static',['table'],filter_info_storage_domain_static,['sort_disable'],'Storage Topology - Database',usage) 
-
-usage.append('Storage Topology - Hosts',"\nStorage Information for Hosts:\n")
-storage_hosts_info = ""
-# storage_hosts_info += "This information is fetched by the commands:\n\
-# $ cat sos_commands/vdsm/vdsm-client_Host_getConnectedStoragePools\n\
-# $ cat sos_commands/vdsm/vdsm-client_Host_getStorageDomains\n"
-html_builder.add_collapsible('StorageTopology', 'Hosts', 'Storage Topology for hosts')
-storage_hosts_info_files = {"Connected Storage Pools" : [os.path.join("sos_commands","vdsm","vdsm-client_Host_getConnectedStoragePools"),['filter_disable']], 
-                            "Storage Domains" : [os.path.join("sos_commands","vdsm","vdsm-client_Host_getStorageDomains"),['filter_disable']]}
-for host in hosts:
-    storage_hosts_info += info_from_host(host,storage_hosts_info_files)
-usage.append('Storage Topology - Hosts',storage_hosts_info)
-html_builder.add_div('StorageTopology_Hosts', storage_hosts_info)
+    usage.add('Storage Topology', txt_storagetopology)
+    usage.add('Storage Topology - Database', "")
+    usage.add('Storage Topology - Hosts', "")
+
+    usage.append('Storage Topology - Database', "\nStorage Information for Database:\n")
+    html_builder.add_collapsible('StorageTopology', 'Database', 'Storage Topology for database')
+    filter_info_gluster_volumes = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[2,3,4,10]]
+        }
+    dat_info(session,'StorageTopology_Database','Volumes','public.gluster_volumes',['table'],filter_info_gluster_volumes,['sort_disable'],'Storage Topology - Database',usage) 
+    filter_info_storage_pool = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[1,2,3,5,8]]
+        }
+    dat_info(session,'StorageTopology_Database','Data Centers','public.storage_pool',['table'],filter_info_storage_pool,['sort_disable'],'Storage Topology - Database',usage) 
+    filter_info_base_disks = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[0,3,4,5,7,8,9,10]]
+        }
+    dat_info(session,'StorageTopology_Database','Storage Disks','public.base_disks',['table'],filter_info_base_disks,['sort_disable'],'Storage Topology - Database',usage) 
+    filter_info_storage_domain_static = {
+        'col_value':['filter_disable'],
+        'col_index':['filter_in',[2,3,4,5]]
+        }
+    dat_info(session,'StorageTopology_Database','Storage Domains','public.storage_domain_static',['table'],filter_info_storage_domain_static,['sort_disable'],'Storage Topology - Database',usage) 
 
-usage.append('Storage Topology',usage.get('Storage Topology - Database'))
-usage.append('Storage Topology',usage.get('Storage Topology - Hosts'))
+    usage.append('Storage Topology - Hosts',"\nStorage Information for Hosts:\n")
+    storage_hosts_info = ""
+    # storage_hosts_info += "This information is fetched by the commands:\n\
+    # $ cat sos_commands/vdsm/vdsm-client_Host_getConnectedStoragePools\n\
+    # $ cat sos_commands/vdsm/vdsm-client_Host_getStorageDomains\n"
+    html_builder.add_collapsible('StorageTopology', 'Hosts', 'Storage Topology for hosts')
+    storage_hosts_info += hosts_info
+    usage.append('Storage Topology - Hosts',storage_hosts_info)
+    html_builder.add_div('StorageTopology_Hosts', storage_hosts_info)
 
-txt_healthcheck = "\
+    usage.include('Storage Topology','Storage Topology - Database')
+    usage.include('Storage Topology','Storage Topology - Hosts')
+
+def section_health_check(session):
+    """Compare the engine configuration with the default values, the result is the table of the check results."""
+    usage = session.usage
+    txt_healthcheck = "\
 ============================================================================================================================\n\
 --------------------------------------------------------Health Check---------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Health Check', txt_healthcheck)
-
-txt_healthcheck += "\nHealth Check:\n"
-default_values = {
-    'vdsTimeout':['180'],
-    'vdsConnectionTimeout':['20'],
-    'VdsRefreshRate':['3'],
-    'TimeoutToResetVdsInSeconds':['60'],
-    'StoragePoolRefreshTimeInSeconds':['10'],
-    'SpmVCpuConsumption':['1'],
-    'SpmCommandFailOverRetries':['3'],
-    'SPMFailOverAttempts':['3'],
-    'DelayResetForSpmInSeconds':['20'],
-    'StorageDomainFailureTimeoutInMinutes':['5'],
-    'MaxStorageVdsTimeoutCheckSec':['30'],
-    'MaxStorageVdsDelayCheckSec':['5'],
-    'ImageProxyAddress': ['<OLVM FQDN>:54323', 'general'],
-    'ImageTransferClientTicketValidityInSeconds':['36000'],
-    'LogMaxNetworkUsedThresholdInPercentage':['95'],
-    'MaxVdsMemOverCommit': ['200'],
-    'MaxVdsMemOverCommitForServers': ['150'] ,
-    'UserSessionTimeOutInterval': ['30']
-    }
-healthchecker(default_values,usage)
-
-
-txt_errorevents = "\
+    usage.add('Health Check', txt_healthcheck)
+
+    txt_healthcheck += "\nHealth Check:\n"
+    default_values = {
+        'vdsTimeout':['180'],
+        'vdsConnectionTimeout':['20'],
+        'VdsRefreshRate':['3'],
+        'TimeoutToResetVdsInSeconds':['60'],
+        'StoragePoolRefreshTimeInSeconds':['10'],
+        'SpmVCpuConsumption':['1'],
+        'SpmCommandFailOverRetries':['3'],
+        'SPMFailOverAttempts':['3'],
+        'DelayResetForSpmInSeconds':['20'],
+        'StorageDomainFailureTimeoutInMinutes':['5'],
+        'MaxStorageVdsTimeoutCheckSec':['30'],
+        'MaxStorageVdsDelayCheckSec':['5'],
+        'ImageProxyAddress': ['<OLVM FQDN>:54323', 'general'],
+        'ImageTransferClientTicketValidityInSeconds':['36000'],
+        'LogMaxNetworkUsedThresholdInPercentage':['95'],
+        'MaxVdsMemOverCommit': ['200'],
+        'MaxVdsMemOverCommitForServers': ['150'] ,
+        'UserSessionTimeOutInterval': ['30']
+        }
+    return healthchecker(session,default_values,usage)
+
+def section_error_events(session):
+    """Fetch the error events from the audit log."""
+    usage = session.usage
+    txt_errorevents = "\
 ============================================================================================================================\n\
 --------------------------------------------------------Error Events--------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Error Events',txt_errorevents)
-filter_info_audit_log = {
-    'col_value':['filter_in',13,['error','Error','failed','Failed','except','Except']],
-    'col_index':['filter_in',[9,13]]
-    }
-dat_info('ErrorEvents','Error Events','public.audit_log',['table'],filter_info_audit_log,[9],'Error Events',usage)
-
+    usage.add('Error Events',txt_errorevents)
+    filter_info_audit_log = {
+        'col_value':['filter_in',13,['error','Error','failed','Failed','except','Except']],
+        'col_index':['filter_in',[9,13]]
+        }
+    dat_info(session,'ErrorEvents','Error Events','public.audit_log',['table'],filter_info_audit_log,[9],'Error Events',usage)
 
-txt_other = "\
+def section_other(session,datacenter_tree_info,hosted_engine_info):
+    """Show the datacenter tree and the hosted engine configuration of the hosts, they are read by input tasks."""
+    usage = session.usage
+    html_builder = session.html_builder
+    txt_other = "\
 ============================================================================================================================\n\
 -----------------------------------------------------------Other------------------------------------------------------------\n\
 ============================================================================================================================\n\
 "
-usage.add('Other', txt_other)
-usage.add('Other - Datacenter Tree for hosts', "")
-usage.add('Other - Hosted Engine for hosts', "")
-
-usage.append('Other - Datacenter Tree for hosts',"\nDatacenter Tree for Hosts:\n")
-html_builder.add_collapsible('Other', 'Datacenter_Tree', 'Datacenter Tree for hosts')
-datacenter_tree_hosts_info = ""
-# datacenter_tree_hosts_info += "This information is fetched by the commands:\n\
-# $ cat sos_commands/vdsm/su_vdsm_-s_.bin.sh_-c_tree_-l_.rhev.data-center\n"
-datacenter_tree_hosts_info_files = {"Datacenter Tree" : [os.path.join("sos_commands","vdsm","su_vdsm_-s_.bin.sh_-c_tree_-l_.rhev.data-center"),['filter_disable']]}
-for host in hosts:
-    datacenter_tree_hosts_info += info_from_host(host,datacenter_tree_hosts_info_files)
-usage.append('Other - Datacenter Tree for hosts',datacenter_tree_hosts_info)
-html_builder.add_div('Other_Datacenter_Tree', datacenter_tree_hosts_info)
-
-
-usage.append('Other - Hosted Engine for hosts', "\nHosted Engine for Hosts:\n")
-html_builder.add_collapsible('Other', 'Hosted_Engine', 'Hosted Engine for hosts')
-hosted_engine_hosts_info = ""
-# hosted_engine_hosts_info += "This information is fetched by the commands:\n\
-# $ cat etc/ovirt-hosted-engine/hosted-engine.conf  | egrep 'disk|sdUUID|spUUID|vmid'\n\
-# $ cat sos_commands/ovirt_hosted_engine/hosted-engine_--vm-status\n\
-# $ cat sos_commands/ovirt_hosted_engine/hosted-engine_--check-liveliness\n"
-hosted_engine_hosts_info_files = {"Datacenter Tree" : [os.path.join("etc","ovirt-hosted-engine","hosted-engine.conf"),['line',['disk','sdUUID','spUUID','vmid']]],
-                                  "Liveliness":[os.path.join("sos_commands","ovirt_hosted_engine","hosted-engine_--check-liveliness"),['filder_disable']]}
-for host in hosts:
-    hosted_engine_hosts_info += info_from_host(host,hosted_engine_hosts_info_files)
-usage.append('Other - Hosted Engine for hosts', hosted_engine_hosts_info)
-html_builder.add_div('Other_Hosted_Engine', hosted_engine_hosts_info)
+    usage.add('Other', txt_other)
+    usage.add('Other - Datacenter Tree for hosts', "")
+    usage.add('Other - Hosted Engine for hosts', "")
 
-usage.append('Other', usage.get('Other - Datacenter Tree for hosts'))
-usage.append('Other', usage.get('Other - Hosted Engine for hosts'))
+    usage.append('Other - Datacenter Tree for hosts',"\nDatacenter Tree for Hosts:\n")
+    html_builder.add_collapsible('Other', 'Datacenter_Tree', 'Datacenter Tree for hosts')
+    datacenter_tree_hosts_info = ""
+    # datacenter_tree_hosts_info += "This information is fetched by the commands:\n\
+    # $ cat sos_commands/vdsm/su_vdsm_-s_.bin.sh_-c_tree_-l_.rhev.data-center\n"
+    datacenter_tree_hosts_info += datacenter_tree_info
+    usage.append('Other - Datacenter Tree for hosts',datacenter_tree_hosts_info)
+    html_builder.add_div('Other_Datacenter_Tree', datacenter_tree_hosts_info)
 
-html_builder.generate_file(dt_string)
-output_file_txt.write(usage.print_all())
 
-'''
-Print a message block after all files generated successfully.
-'''
-generated_msg = []
-generated_msg.append("Files are generated successfully!")
-generated_msg.append("")
-generated_msg.append("Source sosreport:")
-generated_msg.append(sosreport_path)
-generated_msg.append("Directory of the output files:")
-generated_msg.append(path.output_path)
-generated_msg.append("Generated files:")
-generated_msg.append("olvm_healthchecker_" + dt_string + ".txt")
-generated_msg.append("olvm_healthchecker_" + dt_string + ".html")
-max_width = len(max(generated_msg, key = len))
-msg = "+" + "="*max_width + "+\n"
-for idx,command in enumerate(generated_msg):
-    if idx == 1:
-        msg += "+" + "-"*max_width + "+\n"
+    usage.append('Other - Hosted Engine for hosts', "\nHosted Engine for Hosts:\n")
+    html_builder.add_collapsible('Other', 'Hosted_Engine', 'Hosted Engine for hosts')
+    hosted_engine_hosts_info = ""
+    # hosted_engine_hosts_info += "This information is fetched by the commands:\n\
+    # $ cat etc/ovirt-hosted-engine/hosted-engine.conf  | egrep 'disk|sdUUID|spUUID|vmid'\n\
+    # $ cat sos_commands/ovirt_hosted_engine/hosted-engine_--vm-status\n\
+    # $ cat sos_commands/ovirt_hosted_engine/hosted-engine_--check-liveliness\n"
+    hosted_engine_hosts_info += hosted_engine_info
+    usage.append('Other - Hosted Engine for hosts', hosted_engine_hosts_info)
+    html_builder.add_div('Other_Hosted_Engine', hosted_engine_hosts_info)
+
+    usage.include('Other','Other - Datacenter Tree for hosts')
+    usage.include('Other','Other - Hosted Engine for hosts')
+
+# Inputs of the sections, they are read concurrently: [<name>, <function>, [<dependencies>], [<tables>], [<arguments>]]
+# The function gets the session, the results of the dependencies and the arguments, the .dat files of the tables are extracted first.
+report_inputs = [
+    ['Hosts', input_hosts, [], ['public.vds_static'], []],
+    ['Virtual Machines - host files', info_from_hosts, ['Hosts'], [], [vm_hosts_info_files]],
+    ['Versions - engine files', info_from_engine, [], [], [versions_engine_info_files]],
+    ['Versions - host files', info_from_hosts, ['Hosts'], [], [versions_hosts_info_files]],
+    ['Network Topology - host files', info_from_hosts, ['Hosts'], [], [network_hosts_info_files]],
+    ['Storage Topology - host files', info_from_hosts, ['Hosts'], [], [storage_hosts_info_files]],
+    ['Other - Datacenter Tree host files', info_from_hosts, ['Hosts'], [], [datacenter_tree_hosts_info_files]],
+    ['Other - Hosted Engine host files', info_from_hosts, ['Hosts'], [], [hosted_engine_hosts_info_files]]
+    ]
+
+# Sections of the report in the order of the tabs and the menu: [<name>, <function>, [<inputs>], [<tables>], [<menu items>]]
+# The function gets the session and the results of the inputs, the .dat files of the tables are extracted first.
+report_layout = [
+    ['KVM Hosts', section_kvm_hosts, ['Hosts'], ['public.vds_static'], ['KVM Hosts']],
+    ['Virtual Machines', section_virtual_machines, ['Virtual Machines - host files'], ['public.vm_dynamic'], ['Virtual Machines', 'Virtual Machines - Database', 'Virtual Machines - Hosts']],
+    ['Versions', section_versions, ['Versions - engine files', 'Versions - host files'], [], ['Versions', 'Versions - Engine', 'Versions - Hosts']],
+    ['Network Topology', section_network_topology, ['Network Topology - host files'], ['public.network', 'public.network_attachments', 'public.network_cluster', 'public.network_filter'], ['Network Topology', 'Network Topology - Database', 'Network Topology - Hosts']],
+    ['Storage Topology', section_storage_topology, ['Storage Topology - host files'], ['public.gluster_volumes', 'public.storage_pool', 'public.base_disks', 'public.storage_domain_static'], ['Storage Topology', 'Storage Topology - Database', 'Storage Topology - Hosts']],
+    ['Health Check', section_health_check, [], [], ['Health Check']],
+    ['Error Events', section_error_events, [], ['public.audit_log'], ['Error Events']],
+    ['Other', section_other, ['Other - Datacenter Tree host files', 'Other - Hosted Engine host files'], [], ['Other', 'Other - Datacenter Tree for hosts', 'Other - Hosted Engine for hosts']]
+    ]
+
+def select_sections(names=None):
+    """
+    Select sections of the report and the inputs they need.
+    
+    Parameters
+    ----------
+        names : list
+            Section names, see report_layout. Case, spaces, '-' and '_' are ignored, e.g. 'healthcheck' or 'Error_Events'.
+            All sections if None.
+            
+    Returns
+    -------
+        layout : list
+            The selected sections in report_layout, in the order of the tabs.
+        inputs : list
+            The inputs in report_inputs that the selected sections need directly or through other inputs.
+    
+    """
+    def key(name):
+        return re.sub(r"[\s_-]", "", name).lower()
+    if names is None:
+        layout = list(report_layout)
+    else:
+        keys = [key(name) for name in names]
+        unknown = [name for name in names if key(name) not in [key(section[0]) for section in report_layout]]
+        if unknown:
+            raise ValueError("Unknown sections: " + ", ".join(unknown) + ". The sections are: " + ", ".join([section[0] for section in report_layout]) + ".")
+        layout = [section for section in report_layout if key(section[0]) in keys]
+    input_layout = dict((report_input[0], report_input) for report_input in report_inputs)
+    needed = set()
+    pending = [dependency for section in layout for dependency in section[2]]
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(input_layout[name][2])
+    inputs = [report_input for report_input in report_inputs if report_input[0] in needed]
+    return layout, inputs
+
+class healthcheck_session(object):
+    """
+    A class used to check one sosreport bundle, it holds everything a run needs instead of module globals.
+    Nothing is read before the session is created, and nothing is computed before a section is needed.
+    
+    Attributes
+    ----------
+        sosreport_path : str
+            The path of the sosreport bundle.
+        dt_string : str
+            The local date and time used in the names of the output files.
+        path : path_collection
+            The paths of the bundle and the output folder.
+        layout : list
+            The selected sections in report_layout.
+        inputs : list
+            The inputs in report_inputs that the selected sections need.
+        sections : report_sections
+            The task graph of the selected sections and the inputs and tables they need, see report_layout and report_inputs.
+            The tables are the tasks 'table <table name>', e.g. 'table public.vds_static'.
+        usage : result_storage
+            The text results of the sections.
+        html_builder : Html_builder
+            The HTML file of the report.
+        html_file : str
+            The path of the HTML file.
+        html_parts : dict
+            The HTML of the computed sections that are not added to html_builder yet, see add_html.
+        html_next : int
+            Index in layout of the next section whose HTML is added to html_builder.
+        html_lock : Lock
+            Guards html_parts and html_next.
+    
+    Methods
+    -------
+        bind(self,function,arguments=())
+            Bind a task function to the session.
+        compute_section(self,name,function,*inputs)
+            Compute a section with its own part of the HTML file.
+        add_html(self,name,part)
+            Add the HTML of the computed sections to the HTML file in the order of the tabs.
+        compute(self,name)
+            Compute a section and its dependencies.
+        run(self)
+            Compute all sections and write the output files.
+        write_report(self)
+            Write the HTML and text files once all sections are computed.
+        results(self)
+            Get the text of every item.
+        generated_message(self)
+            Get the message block printed after the files are generated.
+    
+    """
+    def __init__(self,sosreport_path,output_dir=None,dt_string=None,sql_scan='stream',extract_hosts=False,cache_dir=None,table_mode='rows',page_size=None,threads=8,sections=None):
+        """
+        Constructs a session for the given sosreport bundle.
+
+        Parameters
+        ----------
+            sosreport_path : str
+                The path of the sosreport with a log-collector-data and an engine sosreport inside.
+            output_dir : str
+                The directory of the output folder, the current directory by default.
+            dt_string : str
+                The local date and time used in the names of the output files, now by default.
+            sql_scan : str
+                How restore.sql is scanned for COPY headers, 'stream' or 'mmap', see copy_headers.
+            extract_hosts : bool
+                Extract the host sosreports instead of reading them straight from the archives.
+            cache_dir : str
+                The directory of the persistent cache, no cache if None.
+            table_mode : str
+                How the HTML tables are written, 'rows' or 'json', see Html_builder.
+            page_size : int
+                Size budget in bytes of the tables and divs in the HTML file, see Html_builder.
+            threads : int
+                Number of sections and inputs that are computed at the same time, 1 to compute them one after another.
+            sections : list
+                Names of the sections to compute, see report_layout, all sections if None.
+                Only the tables and the host and engine files these sections need are read.
+                
+        """
+        self.layout, self.inputs = select_sections(sections)
+        tables = []
+        for layout in self.inputs + self.layout:
+            tables.extend(name_table for name_table in layout[3] if name_table not in tables)
+        self.sosreport_path = os.path.realpath(sosreport_path)
+        self.dt_string = dt_string or datetime.now().strftime("%m%d%Y-%H%M%S")
+        self.path = path_collection(self.sosreport_path,os.path.realpath(output_dir or os.getcwd()),self.dt_string,sql_scan=sql_scan,extract_hosts=extract_hosts,cache_dir=cache_dir,database=len(tables) > 0)
+        self.html_file = os.path.join(self.path.output_path, "olvm_healthchecker_"+self.dt_string+".html")
+        self.html_builder = Html_builder([layout[0] for layout in self.layout],self.html_file,table_mode=table_mode,page_size=page_size)
+        self.html_parts = {}
+        self.html_next = 0
+        self.html_lock = threading.Lock()
+        self.sections = report_sections(threads)
+        self.usage = result_storage(self.sections,spool_dir=self.path.output_path)
+        for name_table in tables:
+            self.sections.register('table '+name_table,partial(input_table,self,name_table))
+        for name, function, dependencies, input_tables, arguments in self.inputs:
+            self.sections.register(name,self.bind(function,arguments),dependencies,['table '+name_table for name_table in input_tables])
+        for name, function, dependencies, input_tables, commands in self.layout:
+            self.sections.register(name,partial(self.compute_section,name,function),dependencies,['table '+name_table for name_table in input_tables])
+            self.usage.declare(name,commands)
+    
+    def bind(self,function,arguments=()):
+        """
+        Bind a task function to the session.
+    
+        Parameters
+        ----------
+            function : function
+                The task function, it gets the session, the results of the dependencies and the arguments.
+            arguments : list
+                The arguments after the results of the dependencies.
+                
+        Returns
+        -------
+            task : function
+                The function that gets the results of the dependencies.
+        
+        """
+        def task(*results):
+            return function(self,*(results + tuple(arguments)))
+        return task
+    
+    def compute_section(self,name,function,*inputs):
+        """
+        Compute a section with its own part of the HTML file, so sections can be computed concurrently.
+        The section function gets a copy of the session whose html_builder is the part.
+    
+        Parameters
+        ----------
+            name : str
+                Section name, see report_layout.
+            function : function
+                The section function.
+            inputs : 
+                The results of the inputs of the section.
+                
+        Returns
+        -------
+            result : 
+                The result of the section function.
+        
+        """
+        section = copy.copy(self)
+        section.html_builder = self.html_builder.part(name)
+        try:
+            result = function(section,*inputs)
+        except Exception:
+            if section.html_builder.html is not None:
+                section.html_builder.html.close()
+            raise
+        self.add_html(name,section.html_builder)
+        return result
+    
+    def add_html(self,name,part):
+        """
+        Add the HTML of a computed section to the HTML file, the parts are added in the order of the tabs
+        as soon as the sections before them are computed.
+    
+        Parameters
+        ----------
+            name : str
+                Section name, see report_layout.
+            part : Html_builder
+                The part of the section.
+                
+        Returns
+        -------
+        None
+        
+        """
+        with self.html_lock:
+            self.html_parts[name] = part
+            while self.html_next < len(self.layout) and self.layout[self.html_next][0] in self.html_parts:
+                self.html_builder.add_part(self.html_parts.pop(self.layout[self.html_next][0]))
+                self.html_next += 1
+    
+    def compute(self,name):
+        """
+        Compute a section and its dependencies if they are not computed yet.
+    
+        Parameters
+        ----------
+            name : str
+                Name of a selected section, see report_layout.
+                
+        Returns
+        -------
+            result : 
+                The result of the section function, e.g. the host names for 'KVM Hosts'.
+        
+        """
+        return self.sections.compute(name)
+    
+    def run(self):
+        """Compute all sections and write the output files, the files are written even if a section fails."""
+        try:
+            self.sections.compute_all()
+        finally:
+            self.write_report()
+        return self
+    
+    def write_report(self):
+        """
+        Write the HTML and text files once all sections are computed.
+        If a section failed, the files are finished with the sections that are computed.
+        """
+        dat_report = self.path.dat_report()
+        if dat_report is not None:
+            print(dat_report)
+        try:
+            with self.html_lock:
+                # The sections after a failed one are still waiting for it
+                for layout in self.layout[self.html_next:]:
+                    if layout[0] in self.html_parts:
+                        self.html_builder.add_part(self.html_parts.pop(layout[0]))
+                self.html_next = len(self.layout)
+            self.html_builder.generate_file(self.html_file)
+        finally:
+            try:
+                self.usage.write_all(self.path.output_txt.write)
+            finally:
+                self.path.output_txt.close()
+    
+    def results(self):
+        """
+        Get the text of every item that is computed.
+    
+        Returns
+        -------
+            results : dict
+                '<item name>': '<text>'
+        
+        """
+        return dict((command, self.usage.get(command)) for command in self.usage.command_table)
+    
+    def generated_message(self):
+        """
+        Get the message block printed after all files are generated successfully.
+    
+        Returns
+        -------
+            msg : str
+                The message block.
+        
+        """
+        generated_msg = []
+        generated_msg.append("Files are generated successfully!")
+        generated_msg.append("")
+        generated_msg.append("Source sosreport:")
+        generated_msg.append(self.sosreport_path)
+        generated_msg.append("Directory of the output files:")
+        generated_msg.append(self.path.output_path)
+        generated_msg.append("Generated files:")
+        generated_msg.append("olvm_healthchecker_" + self.dt_string + ".txt")
+        generated_msg.append("olvm_healthchecker_" + self.dt_string + ".html")
+        max_width = len(max(generated_msg, key = len))
+        msg = "+" + "="*max_width + "+\n"
+        for idx,command in enumerate(generated_msg):
+            if idx == 1:
+                msg += "+" + "-"*max_width + "+\n"
+            else:
+                msg += "|" + command + " "*(max_width-len(command)) + "|\n"
+        msg += "+" + "="*max_width + "+\n"
+        return msg
+
+def check_bundle(sosreport_path,**options):
+    """
+    Check a sosreport bundle without the menu, the library equivalent of running the script with --batch.
+    
+    Parameters
+    ----------
+        sosreport_path : str
+            The path of the sosreport with a log-collector-data and an engine sosreport inside.
+        options : 
+            Keyword arguments of healthcheck_session, e.g. output_dir, cache_dir or sections.
+            
+    Returns
+    -------
+        session : healthcheck_session
+            The session after all files are written, see healthcheck_session.results.
+    
+    """
+    return healthcheck_session(sosreport_path,**options).run()
+
+def find_bundles(paths):
+    """
+    Find the LogCollector bundles in the given paths.
+    
+    Parameters
+    ----------
+        paths : list
+            Bundles, or directories whose subdirectories named like '*-LogCollector-*' are the bundles.
+            
+    Returns
+    -------
+        bundles : list
+            The paths of the bundles in the given order without duplicates, sorted by name within a directory.
+    
+    """
+    bundles = []
+    for bundle_path in paths:
+        bundle_path = os.path.realpath(bundle_path)
+        if "-LogCollector-" in os.path.basename(bundle_path):
+            found = [bundle_path]
+        elif os.path.isdir(bundle_path):
+            found = [os.path.join(bundle_path, file_name) for file_name in sorted(os.listdir(bundle_path))
+                     if "-LogCollector-" in file_name and os.path.isdir(os.path.join(bundle_path, file_name))]
+        else:
+            print("There is no such bundle or directory: " + bundle_path)
+            found = []
+        # A bundle is checked once even if it is given more than once
+        bundles.extend(bundle for bundle in found if bundle not in bundles)
+    return bundles
+
+def fleet_bundle(job):
+    """
+    Check one bundle without the menu, used as the worker of check_fleet.
+    
+    Parameters
+    ----------
+        job : tuple
+            (<bundle path>, <keyword arguments of healthcheck_session>)
+            
+    Returns
+    -------
+        result : tuple
+            (<bundle path>, <output folder or None>, <mismatches>, <error message or None>)
+            The mismatches are [<name>, <actual value>, <default value>] for every configuration value that is not a match,
+            None if the Health Check section is not selected.
+    
+    """
+    bundle_path, options = job
+    try:
+        session = check_bundle(bundle_path, **options)
+        mismatches = None
+        if 'Health Check' in session.sections.functions:
+            check_table = session.compute('Health Check')
+            mismatches = [list(row[:3]) for row in check_table.rows() if row[3] != 'Match']
+        return bundle_path, session.path.output_path, mismatches, None
+    except Exception as error:
+        return bundle_path, None, [], str(error)
+
+def fleet_summary(results):
+    """
+    Format the health check mismatches of every bundle.
+    
+    Parameters
+    ----------
+        results : list
+            The results of fleet_bundle.
+            
+    Returns
+    -------
+        summary : str
+            A table of the bundles followed by a table of their mismatches, the output folders are inside the bundles.
+    
+    """
+    bundle_header = ["Bundle","Status","Mismatches","Output Folder"]
+    bundle_rows = []
+    mismatch_header = ["Bundle","Name","Actual Value","Default Value"]
+    mismatch_rows = []
+    for bundle_path, output_path, mismatches, error in results:
+        bundle = os.path.basename(bundle_path)
+        if error is not None:
+            bundle_rows.append([bundle, "Failed: " + error, "", ""])
+            continue
+        if mismatches is None:
+            bundle_rows.append([bundle, "Done", "", os.path.basename(output_path)])
+            continue
+        bundle_rows.append([bundle, "Done", str(len(mismatches)), os.path.basename(output_path)])
+        for mismatch in mismatches:
+            mismatch_rows.append([bundle] + mismatch)
+    summary = "\nBundles:\n" + format_table(dat_table("","",bundle_header,rows=bundle_rows),list(range(len(bundle_header))))
+    summary += "\nHealth Check mismatches:\n"
+    if results and all(result[2] is None for result in results):
+        summary += "The Health Check section is not selected.\n"
+    elif len(mismatch_rows) == 0:
+        summary += "None\n"
     else:
-        msg += "|" + command + " "*(max_width-len(command)) + "|\n"
-msg += "+" + "="*max_width + "+\n"
-print(msg)
-usage.print_command()
+        summary += format_table(dat_table("","",mismatch_header,rows=mismatch_rows),list(range(len(mismatch_header))))
+    return summary
+
+def check_fleet(paths,output_dir=None,processes=None,**options):
+    """
+    Check many bundles concurrently in a process pool bounded by the number of cores, without the menu.
+    The reports of each bundle are written to the olvm_healthchecker_output_<date> folder inside the bundle,
+    the fleet summary is written to output_dir.
+    
+    Parameters
+    ----------
+        paths : list
+            Bundles or directories of bundles, see find_bundles.
+        output_dir : str
+            The directory of the fleet summary, the current directory by default.
+        processes : int
+            Number of worker processes, the number of cores by default.
+        options : 
+            Keyword arguments of healthcheck_session, e.g. cache_dir.
+            
+    Returns
+    -------
+        results : list
+            (<bundle path>, <output folder or None>, <mismatches>, <error message or None>) for every bundle, see fleet_bundle.
+        summary_file : str
+            The path of the fleet summary.
+    
+    """
+    bundles = find_bundles(paths)
+    options.setdefault('dt_string', datetime.now().strftime("%m%d%Y-%H%M%S"))
+    jobs = [(bundle_path, dict(options, output_dir=bundle_path)) for bundle_path in bundles]
+    results = []
+    start = time.time()
+    if len(jobs) > 0:
+        processes = min(len(jobs), processes or multiprocessing.cpu_count())
+        pool = (process_context() or multiprocessing).Pool(processes)
+        try:
+            results = pool.map(fleet_bundle, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    summary = fleet_summary(results)
+    summary += "\nChecked " + str(len(bundles)) + " bundles with " + str(processes) + " processes in " + "%.1fs" % (time.time() - start) + ".\n"
+    summary_file = os.path.join(os.path.realpath(output_dir or os.getcwd()), "olvm_healthchecker_fleet_" + options['dt_string'] + ".txt")
+    output_file = open(summary_file, 'w')
+    output_file.write(summary)
+    output_file.close()
+    return results, summary_file
+
+def default_cache_dir():
+    """The persistent cache directory, $XDG_CACHE_HOME/olvm_healthchecker or ~/.cache/olvm_healthchecker."""
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser("~"), ".cache")), "olvm_healthchecker")
+
+def parse_args(argv=None):
+    """
+    Parse the command line.
+    
+    Parameters
+    ----------
+        argv : list
+            The arguments without the program name, sys.argv[1:] by default.
+            
+    Returns
+    -------
+        args : Namespace
+            The parsed arguments.
+    
+    """
+    parser = argparse.ArgumentParser(description="Generate a health check report of an OLVM sosreport bundle.")
+    parser.add_argument('sosreport_path', nargs='?', default=os.getcwd(), help="the sosreport bundle, the current directory by default")
+    parser.add_argument('--output-dir', default=os.getcwd(), help="the directory of the output folder, the current directory by default")
+    parser.add_argument('--batch', action='store_true', help="write the output files without the menu")
+    parser.add_argument('--fleet', nargs='+', metavar='PATH', help="check many bundles, or directories of bundles, in a process pool without the menu")
+    parser.add_argument('--processes', type=int, help="number of worker processes of --fleet, the number of cores by default")
+    parser.add_argument('--threads', type=int, default=8, help="number of report sections and inputs read at the same time, 1 to read them one after another")
+    parser.add_argument('--sections', nargs='+', metavar='SECTION', help="compute only these sections and read only their inputs: " + ", ".join(["'" + section[0] + "'" for section in report_layout]))
+    parser.add_argument('--sql-scan', choices=['stream', 'mmap'], default='stream', help="read restore.sql line by line (stream) or memory-mapped (mmap) to find the tables, stream by default")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the persistent cache of parsed tables")
+    parser.add_argument('--extract-hosts', action='store_true', help="extract the host sosreports instead of reading the archives")
+    parser.add_argument('--html-json', action='store_true', help="write the HTML tables as JSON with virtual scrolling")
+    parser.add_argument('--page-size', type=int, metavar='MB', help="move HTML tables and divs above this size to page files")
+    return parser.parse_args(argv)
+
+def wait_report(session):
+    """
+    Wait for the background thread of the menu to compute the remaining sections and write the output files.
+    The first Ctrl-C stops starting sections, the running ones are finished and the files hold the computed sections.
+    A second Ctrl-C exits right away and the output files are not written.
+    
+    Parameters
+    ----------
+        session : healthcheck_session
+            The session whose sections are computed by report_sections.fill.
+            
+    Returns
+    -------
+    None
+    
+    """
+    sections = [layout[0] for layout in session.layout]
+    pending = [name for name in session.sections.pending() if name in sections]
+    if pending:
+        print("Writing the output files once these sections are computed: " + ", ".join(pending) + ".")
+        print("Press Ctrl-C to write them with the computed sections only.")
+    try:
+        session.sections.wait()
+    except KeyboardInterrupt:
+        session.sections.stop()
+        running = [name for name in session.sections.pending() if name in sections and name in session.sections.running]
+        if running:
+            print("\nWaiting for the running sections: " + ", ".join(running) + ". Press Ctrl-C again to exit without the output files.")
+        try:
+            session.sections.wait()
+        except KeyboardInterrupt:
+            print("\nThe output files in " + session.path.output_path + " are incomplete.")
+            sys.exit(130)
+        skipped = [name for name in session.sections.pending() if name in sections]
+        if skipped:
+            print("The output files do not have these sections: " + ", ".join(skipped) + ".")
+
+def main(argv=None):
+    """
+    Run the script, the menu is shown right away and the sections that are not selected are computed in the background.
+    
+    Parameters
+    ----------
+        argv : list
+            The arguments without the program name, sys.argv[1:] by default.
+            
+    Returns
+    -------
+        session : healthcheck_session
+            The session of the run, None for --fleet.
+            The process exits with status 1 if a section fails, the output files then hold the computed sections.
+    
+    """
+    args = parse_args(argv)
+    if args.sections:
+        try:
+            select_sections(args.sections)
+        except ValueError as error:
+            print(str(error))
+            sys.exit(2)
+    options = {'sql_scan': args.sql_scan,
+               'extract_hosts': args.extract_hosts,
+               'cache_dir': None if args.no_cache else default_cache_dir(),
+               'table_mode': 'json' if args.html_json else 'rows',
+               'page_size': args.page_size << 20 if args.page_size else None,
+               'threads': args.threads,
+               'sections': args.sections}
+    try:
+        if args.fleet:
+            results, summary_file = check_fleet(args.fleet, args.output_dir, args.processes, **options)
+            print(open(summary_file).read())
+            print("Fleet summary: " + summary_file)
+            return None
+        session = healthcheck_session(args.sosreport_path, output_dir=args.output_dir, **options)
+        error = None
+        if args.batch:
+            try:
+                session.run()
+            except Exception as run_error:
+                error = run_error
+        else:
+            session.sections.fill(session.write_report)
+            session.usage.print_command()
+            wait_report(session)
+            error = session.sections.error
+    except KeyboardInterrupt:
+        print("\n")
+        sys.exit()
+    if error is not None:
+        print("The report is incomplete, a section failed: " + type(error).__name__ + ": " + str(error))
+        print("The sections that were computed are in " + session.path.output_path)
+        sys.exit(1)
+    print(session.generated_message())
+    return session
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
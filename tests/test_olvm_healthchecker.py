@@ -0,0 +1,1319 @@
+"""
+Tests of olvm_healthchecker.
+
+Run with python -m pytest tests or python -m unittest discover tests.
+"""
+import errno
+import io
+import json
+import os
+import sys
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import unittest
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import olvm_healthchecker as healthchecker
+
+restore_sql = """--
+-- PostgreSQL database dump
+--
+COPY public.network (id, name, mtu) FROM stdin;
+\\.
+COPY public.network (id, name, mtu) FROM '$$PATH$$/7459.dat';
+COPY public.vds_static (vds_id, vds_name, host_name) FROM '$$PATH$$/7461.dat';
+SELECT pg_catalog.setval('public.audit_log_seq', 1, true);
+"""
+
+# The tables of restore.sql the report reads: (<number of columns>, <rows as {column index: value}>), other values are generated
+bundle_tables = {
+    'public.vds_static': (8, [{1: "kvm" + str(idx), 3: "kvm" + str(idx) + ".example.com"} for idx in range(3)]),
+    'public.vds_dynamic': (3, [{}]),
+    'public.vm_dynamic': (60, [{1: str(idx % 2), 53: "vm" + str(idx)} for idx in range(4)]),
+    'public.network': (12, [{}, {}]),
+    'public.network_attachments': (11, [{}, {}]),
+    'public.network_cluster': (5, [{}]),
+    'public.network_filter': (3, [{2: "\\N"}]),
+    'public.gluster_volumes': (12, [{}]),
+    'public.storage_pool': (9, [{}]),
+    'public.base_disks': (12, [{4: "disk <a> & \"b\""}]),
+    'public.storage_domain_static': (6, [{}]),
+    'public.audit_log': (20, [{9: "2021-06-16 10:00:0" + str(idx), 13: message} for idx, message in
+                              enumerate(["VM vm0 failed to start", "Host kvm1 is up", "Error: disk\\nsecond line", "Exception in thread"])]),
+}
+
+# The engine configuration values the health check compares with the defaults
+bundle_engine_config = [("vdsTimeout","180"), ("vdsConnectionTimeout","30"), ("VdsRefreshRate","3"), ("TimeoutToResetVdsInSeconds","60"),
+                        ("StoragePoolRefreshTimeInSeconds","10"), ("SpmVCpuConsumption","1"), ("SpmCommandFailOverRetries","3"),
+                        ("SPMFailOverAttempts","3"), ("DelayResetForSpmInSeconds","20"), ("StorageDomainFailureTimeoutInMinutes","5"),
+                        ("MaxStorageVdsTimeoutCheckSec","30"), ("MaxStorageVdsDelayCheckSec","5"), ("ImageProxyAddress","engine.example.com:54323"),
+                        ("ImageTransferClientTicketValidityInSeconds","36000"), ("LogMaxNetworkUsedThresholdInPercentage","95"),
+                        ("MaxVdsMemOverCommit","200"), ("MaxVdsMemOverCommitForServers","150"), ("UserSessionTimeOutInterval","60")]
+
+# The host files the report reads
+bundle_host_files = {
+    os.path.join("sos_commands","virsh","virsh_-r_list_--all"): " Id Name State\n 1 vm1 running\n",
+    os.path.join("sos_commands","rpm","sh_-c_rpm_--nodigest_-qa_--qf_NAME_-_VERSION_-_RELEASE_._ARCH_INSTALLTIME_date_awk_-F_printf_-59s_s_n_1_2_sort_-V"):
+        "vdsm-4.40.1-1.el8.x86_64 Mon\nlibvirt-5.9.0-1.el8.x86_64 Mon\nqemu-system-x86-4.1-1 Mon\n",
+    os.path.join("sos_commands","networking","ip_-o_addr"): "1: lo inet 127.0.0.1/8\n",
+    os.path.join("etc","ovirt-hosted-engine","hosted-engine.conf"): "fqdn=engine\nsdUUID=123\nspUUID=456\nvmid=789\nconsole=vnc\n",
+}
+
+
+def write_file(path, text):
+    """Write a file, its directory is created if needed."""
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    output = open(path, 'w')
+    output.write(text)
+    output.close()
+
+
+def add_member(tar, name, text):
+    """Add a file with the given text to a tar archive."""
+    data = text.encode()
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_bundle(root, hosts=3):
+    """
+    Write a small LogCollector bundle with restore.sql and the .dat files in the pgdump tar of the database host,
+    an extracted engine sosreport and an extracted sosreport for every host.
+    """
+    log_collector_data = os.path.join(root, "log-collector-data")
+    pgdump = os.path.join(log_collector_data, "sosreport-dbhost-2021-06-16-abc", "sos_commands", "postgresql", "pgdump-scl-rh-postgresql10.tar")
+    os.makedirs(os.path.dirname(pgdump))
+    tar = tarfile.open(pgdump, 'w')
+    restore_sql = "--\n-- PostgreSQL database dump\n--\n"
+    for idx, name_table in enumerate(sorted(bundle_tables)):
+        col_num, rows = bundle_tables[name_table]
+        dat_name = str(3000 + idx) + ".dat"
+        restore_sql += "COPY " + name_table + " (" + ", ".join(["c" + str(col) for col in range(col_num)]) + ") FROM '$$PATH$$/" + dat_name + "';\n"
+        dat = ""
+        for row_num, row in enumerate(rows):
+            dat += "\t".join([row.get(col, "v" + str(col) + "_" + str(row_num)) for col in range(col_num)]) + "\n"
+        add_member(tar, dat_name, dat + "\\.\n\n")
+    add_member(tar, "restore.sql", restore_sql)
+    tar.close()
+    engine = os.path.join(root, "sosreport-engine-2021-06-16-xyz")
+    write_file(os.path.join(engine, "installed-rpms"), "ovirt-engine-4.4.1-1.el8.noarch Mon Jun 1\n")
+    write_file(os.path.join(engine, "sos_commands", "ovirt", "engine-config_--all"), "".join([name + ": " + value + " version: general\n" for name, value in bundle_engine_config]))
+    for idx in range(hosts):
+        host_dir = os.path.join(log_collector_data, "kvm" + str(idx) + ".example.com", "sosreport-kvm" + str(idx) + "-2021-06-16-abc")
+        for name in bundle_host_files:
+            write_file(os.path.join(host_dir, name), bundle_host_files[name])
+
+
+class bundle_paths(healthchecker.path_collection):
+    """The paths of a log collector bundle, the host sosreports are looked up in log_collector_data only."""
+
+    def __init__(self, log_collector_data):
+        self.log_collector_data = log_collector_data
+        self.host_sosreports = {}
+        self.host_lock = threading.Lock()
+        self.cache = healthchecker.result_cache(None)
+
+
+class bundle_session(object):
+    """A session of a log collector bundle that only has host sosreports."""
+
+    def __init__(self, log_collector_data):
+        self.path = bundle_paths(log_collector_data)
+
+
+class printed_text(object):
+    """Collects the printed text while it replaces sys.stdout."""
+
+    def __init__(self):
+        self.text = []
+
+    def write(self, text):
+        self.text.append(text)
+
+    def flush(self):
+        pass
+
+
+class tmp_dir_test(unittest.TestCase):
+    """A test with a temporary directory."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, text):
+        """Write a file in the temporary directory and return its path."""
+        path = os.path.join(self.tmp_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        output = open(path, 'w')
+        output.write(text)
+        output.close()
+        return path
+
+    def tar(self, name, files, links=None):
+        """Write a tar archive of the given file contents and symbolic links, compressed as the name ends."""
+        path = os.path.join(self.tmp_dir, name)
+        tar = tarfile.open(path, 'w:' + name.rpartition('.tar.')[2] if '.tar.' in name else 'w')
+        for member_name in sorted(files):
+            data = files[member_name].encode()
+            info = tarfile.TarInfo(member_name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for member_name in sorted(links or {}):
+            info = tarfile.TarInfo(member_name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = links[member_name]
+            tar.addfile(info)
+        tar.close()
+        return path
+
+
+class copy_catalog_test(tmp_dir_test):
+    """The table of contents of the COPY commands in restore.sql."""
+
+    def test_copy_catalog(self):
+        catalog, columns = healthchecker.copy_catalog(self.write("restore.sql", restore_sql))
+        self.assertEqual(catalog, {'public.network': ['7459.dat', ['id', 'name', 'mtu']],
+                                   'public.vds_static': ['7461.dat', ['vds_id', 'vds_name', 'host_name']]})
+        self.assertEqual(columns['name'], ['public.network'])
+        self.assertEqual(columns['host_name'], ['public.vds_static'])
+        self.assertFalse('setval' in columns)
+
+    def test_scan_modes(self):
+        sql_file = self.write("restore.sql", restore_sql)
+        self.assertEqual(healthchecker.copy_catalog(sql_file,'mmap'), healthchecker.copy_catalog(sql_file,'stream'))
+        self.assertEqual(healthchecker.copy_catalog(self.write("empty.sql", ""),'mmap'), ({}, {}))
+
+
+class dat_rows_test(tmp_dir_test):
+    """Reading .dat files with column projection and filtering."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.dat_file = self.write("1234.dat", "1\tkvm0\tVM is down with error\n"
+                                               "2\tkvm1\tHost moved to maintenance\n"
+                                               "3\ttoo few columns\n"
+                                               "4\tkvm2\tStorage domain error\n")
+
+    def test_projection(self):
+        no_filter = {'col_value':['filter_disable']}
+        self.assertEqual(list(healthchecker.dat_rows(self.dat_file,3,[0,1,2],no_filter)),
+                         [("1","kvm0","VM is down with error"),("2","kvm1","Host moved to maintenance"),("4","kvm2","Storage domain error")])
+        self.assertEqual(list(healthchecker.dat_rows(self.dat_file,3,[1],no_filter)), [("kvm0",),("kvm1",),("kvm2",)])
+        self.assertEqual(list(healthchecker.dat_rows(self.dat_file,3,[0,2],no_filter))[1], ("2","Host moved to maintenance"))
+
+    def test_filter(self):
+        # The filter column doesn't have to be kept
+        error_filter = {'col_value':['filter_in',2,['error']]}
+        self.assertEqual(list(healthchecker.dat_rows(self.dat_file,3,[0],error_filter)), [("1",),("4",)])
+        error_filter = {'col_value':['filter_out',2,['error']]}
+        self.assertEqual(list(healthchecker.dat_rows(self.dat_file,3,[1],error_filter)), [("kvm1",)])
+
+    def test_value_matcher(self):
+        self.assertTrue(healthchecker.value_matcher(['error'])("an error"))
+        self.assertFalse(healthchecker.value_matcher(['error'])("an Error"))
+        self.assertTrue(healthchecker.value_matcher(['error'],ignore_case=True)("an Error"))
+        # Several values are matched literally in one regular expression
+        self.assertTrue(healthchecker.value_matcher(['a.b','zz'])("a.b"))
+        self.assertFalse(healthchecker.value_matcher(['a.b','zz'])("axb"))
+        self.assertTrue(healthchecker.value_matcher(['Error','failed'],ignore_case=True)("ERROR"))
+        self.assertTrue(healthchecker.value_matcher(['error','failed'],'filter_out')("ok"))
+        self.assertFalse(healthchecker.value_matcher(['error','failed'],'filter_out')("failed"))
+        self.assertFalse(healthchecker.value_matcher([])("anything"))
+        self.assertTrue(healthchecker.value_matcher([],'filter_out')("anything"))
+
+
+class copy_decoding_test(tmp_dir_test):
+    """Decoding of the PostgreSQL COPY text format."""
+
+    def test_copy_field(self):
+        self.assertEqual(healthchecker.copy_field("plain value"), "plain value")
+        self.assertEqual(healthchecker.copy_field("\\N"), None)
+        self.assertEqual(healthchecker.copy_field("\\N", ""), "")
+        self.assertEqual(healthchecker.copy_field("a\\tb\\rc\\nd"), "a\tb\rc\nd")
+        self.assertEqual(healthchecker.copy_field("back\\\\slash"), "back\\slash")
+        self.assertEqual(healthchecker.copy_field("\\101\\x42\\7"), "AB\x07")
+        self.assertEqual(healthchecker.copy_field("\\q"), "q")
+
+    def test_copy_lines(self):
+        dat = open(self.write("1234.dat", "first\nsecond line\nlast"))
+        try:
+            lines = list(healthchecker.copy_lines(dat,chunk_size=4))
+        finally:
+            dat.close()
+        self.assertEqual(sum(lines, []), ["first","second line","last"])
+
+    def test_dat_rows(self):
+        dat_file = self.write("1234.dat", "1\tkvm0\tDisk failed\\ttab\n"
+                                          "2\t\\N\tline 1\\nline 2\n"
+                                          "3\tkvm\\\\2\tERROR \\101\\x42\n"
+                                          "\\.\n"
+                                          "4\tafter\tthe end\n")
+        rows = list(healthchecker.dat_rows(dat_file,3,[0,1,2],{'col_value':['filter_disable']}))
+        self.assertEqual(rows, [("1","kvm0","Disk failed\ttab"),
+                                ("2","","line 1\nline 2"),
+                                ("3","kvm\\2","ERROR AB")])
+        self.assertEqual(list(healthchecker.dat_rows(dat_file,3,[1],{'col_value':['filter_disable']})), [("kvm0",),("",),("kvm\\2",)])
+        # The filter is applied to the decoded value
+        line_filter = {'col_value':['filter_in',2,['line 1\nline']]}
+        self.assertEqual(list(healthchecker.dat_rows(dat_file,3,[0],line_filter)), [("2",)])
+
+
+class value_filter_test(tmp_dir_test):
+    """The per-row predicates of the col_value filters."""
+
+    def test_value_matcher(self):
+        self.assertTrue(healthchecker.value_matcher(['error'])("an error"))
+        self.assertFalse(healthchecker.value_matcher(['error'])("an Error"))
+        self.assertTrue(healthchecker.value_matcher(['error'],ignore_case=True)("an Error"))
+        self.assertTrue(healthchecker.value_matcher(['a.b','zz'])("a.b"))
+        self.assertFalse(healthchecker.value_matcher(['a.b','zz'])("axb"))
+        self.assertTrue(healthchecker.value_matcher(["it's", 'a"b'])("it's"))
+        # filter_out keeps the values that contain none of the filter values
+        self.assertTrue(healthchecker.value_matcher(['error','failed'],'filter_out')("ok"))
+        self.assertFalse(healthchecker.value_matcher(['error','failed'],'filter_out')("failed"))
+        self.assertFalse(healthchecker.value_matcher([])("anything"))
+        self.assertTrue(healthchecker.value_matcher([],'filter_out')("anything"))
+
+    def test_value_filter(self):
+        self.assertEqual(healthchecker.value_filter({'col_value':['filter_disable']}), (0, None))
+        filter_col, match = healthchecker.value_filter({'col_value':['filter_in',2,['error'],'ignore_case']})
+        self.assertEqual(filter_col, 2)
+        self.assertTrue(match("ERROR"))
+
+    def test_dat_rows_ignore_case(self):
+        dat_file = self.write("1234.dat", "1\tkvm0\tDisk failed\\ttab\n"
+                                          "2\tkvm1\tok\n"
+                                          "3\tkvm2\tERROR\n")
+        error_filter = {'col_value':['filter_in',2,['error','failed\tt'],'ignore_case']}
+        self.assertEqual(list(healthchecker.dat_rows(dat_file,3,[0],error_filter)), [("1",),("3",)])
+
+
+class extract_archive_test(tmp_dir_test):
+    """Selective extraction of the sosreport archives."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.archive = self.tar("sosreport-kvm1-2021-06-16-abc.tar.gz", {
+            "sosreport-kvm1-2021-06-16-abc/sos_commands/rpm/package-data": "vdsm-4.40\n",
+            "sosreport-kvm1-2021-06-16-abc/sos_commands/postgresql/du": "1024\tpgdata\n",
+            "sosreport-kvm1-2021-06-16-abc/var/log/messages": "x" * 4096})
+        self.dest = os.path.join(self.tmp_dir, "dest")
+        os.mkdir(self.dest)
+
+    def test_member_wanted(self):
+        self.assertTrue(healthchecker.member_wanted("sosreport-kvm1/sos_commands/rpm/package-data",['sos_commands/rpm/*']))
+        self.assertTrue(healthchecker.member_wanted("sosreport-kvm1/sos_commands/rpm/package-data",['*/package-data']))
+        self.assertFalse(healthchecker.member_wanted("sosreport-kvm1/var/log/messages",['sos_commands/*']))
+
+    def test_extract_members(self):
+        stats = healthchecker.extract_archive(self.archive,self.dest,['sos_commands/*'])
+        top = os.path.join(self.dest, "sosreport-kvm1-2021-06-16-abc")
+        self.assertTrue(os.path.isfile(os.path.join(top, "sos_commands", "postgresql", "du")))
+        self.assertFalse(os.path.exists(os.path.join(top, "var")))
+        self.assertEqual((stats['extracted_files'], stats['skipped_files'], stats['skipped_bytes']), (2, 1, 4096))
+        # A second run keeps the files that are already extracted
+        stats = healthchecker.extract_archive(self.archive,self.dest,['sos_commands/*'])
+        self.assertEqual(stats['extracted_files'], 0)
+        self.assertEqual(healthchecker.extract_archive(self.archive,self.dest)['extracted_files'], 1)
+
+    def test_partial_files(self):
+        # A file cut short by an interrupted run is extracted again and no temporary file is left
+        top = os.path.join(self.dest, "sosreport-kvm1-2021-06-16-abc")
+        os.makedirs(os.path.join(top, "var", "log"))
+        for name in ["messages", "messages.part"]:
+            partial_file = open(os.path.join(top, "var", "log", name), 'w')
+            partial_file.write("x" * 10)
+            partial_file.close()
+        self.assertEqual(healthchecker.extract_archive(self.archive,self.dest)['extracted_files'], 3)
+        self.assertEqual(os.path.getsize(os.path.join(top, "var", "log", "messages")), 4096)
+        self.assertEqual(sorted(os.listdir(os.path.join(top, "var", "log"))), ["messages"])
+        self.assertEqual(sorted(os.listdir(os.path.join(top, "sos_commands", "rpm"))), ["package-data"])
+
+    def test_untar(self):
+        stats = healthchecker.untar(self.tmp_dir,"sosreport",".tar.gz",['sos_commands/rpm/*'])
+        self.assertEqual(stats['extracted_files'], 1)
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp_dir, "sosreport-kvm1-2021-06-16-abc")))
+        # The archive is not extracted again once its directory exists
+        self.assertEqual(healthchecker.untar(self.tmp_dir,"sosreport",".tar.gz",['sos_commands/rpm/*']), None)
+
+    def test_extract_report(self):
+        self.assertEqual(healthchecker.format_size(512), "512 B")
+        self.assertEqual(healthchecker.format_size(1536), "1.5 KB")
+        self.assertEqual(healthchecker.format_size(3 * 1024 ** 4), "3072.0 GB")
+        stats = {'archive':'a.tar.gz', 'extracted_files':2, 'extracted_bytes':1024, 'skipped_files':1, 'skipped_bytes':4096, 'seconds':0.5, 'write_seconds':0.25}
+        self.assertEqual(healthchecker.extract_report(stats), "a.tar.gz: extracted 2 of 3 files (1.0 KB) in 0.5s, skipped 4.0 KB, about 0.1s of writing saved.")
+
+    def test_extract_with_tar(self):
+        self.assertTrue(healthchecker.tar_readable(self.archive))
+        self.assertEqual(healthchecker.extract_with_tar(self.archive,self.dest), 0)
+        self.assertTrue(os.path.isfile(os.path.join(self.dest, "sosreport-kvm1-2021-06-16-abc", "var", "log", "messages")))
+        self.assertNotEqual(healthchecker.extract_with_tar(os.path.join(self.tmp_dir, "missing.tar.xz"),self.dest), 0)
+
+    def test_extract_with_tar_quoting(self):
+        # Shell syntax in the paths is not run
+        dest = os.path.join(self.tmp_dir, "dest\"; touch injected; \"$(touch injected)")
+        archive = os.path.join(self.tmp_dir, "a'$(touch injected)'.tar.gz")
+        os.mkdir(dest)
+        shutil.copy(self.archive, archive)
+        self.assertEqual(healthchecker.extract_with_tar(archive,dest), 0)
+        self.assertTrue(os.path.isfile(os.path.join(dest, "sosreport-kvm1-2021-06-16-abc", "var", "log", "messages")))
+        self.assertFalse(os.path.exists("injected"))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "injected")))
+
+
+class sosreport_files_test(tmp_dir_test):
+    """Reading sosreport files from the extracted directory and straight from the archive."""
+
+    files = {"sosreport-kvm1-abc/installed-rpms": "vdsm-4.40\nqemu-kvm-6.0\n",
+             "sosreport-kvm1-abc/sos_commands/rpm/package-data": "vdsm\n",
+             "sosreport-kvm1-abc/var/log/messages": "not loaded while indexing\n"}
+    links = {"sosreport-kvm1-abc/sos_commands/ovirt/rpms": "../../installed-rpms"}
+
+    def test_sosreport_dir(self):
+        for name in self.files:
+            self.write(name, self.files[name])
+        sosreport = healthchecker.sosreport_dir(os.path.join(self.tmp_dir, "sosreport-kvm1-abc"))
+        self.assertTrue(sosreport.isfile("installed-rpms"))
+        self.assertFalse(sosreport.isfile("missing"))
+        self.assertEqual(sosreport.readlines("installed-rpms"), ["vdsm-4.40\n","qemu-kvm-6.0\n"])
+
+    def test_sosreport_archive(self):
+        archive = self.tar("sosreport-kvm1-abc.tar.gz", self.files, self.links)
+        sosreport = healthchecker.sosreport_archive(archive, ['sos_commands/*'])
+        self.assertTrue(sosreport.isfile("installed-rpms"))
+        self.assertFalse(sosreport.isfile("missing"))
+        # The link target is loaded in the indexing pass because the link is wanted
+        self.assertEqual(sosreport.readlines(os.path.join("sos_commands","ovirt","rpms")), ["vdsm-4.40\n","qemu-kvm-6.0\n"])
+        self.assertEqual(sorted(sosreport.contents), ["installed-rpms", os.path.join("sos_commands","rpm","package-data")])
+        self.assertEqual(sosreport.read(os.path.join("var","log","messages")), "not loaded while indexing\n")
+        self.assert_missing(sosreport, "missing")
+        self.assert_missing(sosreport, os.path.join("sos_commands","rpm"))
+
+    def assert_missing(self, sosreport, name):
+        """Check that reading a file that is not in the sosreport fails like reading a missing file."""
+        try:
+            sosreport.read(name)
+        except IOError as error:
+            self.assertEqual(error.errno, errno.ENOENT)
+        else:
+            self.fail(name + " was read")
+
+    def test_sosreport_xz(self):
+        # Written with the tar command so Pythons without xz support in tarfile read it through the fallback
+        for name in self.files:
+            self.write(name, self.files[name])
+        os.makedirs(os.path.join(self.tmp_dir, "sosreport-kvm1-abc", "sos_commands", "ovirt"))
+        os.symlink(self.links["sosreport-kvm1-abc/sos_commands/ovirt/rpms"], os.path.join(self.tmp_dir, "sosreport-kvm1-abc", "sos_commands", "ovirt", "rpms"))
+        archive = os.path.join(self.tmp_dir, "sosreport-kvm1-abc.tar.xz")
+        self.assertEqual(subprocess.call(["tar", "-cJf", archive, "-C", self.tmp_dir, "sosreport-kvm1-abc"]), 0)
+        shutil.rmtree(os.path.join(self.tmp_dir, "sosreport-kvm1-abc"))
+        sosreport = healthchecker.sosreport_archive(archive, ['sos_commands/*'])
+        self.assertTrue(sosreport.isfile("installed-rpms"))
+        self.assertFalse(sosreport.isfile("missing"))
+        self.assertEqual(sosreport.read(os.path.join("sos_commands","ovirt","rpms")), "vdsm-4.40\nqemu-kvm-6.0\n")
+        self.assertEqual(sosreport.read(os.path.join("var","log","messages")), "not loaded while indexing\n")
+        self.assert_missing(sosreport, "missing")
+        self.assertEqual(sosreport.extracted is not None, not healthchecker.tar_readable(archive))
+
+
+@unittest.skipIf(lzma is None, "no xz support in tarfile")
+class untar_hosts_test(tmp_dir_test):
+    """Concurrent extraction of the host sosreports."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        for host in ["kvm1.example.com", "kvm2.example.com"]:
+            os.mkdir(os.path.join(self.tmp_dir, host))
+            name = "sosreport-" + host.split(".")[0] + "-2021-06-16-abc"
+            self.tar(os.path.join(host, name + ".tar.xz"), {name + "/installed-rpms": "vdsm-4.40\n",
+                                                          name + "/var/log/messages": "x" * 1000})
+
+    def test_untar_hosts(self):
+        results = healthchecker.untar_hosts(self.tmp_dir,["kvm1.example.com", "kvm2.example.com", "missing"],['installed-rpms'],processes=2)
+        self.assertEqual([(host, stats['extracted_files'], error) for host, stats, error in results[:2]],
+                         [("kvm1.example.com", 1, None), ("kvm2.example.com", 1, None)])
+        self.assertEqual(results[2][:2], ("missing", None))
+        self.assertTrue(results[2][2])
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, "kvm2.example.com", "sosreport-kvm2-2021-06-16-abc", "installed-rpms")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "kvm2.example.com", "sosreport-kvm2-2021-06-16-abc", "var")))
+        self.assertEqual(healthchecker.untar_hosts(self.tmp_dir,[]), [])
+
+    def test_untar_hosts_from_thread(self):
+        # The host list is a task of report_sections, so the pool is started while other threads run
+        results = []
+        thread = threading.Thread(target=lambda: results.extend(healthchecker.untar_hosts(self.tmp_dir,["kvm1.example.com", "kvm2.example.com"],['installed-rpms'],processes=2)))
+        thread.start()
+        thread.join(60)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([(host, error) for host, stats, error in results], [("kvm1.example.com", None), ("kvm2.example.com", None)])
+        context = healthchecker.process_context()
+        if context is not None:
+            self.assertTrue(context.get_start_method() in ['forkserver', 'spawn'])
+
+
+class info_from_hosts_test(tmp_dir_test):
+    """Fetching the host information concurrently."""
+
+    info_files = {"vdsm": [os.path.join("sos_commands","rpm","package-data"),['line',['vdsm-4'],' ']]}
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.hosts = ["kvm" + str(idx) + ".example.com" for idx in range(5)]
+        for idx, host in enumerate(self.hosts):
+            self.write(os.path.join(host, "sosreport-kvm" + str(idx) + "-abc", "sos_commands", "rpm", "package-data"),
+                       "qemu-kvm-6.0 x\nvdsm-4.40." + str(idx) + " x\n")
+        self.session = bundle_session(self.tmp_dir)
+        self.saved_paths = healthchecker.host_info_paths
+        healthchecker.host_info_paths = [self.info_files["vdsm"][0]]
+
+    def tearDown(self):
+        healthchecker.host_info_paths = self.saved_paths
+        tmp_dir_test.tearDown(self)
+
+    def test_order(self):
+        info = healthchecker.info_from_hosts(self.session,self.hosts,self.info_files,threads=3)
+        self.assertEqual(info, healthchecker.info_from_hosts(self.session,self.hosts,self.info_files,threads=1))
+        self.assertEqual(info.count("vdsm:"), 5)
+        self.assertTrue(info.index("vdsm-4.40.0\n") < info.index("vdsm-4.40.1\n") < info.index("vdsm-4.40.4\n"))
+        self.assertTrue(info.startswith("\n================================Host: kvm0.example.com================================\n\nvdsm:\nvdsm-4.40.0\n"))
+
+    def test_fold(self):
+        self.write(os.path.join(self.hosts[2], "sosreport-kvm2-abc", "sos_commands", "rpm", "package-data"), "vdsm-4.40.0 x\n")
+        info = healthchecker.info_from_hosts(self.session,self.hosts[:3],self.info_files,threads=2)
+        self.assertEqual(info, "\n================================Host: kvm0.example.com================================\n\nvdsm:\nvdsm-4.40.0\n"
+                               "\n================================Host: kvm1.example.com================================\n\nvdsm:\nvdsm-4.40.1\n"
+                               "\n================================Host: kvm2.example.com================================\n\nSame as host kvm0.example.com\n")
+        # The HTML gets the same folded text
+        html_builder = healthchecker.Html_builder(["Virtual Machines"])
+        html_builder.add_div('VirtualMachines_Hosts', info)
+        self.assertEqual(html_builder.element_html, ["<div class=\"tabcontent VirtualMachines_Hosts\" style=\"white-space: pre-wrap;\">" + info + "</div>"])
+
+
+class info_read_test(unittest.TestCase):
+    """Reading every host file once for all the information fetched from it."""
+
+    def test_info_group(self):
+        info_files = {"vdsm": ["installed-rpms",['line',['vdsm-4']]],
+                      "qemu": ["installed-rpms",['line',['qemu-kvm']]],
+                      "IP": ["ip_-o_addr",['filter_disable']]}
+        info_by_file = healthchecker.info_group(info_files)
+        self.assertEqual(sorted(info_by_file), ["installed-rpms","ip_-o_addr"])
+        self.assertEqual(sorted(info_by_file["installed-rpms"]), ["qemu","vdsm"])
+
+    def test_info_read(self):
+        all_lines, vdsm, versions = [], [], []
+        healthchecker.info_read(["vdsm-4.40 x\n","qemu-kvm-6.0 y\n","other\n"],
+                                [(['filter_disable'],all_lines),(['line',['vdsm-4']],vdsm),(['line',['vdsm-4','qemu'],' '],versions)])
+        self.assertEqual(all_lines, ["vdsm-4.40 x\n","qemu-kvm-6.0 y\n","other\n"])
+        self.assertEqual(vdsm, ["vdsm-4.40 x\n\n"])
+        self.assertEqual(versions, ["vdsm-4.40\n","qemu-kvm-6.0\n"])
+
+
+class result_cache_test(tmp_dir_test):
+    """The persistent cache of parsed tables and host information."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.cache = healthchecker.result_cache(os.path.join(self.tmp_dir, "cache"))
+        self.dat_file = self.write("1234.dat", "1\tkvm0\n2\tkvm1\n\\.\n")
+
+    def test_round_trip(self):
+        key = self.cache.key([self.dat_file],'dat_info',2,[0,1],None)
+        self.assertEqual(self.cache.get(key), None)
+        self.cache.put(key, ([("1","kvm0"),("2","kvm1")], [1,4]))
+        self.assertEqual(self.cache.get(key), ([("1","kvm0"),("2","kvm1")], [1,4]))
+
+    def test_key(self):
+        key = self.cache.key([self.dat_file],'dat_info',[0])
+        self.assertEqual(key, self.cache.key([self.dat_file],'dat_info',[0]))
+        self.assertNotEqual(key, self.cache.key([self.dat_file],'dat_info',[1]))
+        self.assertEqual(self.cache.key([os.path.join(self.tmp_dir, "missing.dat")],'dat_info'), None)
+        self.assertEqual(healthchecker.result_cache(None).key([self.dat_file],'dat_info'), None)
+        # A changed source file gives another key
+        self.write("1234.dat", "1\tkvm0\n2\tkvm2\n\\.\n")
+        os.utime(self.dat_file, (0, 0))
+        self.assertNotEqual(key, self.cache.key([self.dat_file],'dat_info',[0]))
+
+    def test_unreadable_entry(self):
+        key = self.cache.key([self.dat_file],'dat_info')
+        entry_file = open(os.path.join(self.cache.cache_dir, key), 'wb')
+        entry_file.write(b"not a cache entry")
+        entry_file.close()
+        self.assertEqual(self.cache.get(key), None)
+        # The entry is dropped
+        self.assertFalse(os.path.exists(os.path.join(self.cache.cache_dir, key)))
+
+    def test_eviction(self):
+        self.cache.max_size = 1
+        self.cache.put(self.cache.key([self.dat_file],'first'), "x" * 100)
+        self.cache.put(self.cache.key([self.dat_file],'second'), "y" * 100)
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_table_round_trip(self):
+        # A dictionary encoded column with 'B' codes, a plain column and a column with a single value
+        rows = [(str(idx), "host" + str(idx % 3), "x") for idx in range(1000)]
+        table = healthchecker.dat_table("public.vds_static","1234.dat",["id","name","other"],[0,3,5],rows)
+        key = self.cache.key([self.dat_file],'dat_table',6,[0,3,5],None)
+        self.cache.put(key, table.to_data())
+        cached = healthchecker.dat_table.from_data(self.cache.get(key))
+        self.assertEqual((cached.name_table, cached.dat_name, cached.col_names, cached.col_index), ("public.vds_static","1234.dat",["id","name","other"],[0,3,5]))
+        self.assertEqual(len(cached), 1000)
+        self.assertEqual(list(cached.rows()), rows)
+        self.assertEqual([cached.width(pos) for pos in range(3)], [3,5,1])
+
+
+class dat_table_test(unittest.TestCase):
+    """The column store of the tables fetched from the .dat files."""
+
+    def setUp(self):
+        # A dictionary encoded column with 'B' codes, a plain column and a column with a single value
+        rows = [("host" + str(idx % 3), str(idx), "x") for idx in range(1000)]
+        self.table = healthchecker.dat_table("public.vds_static","1234.dat",["name","id","other"],[3,0,5],rows)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 1000)
+        self.assertEqual([dictionary is None for dictionary in self.table.dictionaries], [False,True,False])
+        self.assertEqual(self.table.columns[0].typecode, 'B')
+        self.assertEqual(self.table.column(3)[:4], ["host0","host1","host2","host0"])
+        self.assertEqual(self.table.column(0)[999], "999")
+        self.assertEqual(list(self.table.rows())[4], ("host1","4","x"))
+        self.assertEqual([self.table.width(pos) for pos in range(3)], [5,3,1])
+
+    def test_sort(self):
+        self.table.sort(0)
+        self.assertEqual(self.table.values(0)[333:335], ["host0","host1"])
+        # The sort is stable
+        self.assertEqual(self.table.values(1)[:3], ["0","3","6"])
+
+    def test_merge(self):
+        hidden = healthchecker.dat_table("public.vds_static","1234.dat",["port"],[1],[(str(54321 + idx),) for idx in range(1000)])
+        # The hidden column is put in the order the sort gave the kept columns
+        hidden.reorder(self.table.sort(0))
+        table = self.table.merge(hidden)
+        self.assertEqual(table.col_index, [0,1,3,5])
+        self.assertEqual(table.col_names, ["id","port","name","other"])
+        self.assertEqual(list(table.rows())[:2], [("0","54321","host0","x"),("3","54324","host0","x")])
+        self.assertTrue(table.columns[2] is self.table.columns[0])
+
+    def test_format_table(self):
+        table = healthchecker.dat_table("public.network","7459.dat",["id","name","mtu"],None,
+                                        [("0","Storage","9000"),("1","ovirtmgmt","1500")])
+        self.assertEqual(healthchecker.format_table(table,[1,2]),
+                         "+---------+----+\n"
+                         "|name     |mtu |\n"
+                         "+=========+====+\n"
+                         "|Storage  |9000|\n"
+                         "+---------+----+\n"
+                         "|ovirtmgmt|1500|\n"
+                         "+---------+----+\n")
+
+
+class write_table_test(unittest.TestCase):
+    """Writing the text tables row by row."""
+
+    def test_cell_lines(self):
+        self.assertEqual(healthchecker.cell_lines("short",10), ["short"])
+        self.assertEqual(healthchecker.cell_lines("",10), [""])
+        self.assertEqual(healthchecker.cell_lines("abcdefghij",4), ["abcd","efgh","ij"])
+        self.assertEqual(healthchecker.cell_lines("ab\ncdefgh\n",4), ["ab","cdef","gh"])
+
+    def test_write_table(self):
+        table = healthchecker.dat_table("public.audit_log","1234.dat",["id","message"],None,
+                                        [("1","Failed to sync\nsee vdsm.log"),("2","0123456789abc"),("3","ok")])
+        output = []
+        healthchecker.write_table(table,[0,1],output.append,max_width=10,batch_size=1)
+        self.assertEqual("".join(output),
+                         "+--+----------+\n"
+                         "|id|message   |\n"
+                         "+==+==========+\n"
+                         "|1 |Failed to |\n"
+                         "|  |sync      |\n"
+                         "|  |see vdsm.l|\n"
+                         "|  |og        |\n"
+                         "+--+----------+\n"
+                         "|2 |0123456789|\n"
+                         "|  |abc       |\n"
+                         "+--+----------+\n"
+                         "|3 |ok        |\n"
+                         "+--+----------+\n")
+        # The header and every row are written as soon as they are formatted
+        self.assertEqual(len(output), 5)
+        self.assertEqual(healthchecker.format_table(table,[0]), "+--+\n|id|\n+==+\n|1 |\n+--+\n|2 |\n+--+\n|3 |\n+--+\n")
+
+    def test_visible_text(self):
+        self.assertEqual(healthchecker.visible_text("plain"), "plain")
+        self.assertEqual(healthchecker.visible_text("a\tb\rc\x07\nd"), "a\\tb\\rc\\x07\nd")
+        table = healthchecker.dat_table("public.audit_log","1234.dat",["id","message"],None,[("1","Disk\tfailed"),("2","ok")])
+        self.assertTrue(table.has_control(1))
+        self.assertFalse(table.has_control(0))
+        self.assertEqual(table.width(1), 12)
+        self.assertEqual(healthchecker.format_table(table,[1]),
+                         "+------------+\n"
+                         "|message     |\n"
+                         "+============+\n"
+                         "|Disk\\tfailed|\n"
+                         "+------------+\n"
+                         "|ok          |\n"
+                         "+------------+\n")
+
+
+class write_group_test(unittest.TestCase):
+    """The group formatting, pinned to the output of the recursive implementation it replaced."""
+
+    divider = "-" * 40
+
+    def setUp(self):
+        rows = [("dc1","cl1","kvm1","up"),("dc1","cl1","kvm0","down"),("dc1","cl2","kvm2","up"),("dc2","cl3","kvm3","up")]
+        self.table = healthchecker.dat_table("public.vds","1234.dat",["datacenter","cluster","host","status"],None,rows)
+
+    def lines(self, *lines):
+        """Join the expected lines, 'divider' lines are indented entry dividers."""
+        return "".join([line.replace("divider", self.divider) + "\n" for line in lines])
+
+    def test_one_level(self):
+        self.assertEqual(healthchecker.format_group(self.table,[0],[2,3]),
+                         self.lines("datacenter: dc1",
+                                    "    divider",
+                                    "    host: kvm1",
+                                    "    status: up",
+                                    "    divider",
+                                    "    host: kvm0",
+                                    "    status: down",
+                                    "    divider",
+                                    "    host: kvm2",
+                                    "    status: up",
+                                    "    divider",
+                                    "datacenter: dc2",
+                                    "    divider",
+                                    "    host: kvm3",
+                                    "    status: up",
+                                    "    divider"))
+
+    def test_two_levels(self):
+        # The hierarchy columns are not repeated in the entries even if they are shown
+        self.assertEqual(healthchecker.format_group(self.table,[0,1],[0,1,2,3]),
+                         self.lines("datacenter: dc1",
+                                    "    cluster: cl1",
+                                    "        divider",
+                                    "        host: kvm1",
+                                    "        status: up",
+                                    "        divider",
+                                    "        host: kvm0",
+                                    "        status: down",
+                                    "        divider",
+                                    "    cluster: cl2",
+                                    "        divider",
+                                    "        host: kvm2",
+                                    "        status: up",
+                                    "        divider",
+                                    "datacenter: dc2",
+                                    "    cluster: cl3",
+                                    "        divider",
+                                    "        host: kvm3",
+                                    "        status: up",
+                                    "        divider"))
+
+    def test_three_levels(self):
+        # Only the hierarchy names that have rows below them are printed
+        self.assertEqual(healthchecker.format_group(self.table,[0,1,2],[3]),
+                         self.lines("datacenter: dc1",
+                                    "    cluster: cl1",
+                                    "        host: kvm0",
+                                    "            divider",
+                                    "            status: down",
+                                    "            divider",
+                                    "        host: kvm1",
+                                    "            divider",
+                                    "            status: up",
+                                    "            divider",
+                                    "    cluster: cl2",
+                                    "        host: kvm2",
+                                    "            divider",
+                                    "            status: up",
+                                    "            divider",
+                                    "datacenter: dc2",
+                                    "    cluster: cl3",
+                                    "        host: kvm3",
+                                    "            divider",
+                                    "            status: up",
+                                    "            divider"))
+
+    def test_newline_values(self):
+        # A value with a newline is printed whole
+        table = healthchecker.dat_table("public.audit_log","1234.dat",["datacenter","message"],None,[("dc1","line 1\nline 2")])
+        self.assertEqual(healthchecker.format_group(table,[0],[1]),
+                         self.lines("datacenter: dc1", "    divider", "    message: line 1", "line 2", "    divider"))
+
+    def test_batches(self):
+        output = []
+        healthchecker.write_group(self.table,[0],[2,3],output.append,batch_size=2)
+        self.assertEqual(len(output), 3)
+        self.assertEqual("".join(output), healthchecker.format_group(self.table,[0],[2,3]))
+
+
+class html_builder_test(tmp_dir_test):
+    """Streaming the HTML elements to the file as they are added."""
+
+    def build(self, html_builder):
+        table = healthchecker.dat_table("public.vdc_options","1234.dat",["option_name","option_value","match"],None,
+                                        [("MaxVmsInPool","<1000>","Match"),("SSLEnabled","false","Not a match")])
+        html_builder.batch_size = 2
+        html_builder.add_table("HealthCheck","Health Check",table,[0,2])
+        html_builder.add_div("Other","free text")
+
+    def test_stream(self):
+        html_file = os.path.join(self.tmp_dir, "report.html")
+        streamed = healthchecker.Html_builder(["Health Check","Other"],html_file)
+        self.build(streamed)
+        self.assertEqual(streamed.element_html, [])
+        streamed.generate_file("06162021-123456")
+        kept = healthchecker.Html_builder(["Health Check","Other"])
+        self.build(kept)
+        html = open(html_file).read()
+        self.assertTrue(html.startswith('<html><head>'))
+        self.assertTrue(html.endswith("".join(kept.element_html) + '</body></html>'))
+        self.assertTrue("<tr><td>MaxVmsInPool</td><td style=\"display: none;\">&lt;1000&gt;</td><td style=\"color: Green;\">Match</td></tr>" in html)
+        self.assertTrue("<td style=\"display: none;\">false</td><td style=\"color: Red;\">Not a match</td>" in html)
+
+    def test_parts(self):
+        html_file = os.path.join(self.tmp_dir, "report.html")
+        streamed = healthchecker.Html_builder(["Health Check","Other"],html_file)
+        first = streamed.part("Health Check")
+        second = streamed.part("Other")
+        # The second part is built first but the parts are added in the order of the tabs
+        second.add_div("Other","second part")
+        first.add_div("HealthCheck","first part")
+        self.assertEqual(first.element_html, [])
+        streamed.add_part(first)
+        streamed.add_part(second)
+        self.assertEqual(first.html, None)
+        streamed.generate_file("06162021-123456")
+        kept = healthchecker.Html_builder(["Health Check","Other"])
+        for name, tab, text in [("Health Check","HealthCheck","first part"), ("Other","Other","second part")]:
+            part = kept.part(name)
+            part.add_div(tab,text)
+            kept.add_part(part)
+        self.assertTrue(open(html_file).read().endswith("".join(kept.element_html) + '</body></html>'))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["report.html"])
+
+
+class write_rows_test(unittest.TestCase):
+    """Rendering the HTML rows from the columns."""
+
+    def test_html_escape(self):
+        self.assertEqual(healthchecker.html_escape("plain"), "plain")
+        self.assertEqual(healthchecker.html_escape("<a href=\"x\">it's & more</a>"),
+                         "&lt;a href=&quot;x&quot;&gt;it&#x27;s &amp; more&lt;/a&gt;")
+        self.assertEqual(healthchecker.escape_column([]), [])
+        self.assertEqual(healthchecker.escape_column(["a<b", "", "c&d"]), ["a&lt;b", "", "c&amp;d"])
+        # A NUL decoded from the COPY escape \000 is not taken for a separator
+        self.assertEqual(healthchecker.escape_column(["a\x00<b", "", "c&d"]), ["a\x00&lt;b", "", "c&amp;d"])
+        self.assertEqual(healthchecker.escape_column([healthchecker.copy_field("x\\000y")]), ["x\x00y"])
+
+    def test_write_rows(self):
+        # A dictionary encoded column, a plain column, and a plain column with Match values
+        rows = [("up", "<vm" + str(idx) + ">", "Match" if idx % 2 else "v" + str(idx)) for idx in range(6)]
+        table = healthchecker.dat_table("public.vm_dynamic","1234.dat",["status","name","match"],None,rows)
+        self.assertEqual([dictionary is None for dictionary in table.dictionaries], [False,True,True])
+        html_builder = healthchecker.Html_builder(["Virtual Machines"])
+        html_builder.batch_size = 4
+        output = []
+        html_builder.write_rows(table,[1,2],output.append)
+        self.assertEqual(len(output), 2)
+        expected = ""
+        for status, name, match in rows:
+            expected += ("<tr><td style=\"display: none;\">" + status + "</td><td>" + name.replace("<", "&lt;").replace(">", "&gt;") + "</td>"
+                         + ("<td style=\"color: Green;\">" if match == "Match" else "<td>") + match + "</td></tr>")
+        self.assertEqual("".join(output), expected)
+
+
+class write_json_test(unittest.TestCase):
+    """The JSON table data of the virtual scrolling tables."""
+
+    def test_write_json(self):
+        rows = [("up" if idx % 3 else "down", "vm" + str(idx), "</script>" if idx == 4 else "") for idx in range(7)]
+        table = healthchecker.dat_table("public.vm_dynamic","1234.dat",["status","name","note"],None,rows)
+        html_builder = healthchecker.Html_builder(["Virtual Machines"],table_mode='json')
+        html_builder.batch_size = 3
+        output = []
+        html_builder.write_json(table,[1],"table_id_0",output.append)
+        html = "".join(output)
+        self.assertTrue(html.startswith("<style id=\"table_id_0_style\">#table_id_0 .c0 {display: none;}#table_id_0 .c2 {display: none;}</style>"))
+        self.assertTrue("data-hidden=\"[0,2]\"" in html)
+        data = html[html.index("_data\">") + len("_data\">"):html.rindex("</script>")]
+        self.assertFalse("</" in data)
+        data = json.loads(data)
+        self.assertEqual(data['rows'], 7)
+        columns = []
+        for dictionary, column in zip(data['dictionaries'], data['columns']):
+            columns.append([dictionary[code] for code in column] if dictionary is not None else column)
+        self.assertEqual(list(zip(*columns)), rows)
+
+
+class html_pages_test(tmp_dir_test):
+    """Moving the tables and divs larger than the size budget to page files."""
+
+    def test_pages(self):
+        html_file = os.path.join(self.tmp_dir, "report.html")
+        html_builder = healthchecker.Html_builder(["Error Events","Other"],html_file,page_size=500)
+        html_builder.batch_size = 4
+        rows = [(str(idx), "event message " + str(idx)) for idx in range(40)]
+        html_builder.add_table("ErrorEvents","Error Events",healthchecker.dat_table("public.audit_log","1234.dat",["id","message"],None,rows),[0,1])
+        html_builder.add_table("ErrorEvents","Small",healthchecker.dat_table("public.audit_log","1234.dat",["id"],None,[("1",)]),[0])
+        html_builder.add_div("Other","line\n" * 200)
+        html_builder.generate_file("06162021-123456")
+        html = open(html_file).read()
+        pages = sorted([name for name in os.listdir(self.tmp_dir) if name != "report.html"])
+        self.assertTrue(len(pages) > 2)
+        self.assertTrue("report_table_id_1_1.html" in pages and "report_div_id_1_1.html" in pages)
+        self.assertTrue("<a href=\"report_table_id_1_1.html\" target=\"_blank\">1</a>" in html)
+        # The small table stays in the HTML file, every page is a whole HTML file with its part of the rows
+        self.assertTrue("<table id='table_id_2'><tr><th>id</th></tr><tr><td>1</td></tr></table>" in html)
+        table_pages = "".join([open(os.path.join(self.tmp_dir, name)).read() for name in pages if "table_id_1_" in name])
+        self.assertEqual(table_pages.count("<tr><td>"), 40)
+        self.assertEqual(table_pages.count("</body></html>"), len([name for name in pages if "table_id_1_" in name]))
+
+
+class result_storage_test(unittest.TestCase):
+    """The text results and the references between them."""
+
+    def test_include(self):
+        usage = healthchecker.result_storage()
+        usage.add('Versions',"Versions:\n")
+        usage.add('Versions - Engine',"engine 4.4\n")
+        usage.add('Versions - Hosts',"hosts:\n")
+        usage.add('Versions - Hosts vdsm',"vdsm 4.40\n")
+        usage.include('Versions','Versions - Engine')
+        usage.include('Versions','Versions - Hosts')
+        usage.include('Versions - Hosts','Versions - Hosts vdsm')
+        usage.append('Versions',"end\n")
+        # A reference prints the child as it is when the parent is printed
+        usage.append('Versions - Engine',"engine-config\n")
+        self.assertEqual(usage.get('Versions'), "Versions:\nengine 4.4\nengine-config\nhosts:\nvdsm 4.40\nend\n")
+        self.assertEqual(list(usage.segments('Versions - Hosts')), ["hosts:\n","vdsm 4.40\n"])
+
+    def test_write_all(self):
+        usage = healthchecker.result_storage()
+        usage.add('KVM Hosts',"kvm0\n")
+        usage.add('Other - Hosts',"not printed on its own\n")
+        usage.add('Other',"other\n")
+        usage.include('Other','Other - Hosts')
+        output = []
+        usage.write_all(output.append)
+        self.assertEqual("".join(output), "kvm0\n\n\n\nother\nnot printed on its own\n\n\n\n")
+        self.assertEqual(usage.print_all(), "".join(output))
+        # Every instance has its own results
+        self.assertEqual(healthchecker.result_storage().command_table, [])
+
+    def test_spool(self):
+        usage = healthchecker.result_storage()
+        usage.spool_chunk_size = 4
+        usage.add('Versions',"Versions:\n")
+        usage.add('Versions - Hosts',"hosts:\n")
+        usage.append_spooled('Versions',lambda write: write("engine 4.4\n") or write("engine-config\n"))
+        usage.include('Versions','Versions - Hosts')
+        usage.append_spooled('Versions - Hosts',lambda write: write("vdsm 4.40\n"))
+        usage.append('Versions',"end\n")
+        usage.add('Other',"other\n")
+        usage.append_spooled('Other',lambda write: None)
+        # The spooled slices keep their place between the text and the references
+        self.assertEqual(usage.command_storage['Versions'][1], (0, 25))
+        self.assertEqual(list(usage.segments('Versions - Hosts')), ["hosts:\n","vdsm"," 4.4","0\n"])
+        output = []
+        usage.write_all(output.append)
+        self.assertEqual("".join(output), "Versions:\nengine 4.4\nengine-config\nhosts:\nvdsm 4.40\nend\n\n\n\nother\n\n\n\n")
+        usage.spool.close()
+
+
+class report_sections_test(unittest.TestCase):
+    """Computing the sections of the report on demand."""
+
+    def setUp(self):
+        self.calls = []
+        self.sections = healthchecker.report_sections()
+        self.sections.register('hosts',self.section('hosts',lambda: ["kvm0","kvm1"]))
+        self.sections.register('vms',self.section('vms',lambda: ["vm0"]))
+        self.sections.register('summary',self.section('summary',lambda hosts,vms: str(len(hosts)) + " hosts, " + str(len(vms)) + " VMs"),['hosts','vms'])
+
+    def section(self, name, function):
+        """Wrap a section function to record its calls."""
+        def compute(*results):
+            self.calls.append(name)
+            return function(*results)
+        return compute
+
+    def test_compute(self):
+        self.assertEqual(self.sections.compute('summary'), "2 hosts, 1 VMs")
+        self.assertEqual(self.calls, ['hosts','vms','summary'])
+        # Every section is computed once
+        self.assertEqual(self.sections.compute('hosts'), ["kvm0","kvm1"])
+        self.sections.compute_all()
+        self.assertEqual(self.calls, ['hosts','vms','summary'])
+
+    def test_fill(self):
+        done = []
+        self.sections.fill(lambda: done.append(sorted(self.sections.results)))
+        self.assertEqual(self.sections.compute('summary'), "2 hosts, 1 VMs")
+        self.sections.wait()
+        self.assertEqual(done, [['hosts','summary','vms']])
+        self.assertEqual(sorted(self.calls), ['hosts','summary','vms'])
+
+    def test_concurrent(self):
+        sections = healthchecker.report_sections(4)
+        started = threading.Event()
+        # The two inputs only finish when both have started, so they have to run at the same time
+        sections.register('engine',lambda: started.wait(10) and "engine")
+        sections.register('hosts',lambda: started.set() or ["kvm0"])
+        sections.register('versions',lambda engine,hosts: engine + " " + " ".join(hosts),['engine','hosts'])
+        sections.register('report',lambda: sections.results['versions'],requires=['versions'])
+        sections.compute_all()
+        self.assertEqual(sections.results, {'engine': "engine", 'hosts': ["kvm0"], 'versions': "engine kvm0", 'report': "engine kvm0"})
+
+    def test_error(self):
+        for threads in [1, 4]:
+            sections = healthchecker.report_sections(threads)
+            sections.register('hosts',lambda: {}["missing"])
+            sections.register('vms',lambda: ["vm0"])
+            sections.register('summary',lambda hosts,vms: "",['hosts','vms'])
+            sections.register('report',lambda: "",requires=['summary'])
+            errors = []
+            def compute_all():
+                try:
+                    sections.compute_all()
+                except KeyError as error:
+                    errors.append(error)
+            filler = threading.Thread(target=compute_all)
+            filler.start()
+            filler.join(10)
+            self.assertFalse(filler.is_alive())
+            self.assertEqual(len(errors), 1)
+            # The error of a task is raised again in every task that needs it
+            self.assertRaises(KeyError, sections.compute, 'summary')
+            self.assertRaises(KeyError, sections.compute, 'report')
+            self.assertEqual(sections.compute('vms'), ["vm0"])
+
+    def interrupted(self, threads, interrupts):
+        """Leave the menu while 'hosts' is running and press Ctrl-C the given number of times while waiting."""
+        started = threading.Event()
+        release = threading.Event()
+        done = []
+        sections = healthchecker.report_sections(threads)
+        sections.register('hosts',lambda: started.set() or release.wait(10) and ["kvm0"])
+        sections.register('vms',lambda: ["vm0"])
+        sections.register('summary',lambda hosts: str(len(hosts)) + " hosts",['hosts'])
+        session = bundle_session(os.curdir)
+        session.layout = [['hosts'], ['vms'], ['summary']]
+        session.sections = sections
+        wait = sections.wait
+        def interrupt():
+            started.wait(10)
+            if interrupts[0]:
+                interrupts[0] -= 1
+                raise KeyboardInterrupt
+            release.set()
+            wait()
+        sections.wait = interrupt
+        sections.fill(lambda: done.append(sorted(sections.results)))
+        output = printed_text()
+        stdout = sys.stdout
+        sys.stdout = output
+        try:
+            healthchecker.wait_report(session)
+        finally:
+            sys.stdout = stdout
+            release.set()
+            wait()
+        return sections, done, "".join(output.text)
+
+    def test_wait_report(self):
+        for threads in [1, 4]:
+            sections, done, output = self.interrupted(threads, [0])
+            self.assertEqual(done, [['hosts','summary','vms']])
+            self.assertTrue(output.startswith("Writing the output files once these sections are computed: hosts, "))
+
+    def test_stop(self):
+        for threads in [1, 4]:
+            # The first Ctrl-C only lets the running section finish, the files are written without the others
+            sections, done, output = self.interrupted(threads, [1])
+            self.assertEqual(sections.pending(), ['summary'] if threads > 1 else ['vms','summary'])
+            self.assertEqual(done, [sorted(sections.results)])
+            self.assertTrue("\nWaiting for the running sections: hosts. Press Ctrl-C again" in output)
+            self.assertTrue(output.endswith("The output files do not have these sections: " + ", ".join(sections.pending()) + ".\n"))
+            # The second one exits without waiting
+            try:
+                self.interrupted(threads, [2])
+            except SystemExit as error:
+                self.assertEqual(error.code, 130)
+            else:
+                self.fail("wait_report did not exit on the second Ctrl-C")
+
+    def test_fill_error(self):
+        done = []
+        self.sections.register('hosts',lambda: {}["missing"])
+        self.sections.fill(lambda: done.append(True))
+        self.sections.wait()
+        # The output files are still finished and the error is kept for the caller
+        self.assertEqual(done, [True])
+        self.assertTrue(isinstance(self.sections.error, KeyError))
+
+
+class command_line_test(unittest.TestCase):
+    """The options of the command line."""
+
+    def test_parse_args(self):
+        args = healthchecker.parse_args(["bundle"])
+        self.assertEqual(args.sosreport_path, "bundle")
+        self.assertEqual((args.batch, args.no_cache, args.extract_hosts, args.html_json, args.page_size), (False, False, False, False, None))
+        args = healthchecker.parse_args(["--batch", "--no-cache", "--extract-hosts", "--html-json", "--page-size", "8", "--output-dir", "out", "bundle"])
+        self.assertEqual((args.batch, args.no_cache, args.extract_hosts, args.html_json, args.page_size, args.output_dir), (True, True, True, True, 8, "out"))
+        self.assertEqual(healthchecker.parse_args(["bundle"]).sql_scan, "stream")
+        self.assertEqual(healthchecker.parse_args(["--sql-scan", "mmap", "bundle"]).sql_scan, "mmap")
+
+    def test_main_exit(self):
+        try:
+            healthchecker.main(["--batch", "--sections", "storage", "bundle"])
+        except SystemExit as error:
+            self.assertEqual(error.code, 2)
+        else:
+            self.fail("main did not exit on an unknown section")
+
+
+class fleet_test(tmp_dir_test):
+    """Checking many bundles in one run."""
+
+    def test_find_bundles(self):
+        for name in ["b-LogCollector-20210617", "a-LogCollector-20210616", "other"]:
+            os.mkdir(os.path.join(self.tmp_dir, name))
+        self.write("c-LogCollector-20210618.txt", "not a directory")
+        first = os.path.join(os.path.realpath(self.tmp_dir), "a-LogCollector-20210616")
+        second = os.path.join(os.path.realpath(self.tmp_dir), "b-LogCollector-20210617")
+        self.assertEqual(healthchecker.find_bundles([self.tmp_dir]), [first, second])
+        self.assertEqual(healthchecker.find_bundles([second, self.tmp_dir]), [second, first])
+        self.assertEqual(healthchecker.find_bundles([os.path.join(self.tmp_dir, "missing")]), [])
+
+    def test_fleet_summary(self):
+        summary = healthchecker.fleet_summary([("/data/a-LogCollector-20210616", "/data/a-LogCollector-20210616/olvm_healthchecker_output_06162021", [["SSLEnabled","false","true"]], None),
+                                               ("/data/b-LogCollector-20210617", None, [], "no restore.sql")])
+        self.assertEqual(summary, "\nBundles:\n"
+                                  "+-----------------------+----------------------+----------+----------------------------------+\n"
+                                  "|Bundle                 |Status                |Mismatches|Output Folder                     |\n"
+                                  "+=======================+======================+==========+==================================+\n"
+                                  "|a-LogCollector-20210616|Done                  |1         |olvm_healthchecker_output_06162021|\n"
+                                  "+-----------------------+----------------------+----------+----------------------------------+\n"
+                                  "|b-LogCollector-20210617|Failed: no restore.sql|          |                                  |\n"
+                                  "+-----------------------+----------------------+----------+----------------------------------+\n"
+                                  "\nHealth Check mismatches:\n"
+                                  "+-----------------------+----------+------------+-------------+\n"
+                                  "|Bundle                 |Name      |Actual Value|Default Value|\n"
+                                  "+=======================+==========+============+=============+\n"
+                                  "|a-LogCollector-20210616|SSLEnabled|false       |true         |\n"
+                                  "+-----------------------+----------+------------+-------------+\n")
+        self.assertTrue(healthchecker.fleet_summary([]).endswith("\nHealth Check mismatches:\nNone\n"))
+
+    def test_check_fleet(self):
+        # A bundle that can't be checked is reported without stopping the others
+        os.mkdir(os.path.join(self.tmp_dir, "a-LogCollector-20210616"))
+        results, summary_file = healthchecker.check_fleet([self.tmp_dir],output_dir=self.tmp_dir,processes=1,dt_string="06162021-123456",cache_dir=None)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1:3], (None, []))
+        self.assertTrue(results[0][3])
+        self.assertEqual(summary_file, os.path.join(os.path.realpath(self.tmp_dir), "olvm_healthchecker_fleet_06162021-123456.txt"))
+        self.assertTrue("Failed: " in open(summary_file).read())
+
+    def test_fleet_sections(self):
+        summary = healthchecker.fleet_summary([("/data/a-LogCollector-20210616", "/data/a-LogCollector-20210616/olvm_healthchecker_output_06162021", None, None)])
+        self.assertTrue("|a-LogCollector-20210616|Done  |          |olvm_healthchecker_output_06162021|" in summary)
+        self.assertTrue(summary.endswith("\nHealth Check mismatches:\nThe Health Check section is not selected.\n"))
+
+
+class session_test(tmp_dir_test):
+    """Checking a whole bundle."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.bundle = os.path.join(self.tmp_dir, "ovirt-LogCollector-20210616123456")
+        write_bundle(self.bundle)
+
+    def check(self, **options):
+        """Check the bundle without the cache and return the text of every item."""
+        return healthchecker.check_bundle(self.bundle,output_dir=self.tmp_dir,cache_dir=None,**options).results()
+
+    def test_threads(self):
+        results = self.check(threads=1,dt_string="06162021-000001")
+        self.assertEqual(self.check(dt_string="06162021-000002"), results)
+        self.assertTrue("|UserSessionTimeOutInterval" in results['Health Check'])
+        self.assertTrue("kvm2.example.com" in results['KVM Hosts'])
+
+    def test_dat_report(self):
+        output = printed_text()
+        stdout = sys.stdout
+        sys.stdout = output
+        try:
+            session = healthchecker.check_bundle(self.bundle,output_dir=self.tmp_dir,cache_dir=None,threads=4)
+        finally:
+            sys.stdout = stdout
+        # The .dat files extracted by the concurrent tables are reported in one line
+        dat_files = [name for name in os.listdir(os.path.join(session.path.sosreport, "sos_commands", "postgresql")) if name.endswith(".dat")]
+        self.assertEqual(session.path.dat_stats['extracted_files'], len(dat_files))
+        reports = [line for line in "".join(output.text).splitlines() if "on demand" in line]
+        self.assertEqual(reports, [session.path.dat_report()])
+        self.assertTrue(reports[0].startswith("pgdump-scl-rh-postgresql10.tar: extracted " + str(len(dat_files)) + " .dat files ("))
+
+    def test_sql_scan(self):
+        scans = []
+        copy_catalog = healthchecker.copy_catalog
+        healthchecker.copy_catalog = lambda sql_file, sql_scan='stream': scans.append(sql_scan) or copy_catalog(sql_file, sql_scan)
+        try:
+            results = [self.check(sql_scan=sql_scan,dt_string="06162021-00000" + str(idx)) for idx, sql_scan in enumerate(["stream", "mmap"])]
+        finally:
+            healthchecker.copy_catalog = copy_catalog
+        self.assertEqual(scans, ["stream", "mmap"])
+        self.assertEqual(results[0], results[1])
+        self.assertTrue("kvm2.example.com" in results[1]['KVM Hosts'])
+
+    def test_sections(self):
+        results = self.check(sections=["health_check", "versions"])
+        self.assertTrue("|UserSessionTimeOutInterval" in results['Health Check'])
+        self.assertTrue("Same as host kvm0.example.com" in results['Versions'])
+        self.assertFalse('KVM Hosts' in results)
+
+    def test_failed_section(self):
+        session = healthchecker.healthcheck_session(self.bundle,output_dir=self.tmp_dir,cache_dir=None,dt_string="06162021-000003")
+        session.sections.functions['Storage Topology'][0] = lambda *results: {}["missing"]
+        self.assertRaises(KeyError, session.run)
+        # The files are finished with the sections that are computed
+        self.assertTrue(session.path.output_txt.closed)
+        self.assertTrue(os.path.isfile(session.html_file))
+        self.assertTrue("kvm2.example.com" in open(session.path.output_txt.name).read())
+
+    def test_hidden_columns(self):
+        session = healthchecker.check_bundle(self.bundle,output_dir=self.tmp_dir,cache_dir=None)
+        # The HTML table has every column of audit_log for its column filter, the text only the shown ones
+        header = "".join("<th>c" + str(col) + "</th>" if col in [9,13] else "<th style=\"display: none;\">c" + str(col) + "</th>" for col in range(20))
+        self.assertTrue("<table id='ErrorEvents_table_id_1'><tr>" + header + "</tr>" in open(session.html_file).read())
+        self.assertTrue("|c13" in session.results()['Error Events'])
+        self.assertFalse("c14" in session.results()['Error Events'])
+
+    def test_cached_columns(self):
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        results = healthchecker.check_bundle(self.bundle,output_dir=self.tmp_dir,cache_dir=cache_dir,dt_string="06162021-000004").results()
+        # Only the shown and sorted columns are cached, the hidden columns of the HTML tables are not
+        cache = healthchecker.result_cache(cache_dir)
+        entries = [cache.get(key) for key in os.listdir(cache_dir)]
+        audit_log = [entry for entry in entries if isinstance(entry, dict) and entry.get('name_table') == 'public.audit_log']
+        self.assertEqual([entry['col_index'] for entry in audit_log], [[9,13]])
+        self.assertEqual(healthchecker.check_bundle(self.bundle,output_dir=self.tmp_dir,cache_dir=cache_dir,dt_string="06162021-000005").results(), results)
+
+
+class select_sections_test(unittest.TestCase):
+    """Selecting the sections of the report and their inputs."""
+
+    def names(self, selected):
+        return [item[0] for item in selected]
+
+    def test_all(self):
+        layout, inputs = healthchecker.select_sections()
+        self.assertEqual(layout, healthchecker.report_layout)
+        self.assertEqual(inputs, healthchecker.report_inputs)
+
+    def test_normalised_names(self):
+        layout, inputs = healthchecker.select_sections(["error_events", "healthcheck", "Versions"])
+        # The sections keep the order of the tabs
+        self.assertEqual(self.names(layout), ['Versions', 'Health Check', 'Error Events'])
+        self.assertEqual(self.names(inputs), ['Hosts', 'Versions - engine files', 'Versions - host files'])
+        self.assertEqual(self.names(healthchecker.select_sections(["Network-Topology"])[0]), ['Network Topology'])
+        self.assertEqual(healthchecker.select_sections(["HEALTH CHECK"])[1], [])
+
+    def test_unknown_names(self):
+        self.assertRaises(ValueError, healthchecker.select_sections, ["Health", "Versions"])
+        try:
+            healthchecker.select_sections(["Health", "Storage"])
+        except ValueError as error:
+            self.assertTrue(str(error).startswith("Unknown sections: Health, Storage. The sections are: KVM Hosts, "))
+
+
+class member_safe_test(tmp_dir_test):
+    """Skipping the archive members that would be written outside the destination."""
+
+    def setUp(self):
+        tmp_dir_test.setUp(self)
+        self.dest = os.path.join(self.tmp_dir, "dest")
+        self.outside = os.path.join(self.tmp_dir, "outside")
+        os.mkdir(self.dest)
+        os.mkdir(self.outside)
+        self.secret = self.write(os.path.join("outside", "secret"), "secret\n")
+
+    def member(self, name, type=tarfile.REGTYPE, linkname=""):
+        info = tarfile.TarInfo(name)
+        info.type = type
+        info.linkname = linkname
+        return info
+
+    def extract(self, members):
+        """Write an archive of the given members and extract it to dest, the regular files contain 'data'."""
+        archive = os.path.join(self.tmp_dir, "archive.tar")
+        tar = tarfile.open(archive, 'w')
+        for info in members:
+            if info.isfile():
+                info.size = len(b"data")
+                tar.addfile(info, io.BytesIO(b"data"))
+            else:
+                tar.addfile(info)
+        tar.close()
+        stats = healthchecker.extract_archive(archive,self.dest)
+        self.assertEqual(os.listdir(self.outside), ["secret"])
+        self.assertEqual(open(self.secret).read(), "secret\n")
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ["archive.tar", "dest", "outside"])
+        return stats
+
+    def test_absolute_path(self):
+        member = self.member(os.path.join(self.outside, "absolute"))
+        self.assertFalse(healthchecker.member_safe(member,os.path.realpath(self.dest)))
+        self.assertEqual(self.extract([member, self.member("top/ok")])['extracted_files'], 1)
+        self.assertTrue(os.path.isfile(os.path.join(self.dest, "top", "ok")))
+
+    def test_parent_directory(self):
+        members = [self.member("../outside/dotdot"), self.member("top/../../outside/dotdot")]
+        for member in members:
+            self.assertFalse(healthchecker.member_safe(member,os.path.realpath(self.dest)))
+        self.assertEqual(self.extract(members)['extracted_files'], 0)
+
+    def test_symlink_escape(self):
+        # The link itself stays in dest, the file written through it would not
+        link = self.member("top/link", tarfile.SYMTYPE, self.outside)
+        child = self.member("top/link/child")
+        self.assertTrue(healthchecker.member_safe(link,os.path.realpath(self.dest)))
+        self.extract([link, child])
+        # Pythons with the tarfile data filter refuse the link and the child becomes a plain directory in dest,
+        # the child is then checked against a link left by an earlier run
+        link_path = os.path.join(self.dest, "top", "link")
+        if not os.path.islink(link_path):
+            shutil.rmtree(link_path)
+            os.symlink(self.outside, link_path)
+        self.assertFalse(healthchecker.member_safe(child,os.path.realpath(self.dest)))
+        self.assertEqual(self.extract([child])['extracted_files'], 0)
+
+    def test_hardlink_escape(self):
+        members = [self.member("top/hard", tarfile.LNKTYPE, self.secret), self.member("top/hard2", tarfile.LNKTYPE, "../outside/secret")]
+        for member in members:
+            self.assertFalse(healthchecker.member_safe(member,os.path.realpath(self.dest)))
+        self.assertEqual(self.extract(members)['extracted_files'], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "top", "hard")))
+
+
+if __name__ == '__main__':
+    unittest.main()